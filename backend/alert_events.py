@@ -0,0 +1,192 @@
+"""
+Alert events from the Celery workers to the API's WebSocket clients
+
+A worker appends an event to a Redis stream (on the broker's Redis) for
+each alert, as soon as the transaction that saved it has committed. Every API
+process reads the stream from its tail and broadcasts the events to its own
+WebSocket clients (websocket.manager). There is no consumer group, since
+every process needs every event.
+
+A stream rather than pub/sub: a subscriber whose connection drops continues
+from the last id it read, instead of missing what was published meanwhile.
+The stream is capped at about ALERT_EVENT_STREAM_MAXLEN events.
+
+Latency is measured per alert in each API process:
+
+- publish: detected (a video track's first sighting) -> event published (the worker's commit)
+- delivery: published -> sent to the WebSocket clients (Redis and the subscriber)
+- detection_to_send: detected -> sent
+- detection_to_browser: detected -> received by the browser. The
+  browser acks each alert ({"type": "alert_ack", "alert_id": ...}) and half
+  of the send/ack round trip is taken as the last hop, so browser and
+  server clocks don't need to agree. Worker and API hosts do (NTP).
+"""
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+import asyncio
+import json
+import logging
+import time
+
+from config import settings
+from task_queues import summarize_waits
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('publish', 'delivery', 'detection_to_send', 'detection_to_browser')
+
+_redis = None
+
+
+def _get_redis():
+    global _redis
+    if _redis is None:
+        import redis
+
+        _redis = redis.Redis.from_url(settings.CELERY_BROKER_URL, socket_timeout=2, socket_connect_timeout=2)
+    return _redis
+
+
+def alert_event(alert: Dict, detection: Dict) -> Dict:
+    """Event for an alert row and its detection row, as built by celery_app._save_detections (media_id None for live cameras)"""
+    return {
+        'id': str(alert['id']),
+        'detection_id': str(detection['id']),
+        'media_id': str(detection['media_id']) if detection['media_id'] else None,
+        'camera_id': str(alert['camera_id']) if alert['camera_id'] else None,
+        'severity': alert['severity'],
+        'status': alert['status'],
+        'description': alert['description'],
+        'thumbnail_url': alert['thumbnail_url'],
+        'detection_type': detection['detection_type'],
+        'confidence': detection['confidence'],
+        'frame_number': detection['frame_number'],
+        'track_id': detection['track_id'],
+        'bounding_box': detection['bounding_box'],
+        'detected_at': detection['detected_at'].isoformat(),
+        'created_at': alert['created_at'].isoformat(),
+    }
+
+
+def publish_alerts(events: List[Dict], client=None):
+    """
+    Append alert events to the stream, once the alerts are committed
+
+    Failures are only logged: the alerts are saved either way, and the
+    dashboard still finds them through the alerts API.
+    """
+    if not events or not settings.ALERT_EVENTS_ENABLED:
+        return
+    published_at = datetime.now(timezone.utc).isoformat()
+    try:
+        pipe = (client or _get_redis()).pipeline()
+        for event in events:
+            pipe.xadd(
+                settings.ALERT_EVENT_STREAM,
+                {'event': json.dumps({**event, 'published_at': published_at})},
+                maxlen=settings.ALERT_EVENT_STREAM_MAXLEN,
+                approximate=True
+            )
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not publish {len(events)} alert events: {e}")
+
+
+class AlertLatency:
+    """Latency samples of the alerts this process has sent, in seconds, the last window per stage"""
+
+    def __init__(self, window: Optional[int] = None):
+        window = window or settings.ALERT_LATENCY_WINDOW
+        self._samples = {stage: deque(maxlen=window) for stage in STAGES}
+        # alert id -> (sent, detected), for the browsers' acks
+        self._sent: OrderedDict = OrderedDict()
+        self._window = window
+
+    def record_sent(self, event: Dict, sent_at: Optional[float] = None):
+        sent_at = time.time() if sent_at is None else sent_at
+        detected = datetime.fromisoformat(event['detected_at']).timestamp()
+        published = datetime.fromisoformat(event['published_at']).timestamp()
+        self._samples['publish'].append(max(0.0, published - detected))
+        self._samples['delivery'].append(max(0.0, sent_at - published))
+        self._samples['detection_to_send'].append(max(0.0, sent_at - detected))
+        self._sent[event['id']] = (sent_at, detected)
+        while len(self._sent) > self._window:
+            self._sent.popitem(last=False)
+
+    def record_ack(self, alert_id: str, received_at: Optional[float] = None):
+        """A browser acknowledged an alert sent to it, unknown ids are ignored"""
+        if alert_id not in self._sent:
+            return
+        received_at = time.time() if received_at is None else received_at
+        sent, detected = self._sent[alert_id]
+        self._samples['detection_to_browser'].append(max(0.0, sent - detected + (received_at - sent) / 2))
+
+    def stats(self) -> Dict[str, Dict]:
+        return {stage: summarize_waits(list(samples)) for stage, samples in self._samples.items()}
+
+
+# This API process's measurements
+latency = AlertLatency()
+
+
+class AlertSubscriber:
+    """Reads the alert stream in an API process and hands each event to broadcast"""
+
+    def __init__(self, broadcast: Callable[[Dict], Awaitable], client=None):
+        """
+        Args:
+            broadcast: Sends one event to the WebSocket clients (websocket.broadcast_new_alert)
+            client: redis.asyncio client, defaults to one on CELERY_BROKER_URL
+        """
+        self.broadcast = broadcast
+        self.client = client
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self.client is not None:
+            await self.client.aclose()
+
+    async def run(self):
+        """Broadcast events as they are appended, from the ones published after it starts"""
+        last_id = '$'
+        delay = 1.0
+        while True:
+            try:
+                if self.client is None:
+                    import redis.asyncio
+
+                    self.client = redis.asyncio.Redis.from_url(settings.CELERY_BROKER_URL, socket_connect_timeout=2)
+                entries = await self.client.xread(
+                    {settings.ALERT_EVENT_STREAM: last_id}, count=100, block=settings.ALERT_EVENT_BLOCK_MS
+                )
+                delay = 1.0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Alert stream unavailable, retrying in {delay:.0f}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+                continue
+
+            for _, messages in entries or []:
+                for message_id, fields in messages:
+                    last_id = message_id
+                    await self.deliver(fields.get(b'event') or fields.get('event'))
+
+    async def deliver(self, raw):
+        try:
+            event = json.loads(raw)
+            await self.broadcast(event)
+            latency.record_sent(event)
+        except Exception as e:
+            logger.error(f"Could not deliver alert event: {e}")
@@ -11,6 +11,7 @@ from datetime import datetime, timezone
 from database import get_db
 from db import models
 import schemas
+import alert_events
 
 router = APIRouter()
 
@@ -120,4 +121,12 @@ def get_alert_stats(
             "medium": medium,
             "low": low
         }
-    }
\ No newline at end of file
+    }
+
+@router.get("/stats/latency")
+def get_alert_latency():
+    """
+    Latency of the alerts pushed over WebSocket by this API process (p50/p95/max per stage):
+    publish, delivery, detection_to_send and detection_to_browser (from the clients' acks)
+    """
+    return alert_events.latency.stats()
@@ -0,0 +1,61 @@
+"""
+Benchmark: inference latency per backend (torch vs onnxruntime vs openvino)
+
+Converted models are exported on first use and cached next to MODEL_PATH.
+
+Usage (from backend/):
+    python benchmarks/bench_backends.py --frames 32 --batch-size 1
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference_backends import BACKENDS
+from ml_processor import MLProcessor
+from benchmarks.synthetic import make_frames
+
+BACKEND_PACKAGES = {'torch': 'torch', 'onnxruntime': 'onnxruntime', 'openvino': 'openvino'}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    args = parser.parse_args()
+
+    frames = make_frames(args.frames)
+    numbers = list(range(len(frames)))
+
+    for backend in args.backends:
+        if importlib.util.find_spec(BACKEND_PACKAGES[backend]) is None:
+            print(f"{backend:>12}: skipped ({BACKEND_PACKAGES[backend]} not installed)")
+            continue
+
+        start = time.perf_counter()
+        processor = MLProcessor(backend=backend)
+        load_time = time.perf_counter() - start
+        processor.process_frames(frames[:1], numbers[:1])  # warm up
+
+        latencies = []
+        detections = 0
+        for i in range(0, len(frames), args.batch_size):
+            start = time.perf_counter()
+            detections += len(processor.process_frames(frames[i:i + args.batch_size], numbers[i:i + args.batch_size]))
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        print(
+            f"{backend:>12}: load {load_time:5.2f}s, "
+            f"{np.mean(latencies):7.1f} ms/batch mean, {np.percentile(latencies, 95):7.1f} ms p95, "
+            f"{len(frames) / (sum(latencies) / 1000):6.1f} frames/sec, {detections} detections"
+        )
+
+
+if __name__ == "__main__":
+    main()
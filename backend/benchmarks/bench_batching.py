@@ -0,0 +1,51 @@
+"""
+Benchmark: per-frame vs batched inference in MLProcessor
+
+Usage (from backend/):
+    python benchmarks/bench_batching.py --frames 64 --batch-sizes 1 4 8 16
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml_processor import MLProcessor
+from benchmarks.synthetic import make_frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=64)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    args = parser.parse_args()
+
+    processor = MLProcessor()
+    frames = make_frames(args.frames, args.width, args.height)
+    numbers = list(range(len(frames)))
+
+    # Warm up so the first timed call doesn't pay for lazy initialisation
+    processor.process_frames(frames[:2], numbers[:2])
+
+    start = time.perf_counter()
+    baseline = []
+    for frame, number in zip(frames, numbers):
+        baseline.extend(processor._process_frame(frame, number))
+    per_frame_fps = len(frames) / (time.perf_counter() - start)
+    print(f"{'per-frame':>12}: {per_frame_fps:7.2f} frames/sec")
+
+    for batch_size in args.batch_sizes:
+        start = time.perf_counter()
+        detections = []
+        for i in range(0, len(frames), batch_size):
+            detections.extend(processor.process_frames(frames[i:i + batch_size], numbers[i:i + batch_size]))
+        fps = len(frames) / (time.perf_counter() - start)
+        same = "same detections" if len(detections) == len(baseline) else "DETECTION COUNT DIFFERS"
+        print(f"{f'batch={batch_size}':>12}: {fps:7.2f} frames/sec ({fps / per_frame_fps:.2f}x, {same})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: inference resolution (imgsz 320 vs 480 vs 640) and the triage pass
+
+Frames go through the letterbox preprocessor into reused buffers, then the
+model runs at each size. The triage rows run a 320 pass first and re-run at
+640 only the frames where it found something.
+
+Usage (from backend/):
+    python benchmarks/bench_imgsz.py --frames 32 --batch-size 8
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+from ml_processor import MLProcessor
+from benchmarks.synthetic import make_frames
+
+
+def run(processor: MLProcessor, frames, batch_size: int):
+    """Return (preprocess seconds, total seconds, detections) for one pass over the frames"""
+    preprocess_time = 0.0
+    detections = 0
+    start = time.perf_counter()
+    for i in range(0, len(frames), batch_size):
+        batch = frames[i:i + batch_size]
+        started = time.perf_counter()
+        prepared = processor._preprocess(batch)
+        preprocess_time += time.perf_counter() - started
+        per_frame = processor._postprocess(prepared, processor._infer(prepared), list(range(i, i + len(batch))))
+        detections += sum(len(d) for d in per_frame)
+    return preprocess_time, time.perf_counter() - start, detections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[320, 480, 640])
+    parser.add_argument("--triage", type=int, default=320, help="Triage size for the triage row (0 skips it)")
+    args = parser.parse_args()
+
+    frames = make_frames(args.frames)
+    processor = MLProcessor()
+
+    runs = [(f"imgsz {size}", size, 0) for size in args.sizes]
+    if args.triage:
+        runs.append((f"{args.triage}->{max(args.sizes)} triage", max(args.sizes), args.triage))
+
+    for label, imgsz, triage in runs:
+        settings.INFERENCE_IMGSZ = imgsz
+        settings.TRIAGE_IMGSZ = triage
+        run(processor, frames[:args.batch_size], args.batch_size)  # warm up
+        processor.triage_stats = {'frames': 0, 'escalated': 0}
+
+        preprocess_time, total, detections = run(processor, frames, args.batch_size)
+        escalated = f", {processor.triage_stats['escalated']}/{processor.triage_stats['frames']} escalated" if triage else ""
+        print(
+            f"{label:>18}: {len(frames) / total:6.1f} frames/sec, "
+            f"preprocess {preprocess_time / len(frames) * 1000:5.2f} ms/frame, "
+            f"{detections} detections{escalated}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: N camera loops, each with its own model doing batch-of-1 inference,
+vs the same cameras sharing one dynamically batching InferenceServer
+
+Every camera submits its next frame as soon as the previous result is back.
+Each mode runs in a fresh process so peak RSS reflects the models it loaded.
+
+Usage (from backend/):
+    python benchmarks/bench_inference_server.py --cameras 8 --seconds 20
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import make_frames
+
+
+def run_mode(mode: str, cameras: int, seconds: float) -> dict:
+    from inference_server import InferenceServer
+    from ml_processor import MLProcessor
+
+    frames = make_frames(cameras)
+    server = None
+    if mode == "per-camera":
+        runners = [MLProcessor() for _ in range(cameras)]
+    else:
+        server = InferenceServer(MLProcessor()).start()
+        runners = [server] * cameras
+
+    for runner, frame in zip(runners, frames):
+        runner.process_frames([frame], [0])  # warm up
+    if server:
+        # Fresh server so the histograms only cover the timed run
+        server.stop()
+        server = InferenceServer(server.processor).start()
+        runners = [server] * cameras
+
+    counts = [0] * cameras
+    deadline = time.monotonic() + seconds
+
+    def camera(index):
+        while time.monotonic() < deadline:
+            runners[index].process_frames([frames[index]], [counts[index]])
+            counts[index] += 1
+
+    threads = [threading.Thread(target=camera, args=(i,)) for i in range(cameras)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    result = {
+        "frames_per_sec": sum(counts) / seconds,
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+    if server:
+        server.stop()
+        result["stats"] = server.stats()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cameras", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--mode", choices=["per-camera", "shared"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.cameras, args.seconds)))
+        return
+
+    for mode in ("per-camera", "shared"):
+        output = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--cameras", str(args.cameras), "--seconds", str(args.seconds)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:>10}: {result['frames_per_sec']:6.1f} frames/sec, peak RSS {result['rss_mb']:6.0f} MB")
+        if "stats" in result:
+            stats = result["stats"]
+            print(f"{'':>10}  batch sizes {stats['batch_sizes']}, queue depths {stats['queue_depths']}, "
+                  f"queue wait p50 {stats['queue_wait_ms']['p50']:.1f} ms p95 {stats['queue_wait_ms']['p95']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
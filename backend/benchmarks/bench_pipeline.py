@@ -0,0 +1,59 @@
+"""
+Benchmark: serial vs pipelined process_video
+
+Runs the same synthetic video through process_video with VIDEO_PIPELINE_ENABLED
+off and on. Prints the wall time and the pipeline's per-stage busy time. If
+the stage busy times add up to more than the wall time, the stages overlapped.
+
+Usage (from backend/):
+    python benchmarks/bench_pipeline.py --seconds 20 --sample-fps 5
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+from ml_processor import MLProcessor
+from video_pipeline import STAGES
+from benchmarks.synthetic import make_frames, write_video
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=int, default=20)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--sample-fps", type=int, default=5)
+    parser.add_argument("--video", help="Use an existing video instead of generating one")
+    args = parser.parse_args()
+
+    settings.FRAME_EXTRACTION_FPS = args.sample_fps
+    processor = MLProcessor()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = args.video or write_video(os.path.join(tmp_dir, "synthetic.mp4"), args.seconds, args.fps)
+
+        # Warm up so neither run pays for lazy model initialisation
+        processor.process_frames(make_frames(2), [0, 1])
+
+        timings = {}
+        for enabled in (False, True):
+            settings.VIDEO_PIPELINE_ENABLED = enabled
+            start = time.perf_counter()
+            processor.process_video(video_path)
+            timings[enabled] = time.perf_counter() - start
+
+        stats = processor.last_pipeline_stats
+        print(f"serial:    {timings[False]:6.2f}s")
+        print(f"pipelined: {timings[True]:6.2f}s ({timings[False] / timings[True]:.2f}x)")
+        print(f"stage busy time over {stats['frames']} frames / {stats['batches']} batches:")
+        for stage in STAGES:
+            print(f"  {stage:>11}: {stats[stage]:6.2f}s ({stats[stage] / stats['wall']:.0%} of wall)")
+        print(f"  overlap: {sum(stats[s] for s in STAGES) / stats['wall']:.2f} stages busy on average")
+
+
+if __name__ == "__main__":
+    main()
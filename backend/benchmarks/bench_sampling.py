@@ -0,0 +1,57 @@
+"""
+Benchmark: frame sampling modes (read vs grab vs seek)
+
+Measures decode throughput only, without inference, on a synthetic video at
+the FRAME_EXTRACTION_FPS sampling rate. It reports source frames covered per
+second, so the modes can be compared directly.
+
+Usage (from backend/):
+    python benchmarks/bench_sampling.py --seconds 60 --fps 30 --sample-fps 1
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml_processor import MLProcessor, SAMPLING_MODES
+from benchmarks.synthetic import write_video
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=int, default=60)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--sample-fps", type=int, default=1)
+    parser.add_argument("--video", help="Use an existing video instead of generating one")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = args.video or write_video(os.path.join(tmp_dir, "synthetic.mp4"), args.seconds, args.fps)
+        frame_skip = max(1, args.fps // args.sample_fps)
+
+        # Only the frame reader is exercised, so skip loading a model
+        reader = MLProcessor.__new__(MLProcessor)
+
+        baseline = None
+        for mode in SAMPLING_MODES:
+            cap = cv2.VideoCapture(video_path)
+            total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            start = time.perf_counter()
+            sampled = [n for n, _ in reader._read_sampled_frames(cap, frame_skip, mode=mode)]
+            elapsed = time.perf_counter() - start
+            cap.release()
+
+            baseline = baseline or elapsed
+            print(
+                f"{mode:>5}: {total / elapsed:8.1f} source frames/sec, "
+                f"{len(sampled)} sampled, {baseline / elapsed:.2f}x vs read"
+            )
+
+
+if __name__ == "__main__":
+    main()
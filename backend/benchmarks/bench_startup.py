@@ -0,0 +1,55 @@
+"""
+Benchmark: API cold start (time until /health answers, peak RSS, ML modules imported)
+
+Each run is a fresh interpreter that imports main, the way uvicorn does on a
+deploy, and then serves one /health request.
+
+Usage (from backend/):
+    python benchmarks/bench_startup.py --runs 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import main
+from fastapi.testclient import TestClient
+status = TestClient(main.app).get("/health").status_code
+print(json.dumps({
+    "seconds": time.perf_counter() - started,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "status": status,
+    "ml_modules": sorted(m for m in ("torch", "ultralytics", "cv2") if m in sys.modules),
+}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    runs = []
+    for _ in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    seconds = [run["seconds"] for run in runs]
+    rss = [run["rss_mb"] for run in runs]
+    print(f"/health ready in {np.median(seconds):.2f}s median ({min(seconds):.2f}-{max(seconds):.2f}s), "
+          f"peak RSS {np.median(rss):.0f} MB, status {runs[-1]['status']}")
+    print(f"ML modules loaded: {', '.join(runs[-1]['ml_modules']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark: Celery prefork children loading the model themselves vs sharing a preloaded one
+
+Mimics a prefork pool without a broker: a parent process forks N children,
+each sets up like a worker process (worker_lifecycle.init_process) and runs
+one inference as its first task. Reported per mode:
+
+- lazy: every child loads the model on its first task, no warm-up (the old behaviour)
+- preload: the parent loads the model before forking (WORKER_PRELOAD_MODEL),
+  each child sets its threads and warms up before taking tasks
+
+Memory is measured while all children are alive, so the PSS sum is the pool's
+real footprint. Each mode runs in a fresh interpreter.
+
+Usage (from backend/):
+    python benchmarks/bench_worker_memory.py --children 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = ("lazy", "preload")
+
+
+def child(mode, children, barrier, results):
+    import worker_lifecycle
+    from benchmarks.synthetic import make_frames
+    from config import settings
+    from ml_service import get_ml_processor
+
+    settings.WORKER_WARMUP = mode == "preload"
+    setup_started = time.perf_counter()
+    if mode == "preload":
+        worker_lifecycle.init_process(children)
+    setup = time.perf_counter() - setup_started
+
+    frame = make_frames(1)[0]
+    started = time.perf_counter()
+    get_ml_processor().process_frames([frame], [0])
+    first_task = time.perf_counter() - started
+
+    # Measure once every child has loaded what it is going to load
+    barrier.wait()
+    results.put({"setup": setup, "first_task": first_task, **worker_lifecycle.process_memory()})
+    barrier.wait()
+
+
+def run_mode(mode, children):
+    import worker_lifecycle
+
+    started = time.perf_counter()
+    if mode == "preload":
+        worker_lifecycle.preload_model()
+    preload = time.perf_counter() - started
+    parent_memory = worker_lifecycle.process_memory()
+
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(children)
+    results = context.Queue()
+    processes = [context.Process(target=child, args=(mode, children, barrier, results)) for _ in range(children)]
+    for process in processes:
+        process.start()
+    per_child = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    return {"preload": preload, "parent": parent_memory, "children": per_child}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--children", type=int, default=4)
+    parser.add_argument("--run-mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode:
+        print(json.dumps(run_mode(args.run_mode, args.children)))
+        return
+
+    for mode in MODES:
+        output = subprocess.run(
+            [sys.executable, __file__, "--run-mode", mode, "--children", str(args.children)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        children = result["children"]
+        pss = sum(c.get("pss_mb", 0) for c in children) + result["parent"].get("pss_mb", 0)
+        print(
+            f"{mode:>8}: {args.children} children, total PSS {pss:7.0f} MB "
+            f"(child RSS {max(c.get('rss_mb', 0) for c in children):.0f} MB, "
+            f"private {max(c.get('private_mb', 0) for c in children):.0f} MB), "
+            f"parent preload {result['preload']:.2f}s, child setup {max(c['setup'] for c in children):.2f}s, "
+            f"first task {max(c['first_task'] for c in children) * 1000:.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
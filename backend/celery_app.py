@@ -1,14 +1,30 @@
 """
 Celery configuration and tasks for async processing
 """
-from celery import Celery
+from celery import Celery, chord
+from celery.concurrency import get_implementation, prefork
+from celery.signals import before_task_publish, task_postrun, task_prerun, worker_init, worker_process_init
+from kombu import Queue
 from config import settings
-from ml_processor import MLProcessor
+from ml_service import get_ml_processor
+from severity import ALERT_CONFIDENCE, determine_severity, is_critical
+from segments import is_seekable, merge_segment_tracks, plan_segments, probe_video, stitch_window
+from tracker import TrackSummaries
+from result_cache import cached_detections, cached_result, store_result
 from database import SessionLocal
+import alert_events
+import task_queues
+import worker_lifecycle
 from db import models
 from datetime import datetime, timezone
-from uuid import UUID
+from sqlalchemy import insert, update
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
+import csv
+import io
+import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -25,14 +41,74 @@ celery_app.conf.update(
     result_serializer='json',
     timezone='UTC',
     enable_utc=True,
+    # Uploads are routed by media.upload_media, see task_queues.py
+    task_queues=[Queue(name) for name in task_queues.QUEUES],
+    task_default_queue=task_queues.STANDARD,
+    task_default_priority=4,
+    broker_transport_options={
+        'priority_steps': list(range(10)),
+        'queue_order_strategy': 'priority',
+        # Tasks are acknowledged once done, Redis hands an unacknowledged one to
+        # another worker after this long
+        'visibility_timeout': settings.TASK_VISIBILITY_TIMEOUT,
+    },
 )
 
-# Initialize ML processor
-ml_processor = MLProcessor()
+# Worker processes configured in the parent before the prefork pool starts,
+# inherited by every child it forks
+_worker_concurrency = 1
 
 
-@celery_app.task(name="process_media")
-def process_media_task(media_id: str):
+@worker_init.connect
+def _setup_worker(sender=None, **kwargs):
+    """Preload the model in the parent of a prefork pool, or set up the only process of any other pool"""
+    global _worker_concurrency
+    _worker_concurrency = sender.concurrency or 1
+    # Prefetch suited to the queues this worker consumes (-Q), e.g. none ahead on bulk
+    consumed = sender.app.amqp.queues.consume_from or task_queues.QUEUES
+    multiplier = task_queues.prefetch_multiplier(list(consumed))
+    if multiplier is not None:
+        sender.prefetch_multiplier = multiplier
+    if get_implementation(sender.pool_cls) is not prefork.TaskPool:
+        # solo/threads pools run tasks in this process, threads share its intra-op pool
+        worker_lifecycle.init_process(1)
+    elif settings.WORKER_PRELOAD_MODEL:
+        worker_lifecycle.preload_model()
+
+
+@worker_process_init.connect
+def _setup_worker_process(**kwargs):
+    worker_lifecycle.init_process(_worker_concurrency)
+
+
+@before_task_publish.connect
+def _stamp_enqueue_time(headers=None, **kwargs):
+    headers.setdefault('enqueued_at', time.time())
+
+
+@task_prerun.connect
+def _task_started(task=None, **kwargs):
+    worker_lifecycle.task_started()
+    enqueued_at = getattr(task.request, 'enqueued_at', None)
+    queue = (task.request.delivery_info or {}).get('routing_key')
+    if enqueued_at and queue:
+        task_queues.record_wait(queue, max(0.0, time.time() - enqueued_at))
+
+
+@task_postrun.connect
+def _task_finished(task=None, **kwargs):
+    worker_lifecycle.task_finished(task.name if task else '?')
+
+
+@celery_app.task(
+    name="process_media",
+    bind=True,
+    # A task whose worker dies is delivered again, and resumes from the video's checkpoint
+    acks_late=True,
+    reject_on_worker_lost=True,
+    max_retries=settings.TASK_MAX_RETRIES,
+)
+def process_media_task(self, media_id: str):
     """
     Async task to process uploaded media (video/image)
     
@@ -44,8 +120,12 @@ def process_media_task(media_id: str):
     5. Create detection records
     6. Create alerts for significant detections
     7. Update status to 'completed'
+    
+    Safe to run again for the same media: a video resumes from its checkpoint
+    and completed media are left alone, so no detection is saved twice.
     """
     db = SessionLocal()
+    media = None
     
     try:
         # Get media record
@@ -56,84 +136,426 @@ def process_media_task(media_id: str):
         if not media:
             logger.error(f"Media {media_id} not found")
             return
+        if media.processing_status == "completed":
+            logger.info(f"Media {media_id} already processed")
+            return
         
-        logger.info(f"Processing media: {media_id}")
+        checkpoint = db.get(models.ProcessingCheckpoint, media.id)
+        logger.info(
+            f"Processing media: {media_id}" + (f" from frame {checkpoint.next_frame}" if checkpoint else "")
+        )
         
         # Update status
         media.processing_status = "processing"
         db.commit()
         
-        # Process based on file type
+        # Process based on file type. A re-upload of an already processed file is
+        # answered from the result cache, otherwise the worker loads the model on its first task.
         if media.file_type == "video":
-            detections = ml_processor.process_video(media.file_url)
+            options = _video_options(media)
+            detections = None if checkpoint else cached_result(media.content_hash, "video_tracks", **options)
+            if detections is not None:
+                _save_all(db, media, detections)
+                return
+            
+            # Long videos are split into segments for the other workers, the chord
+            # callback saves the merged result. One that was already started is resumed here instead.
+            segments = [] if checkpoint else _plan_video_segments(media.file_url)
+            if len(segments) > 1:
+                _, fps = probe_video(media.file_url)
+                # Segments stay on the upload's queue and priority
+                delivery_info = self.request.delivery_info or {}
+                routing = {
+                    'queue': delivery_info.get('routing_key') or task_queues.STANDARD,
+                    'priority': delivery_info.get('priority'),
+                }
+                chord(
+                    process_video_segment_task.s(media_id, start_frame, end_frame).set(**routing)
+                    for start_frame, end_frame in segments
+                )(merge_video_segments_task.s(media_id, stitch_window(fps)).set(**routing))
+                logger.info(f"Media {media_id} split into {len(segments)} segments")
+                return
+            
+            # One row per tracked object instead of one per sampled frame, each
+            # saved soon after its track ends
+            _process_video(db, media, options, checkpoint)
         else:  # image
-            detections = ml_processor.process_image(media.file_url)
-        
-        # Save detections to database
-        alert_created = False
-        for detection_data in detections:
-            detection = models.Detection(
-                media_id=UUID(media_id),
-                frame_number=detection_data.get('frame_number'),
-                detection_type=detection_data['type'],
-                confidence=detection_data['confidence'],
-                bounding_box=detection_data.get('bbox')
+            roi = media.camera.roi if media.camera else None
+            detections = cached_detections(
+                media.content_hash, "image", lambda: get_ml_processor().process_image(media.file_url, roi=roi), roi=roi
             )
-            db.add(detection)
-            db.flush()
-            
-            # Create alert for high-confidence detections
-            if detection_data['confidence'] >= 0.7:
-                severity = _determine_severity(detection_data['type'], detection_data['confidence'])
-                
-                alert = models.Alert(
-                    detection_id=detection.id,
-                    camera_id=media.camera_id,
-                    severity=severity,
-                    description=f"{detection_data['type']} detected with {detection_data['confidence']:.2%} confidence",
-                    thumbnail_url=detection_data.get('thumbnail_url')
-                )
-                db.add(alert)
-                alert_created = True
-        
-        # Update media status
-        media.processing_status = "completed"
-        media.processed_at = datetime.now(timezone.utc)
-        db.commit()
-        
-        logger.info(f"Media {media_id} processed successfully. Detections: {len(detections)}")
-        
-        # Broadcast alert if created (would integrate with WebSocket)
-        if alert_created:
-            logger.info(f"Alerts created for media {media_id}")
+            _save_all(db, media, detections)
         
     except Exception as e:
         logger.error(f"Error processing media {media_id}: {str(e)}")
-        media.processing_status = "failed"
-        db.commit()
+        db.rollback()
+        if not self.request.called_directly and self.request.retries < self.max_retries:
+            # Detections committed so far stay, the retry continues after them
+            raise self.retry(exc=e, countdown=settings.TASK_RETRY_DELAY)
+        if media is not None:
+            media.processing_status = "failed"
+            db.commit()
         raise
     
     finally:
         db.close()
 
 
-def _determine_severity(detection_type: str, confidence: float) -> str:
-    """Determine alert severity based on detection type and confidence"""
+@celery_app.task(name="process_video_segment", acks_late=True, reject_on_worker_lost=True)
+def process_video_segment_task(media_id: str, start_frame: int, end_frame: int) -> Dict:
+    """
+    Track summaries of one segment of a video, see segments.py
     
-    # Critical detections
-    if detection_type in ['weapon', 'gun', 'knife', 'fire']:
-        return 'critical'
+    Nothing is saved here, so a segment that is delivered again is simply processed again.
     
-    # High severity
-    if detection_type in ['accident', 'fight', 'violence']:
-        return 'high'
+    Returns:
+        {'start_frame', 'end_frame', 'tracks'} for merge_video_segments_task
+    """
+    db = SessionLocal()
+    media = None
+    try:
+        media = db.query(models.MediaUpload).filter(models.MediaUpload.id == UUID(media_id)).first()
+        if not media:
+            logger.error(f"Media {media_id} not found")
+            return
+        options = _video_options(media)
+        tracks = cached_detections(
+            media.content_hash,
+            "video_segment",
+            lambda: _video_track_summaries(media.file_url, start_frame=start_frame, end_frame=end_frame, **options),
+            start_frame=start_frame,
+            end_frame=end_frame,
+            **options
+        )
+        return {'start_frame': start_frame, 'end_frame': end_frame, 'tracks': tracks}
+    
+    except Exception as e:
+        # The chord callback won't run, so the media is marked here
+        logger.error(f"Error processing media {media_id} frames {start_frame}-{end_frame}: {str(e)}")
+        db.rollback()
+        if media is not None:
+            media.processing_status = "failed"
+            db.commit()
+        raise
+    
+    finally:
+        db.close()
+
+
+@celery_app.task(name="merge_video_segments", acks_late=True, reject_on_worker_lost=True)
+def merge_video_segments_task(segment_results: List[Dict], media_id: str, window: int):
+    """Chord callback: stitch the segments' tracks together, save them and store them in the result cache"""
+    db = SessionLocal()
+    media = None
+    try:
+        media = db.query(models.MediaUpload).filter(models.MediaUpload.id == UUID(media_id)).first()
+        if not media:
+            logger.error(f"Media {media_id} not found")
+            return
+        if media.processing_status == "completed":
+            logger.info(f"Media {media_id} already saved")
+            return
+        detections = merge_segment_tracks(segment_results, window)
+        _save_all(db, media, detections)
+        # Under the whole video's key, so a re-upload is answered however it would be split
+        store_result(media.content_hash, "video_tracks", detections, **_video_options(media))
     
-    # Medium severity
-    if detection_type in ['crowd', 'abandoned_vehicle', 'suspicious_activity']:
-        return 'medium'
+    except Exception as e:
+        logger.error(f"Error saving media {media_id}: {str(e)}")
+        db.rollback()
+        if media is not None:
+            media.processing_status = "failed"
+            db.commit()
+        raise
     
-    # Low severity (default)
-    return 'low'
+    finally:
+        db.close()
+
+
+def _process_video(db, media: models.MediaUpload, options: Dict, checkpoint: Optional[models.ProcessingCheckpoint]):
+    """
+    Run the model over a video and save its track summaries as they end, resuming from a checkpoint
+    
+    Detections are committed in chunks of DETECTION_PERSIST_CHUNK_SIZE (or
+    every DETECTION_PERSIST_INTERVAL seconds), each in the same transaction as
+    the checkpoint it advances: the frame to continue from and the tracks still
+    open there. A run that dies between two commits is resumed from the last
+    one, so it neither loses nor repeats detections.
+    
+    The checkpoint only moves forward from the frame this run read it at, so
+    if the broker delivers the task to a second worker while the first is
+    still going, the one that falls behind stops instead of saving twice.
+    
+    A critical track is saved and alerted on as soon as it is seen, not once
+    it ends, and its row is updated with the final summary when it does.
+    """
+    if checkpoint is None:
+        checkpoint = models.ProcessingCheckpoint(media_id=media.id, next_frame=0)
+        db.add(checkpoint)
+        db.commit()
+        state = {}
+        summaries = TrackSummaries()
+    else:
+        state = checkpoint.state or {}
+        summaries = TrackSummaries.from_state(state) if state else TrackSummaries()
+    # When each open track was first seen, and the rows already saved for the critical ones
+    first_seen = {int(track_id): datetime.fromisoformat(seen) for track_id, seen in state.get('first_seen', {}).items()}
+    alerted = {int(track_id): UUID(row_id) for track_id, row_id in state.get('alerted', {}).items()}
+    resumed_from = checkpoint.next_frame
+    expected_frame = resumed_from
+    # Kept for the result cache, which only takes the result of a whole run
+    produced = [] if resumed_from == 0 else None
+    
+    alert_count = 0
+    saved = 0
+    pending: List[Dict] = []
+    # Final summaries of the alerted tracks, for their rows
+    closed: List[Dict] = []
+    last_commit = time.monotonic()
+    
+    def stage(finished: List[Dict]) -> bool:
+        """Queue the ended tracks and the critical ones just seen, True if a critical alert is among them"""
+        # Stamped when a track is first seen, the alert latency is measured from here
+        now = datetime.now(timezone.utc)
+        urgent = False
+        for detection in finished:
+            track_id = detection.get('track_id')
+            detection = {**detection, 'detected_at': first_seen.pop(track_id, now)}
+            if track_id in alerted:
+                closed.append({**detection, 'detection_id': alerted.pop(track_id)})
+            else:
+                pending.append(detection)
+                urgent = urgent or is_critical(detection)
+        for summary in summaries.open_tracks():
+            track_id = summary['track_id']
+            first_seen.setdefault(track_id, now)
+            if track_id not in alerted and is_critical(summary):
+                alerted[track_id] = uuid4()
+                pending.append({**summary, 'detection_id': alerted[track_id], 'detected_at': first_seen[track_id]})
+                urgent = True
+        return urgent
+    
+    def commit(next_frame: Optional[int]) -> bool:
+        """Save pending and move the checkpoint to next_frame (None: remove it), False if another run has moved it"""
+        nonlocal alert_count, saved, expected_frame, last_commit
+        alerts = _save_detections(db, media, pending)
+        _update_detections(db, closed)
+        current = db.query(models.ProcessingCheckpoint).filter(
+            models.ProcessingCheckpoint.media_id == media.id,
+            models.ProcessingCheckpoint.next_frame == expected_frame
+        )
+        if next_frame is None:
+            claimed = current.delete(synchronize_session=False)
+        else:
+            claimed = current.update(
+                {
+                    'next_frame': next_frame,
+                    'state': {
+                        **summaries.state(),
+                        'first_seen': {str(track_id): seen.isoformat() for track_id, seen in first_seen.items()},
+                        'alerted': {str(track_id): str(row_id) for track_id, row_id in alerted.items()},
+                    },
+                    'updated_at': datetime.now(timezone.utc),
+                },
+                synchronize_session=False
+            )
+        if not claimed:
+            db.rollback()
+            logger.warning(f"Media {media.id} is being processed by another task, stopping this one")
+            return False
+        if next_frame is None:
+            media.processing_status = "completed"
+            media.processed_at = datetime.now(timezone.utc)
+        db.commit()
+        alert_events.publish_alerts(alerts)
+        alert_count += len(alerts)
+        saved += len(pending)
+        if pending and next_frame is not None:
+            logger.info(f"Media {media.id}: {saved} detections saved, resumable from frame {next_frame}")
+        pending.clear()
+        closed.clear()
+        expected_frame = next_frame
+        last_commit = time.monotonic()
+        return True
+    
+    frames = get_ml_processor().iter_video(media.file_url, start_frame=resumed_from, **options)
+    try:
+        for frame_number, frame_detections in frames:
+            finished = summaries.add(frame_detections)
+            if produced is not None:
+                produced.extend(finished)
+            # A critical alert is pushed right away instead of waiting for the chunk
+            if (stage(finished)
+                    or len(pending) + len(closed) >= settings.DETECTION_PERSIST_CHUNK_SIZE
+                    or time.monotonic() - last_commit >= settings.DETECTION_PERSIST_INTERVAL):
+                if not commit(frame_number + 1):
+                    return
+    finally:
+        frames.close()
+    
+    finished = summaries.flush()
+    stage(finished)
+    if not commit(None):
+        return
+    if produced is not None:
+        store_result(media.content_hash, "video_tracks", produced + finished, **options)
+    
+    logger.info(f"Media {media.id} processed successfully. Detections: {saved}, alerts: {alert_count}")
+
+
+def _save_all(db, media: models.MediaUpload, detections: List[Dict]):
+    """Save all detections of a media and mark it completed, in one transaction"""
+    alerts = []
+    for start in range(0, len(detections), settings.DETECTION_PERSIST_CHUNK_SIZE):
+        alerts += _save_detections(db, media, detections[start:start + settings.DETECTION_PERSIST_CHUNK_SIZE])
+    
+    # Update media status
+    media.processing_status = "completed"
+    media.processed_at = datetime.now(timezone.utc)
+    db.commit()
+    
+    # Pushed to the WebSocket clients by the API processes
+    alert_events.publish_alerts(alerts)
+    
+    logger.info(f"Media {media.id} processed successfully. Detections: {len(detections)}, alerts: {len(alerts)}")
+
+
+def _video_options(media: models.MediaUpload) -> Dict:
+    """Per-camera processing overrides for a video"""
+    camera = media.camera
+    return {
+        'motion_threshold': camera.motion_threshold if camera else None,
+        'imgsz': camera.inference_imgsz if camera else None,
+        'roi': camera.roi if camera else None,
+    }
+
+
+def _plan_video_segments(video_url: str) -> List[Tuple[int, int]]:
+    """Frame ranges to process in parallel, a single one (or none) to process the video in this task"""
+    if not settings.VIDEO_SEGMENTS_ENABLED or not is_seekable(video_url):
+        return []
+    total_frames, fps = probe_video(video_url)
+    return plan_segments(total_frames, fps, _worker_count())
+
+
+def _worker_count() -> int:
+    """Worker processes segments can be spread over"""
+    if settings.VIDEO_SEGMENT_WORKERS:
+        return settings.VIDEO_SEGMENT_WORKERS
+    try:
+        stats = celery_app.control.inspect(timeout=1.0).stats() or {}
+    except Exception as e:
+        logger.warning(f"Could not count workers, processing videos whole: {e}")
+        return 1
+    return sum(worker.get('pool', {}).get('max-concurrency', 1) for worker in stats.values()) or 1
+
+
+def _video_track_summaries(video_url: str, **options) -> List[Dict]:
+    """Track summaries of a video, or of the frames between options' start_frame and end_frame"""
+    summaries = TrackSummaries()
+    tracks = []
+    for _, frame_detections in get_ml_processor().iter_video(video_url, **options):
+        tracks.extend(summaries.add(frame_detections))
+    return tracks + summaries.flush()
+
+
+def _save_detections(db, media: models.MediaUpload, detections: List[Dict]) -> List[Dict]:
+    """
+    Insert detection rows, and alerts for high-confidence ones, in bulk
+    
+    Ids are generated here instead of flushing each row to learn its id, so a
+    chunk is one multi-row INSERT per table (COPY on PostgreSQL). A detection
+    may bring its own as 'detection_id'.
+    
+    Returns:
+        Events for the alerts added, to publish once they are committed (alert_events.publish_alerts)
+    """
+    now = datetime.now(timezone.utc)
+    detection_rows = []
+    alert_rows = []
+    events = []
+    for detection_data in detections:
+        detection_id = detection_data.get('detection_id') or uuid4()
+        detection_rows.append({
+            'id': detection_id,
+            'media_id': media.id,
+            'frame_number': detection_data.get('frame_number'),
+            'track_id': detection_data.get('track_id'),
+            'first_frame_number': detection_data.get('first_frame'),
+            'last_frame_number': detection_data.get('last_frame'),
+            'detection_type': detection_data['type'],
+            'confidence': detection_data['confidence'],
+            'bounding_box': detection_data.get('bbox'),
+            'detected_at': detection_data.get('detected_at') or now,
+        })
+        
+        # Create alert for high-confidence detections
+        if detection_data['confidence'] >= ALERT_CONFIDENCE:
+            alert_rows.append({
+                'id': uuid4(),
+                'detection_id': detection_id,
+                'camera_id': media.camera_id,
+                'severity': determine_severity(detection_data['type'], detection_data['confidence']),
+                'status': 'new',
+                'description': f"{detection_data['type']} detected with {detection_data['confidence']:.2%} confidence",
+                'thumbnail_url': detection_data.get('thumbnail_url'),
+                'created_at': now,
+            })
+            events.append(alert_events.alert_event(alert_rows[-1], detection_rows[-1]))
+    
+    for model, rows in ((models.Detection, detection_rows), (models.Alert, alert_rows)):
+        if not rows:
+            continue
+        if settings.DETECTION_BULK_COPY and db.get_bind().dialect.name == 'postgresql':
+            _copy_rows(db, model.__table__, rows)
+        else:
+            db.execute(insert(model), rows)
+    return events
+
+
+def _update_detections(db, detections: List[Dict]):
+    """Update the rows saved for tracks while they were in view (their 'detection_id') to their final summaries"""
+    if not detections:
+        return
+    db.execute(update(models.Detection), [
+        {
+            'id': detection['detection_id'],
+            'frame_number': detection.get('frame_number'),
+            'first_frame_number': detection.get('first_frame'),
+            'last_frame_number': detection.get('last_frame'),
+            'confidence': detection['confidence'],
+            'bounding_box': detection.get('bbox'),
+        }
+        for detection in detections
+    ])
+
+
+def _copy_rows(db, table, rows: List[Dict]):
+    """COPY rows into a PostgreSQL table over the session's connection (same transaction)"""
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_copy_value(row[column]) for column in columns])
+    buffer.seek(0)
+    
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer
+        )
+    finally:
+        cursor.close()
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, dict):
+        return json.dumps(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
 
 
 @celery_app.task(name="cleanup_old_media")
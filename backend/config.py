@@ -2,7 +2,7 @@
 Configuration settings for VigilAI Backend
 """
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List
+from typing import Dict, List
 import os
 
 
@@ -44,8 +44,51 @@ class Settings(BaseSettings):
     
     # ML Model
     MODEL_PATH: str = "models/yolov8n.pt"
+    INFERENCE_BACKEND: str = "torch"  # torch, onnxruntime or openvino (converted models are cached next to MODEL_PATH)
+    MODEL_PRECISION: str = "fp32"  # fp32 or int8 (onnxruntime/openvino only, build it with quantization.py)
+    QUANTIZATION_CALIBRATION_DIR: str = "static/videos"  # Videos the INT8 calibration frames are drawn from
+    QUANTIZATION_CALIBRATION_FRAMES: int = 200
     CONFIDENCE_THRESHOLD: float = 0.6
     FRAME_EXTRACTION_FPS: int = 1
+    INFERENCE_BATCH_SIZE: int = 8  # Frames per model call
+    INFERENCE_BATCH_MAX_WAIT_MS: int = 500  # Flush a partial batch after this long (live streams)
+    VIDEO_PIPELINE_ENABLED: bool = True  # Overlap decode, inference and parsing on separate threads
+    PIPELINE_QUEUE_SIZE: int = 2  # Batches buffered between pipeline stages
+    FRAME_SAMPLING_MODE: str = "grab"  # read (decode every frame), grab (decode sampled frames only), seek (jump between sampled frames)
+    INFERENCE_IMGSZ: int = 640  # Longest side of the letterboxed model input, multiple of 32 (per-camera override: Camera.inference_imgsz)
+    TRIAGE_IMGSZ: int = 0  # Low-resolution first pass, only frames with detections are re-run at INFERENCE_IMGSZ (0 disables)
+    
+    # Adaptive sampling: FRAME_EXTRACTION_FPS drops to a floor while nothing relevant is seen
+    # and ramps up for a while after a relevant detection
+    ADAPTIVE_SAMPLING_ENABLED: bool = True
+    SAMPLING_FLOOR_FPS: float = 0.2  # Rate after SAMPLING_IDLE_SECONDS without a trigger detection
+    SAMPLING_ACTIVE_FPS: float = 5.0  # Rate for SAMPLING_HOLD_SECONDS after a trigger detection
+    SAMPLING_IDLE_SECONDS: float = 30.0
+    SAMPLING_HOLD_SECONDS: float = 10.0
+    SAMPLING_TRIGGER_TYPES: List[str] = ["person", "weapon", "fire"]
+    
+    # Motion gating: skip inference on frames that barely changed
+    MOTION_GATING_ENABLED: bool = True
+    MOTION_THRESHOLD: float = 0.005  # Fraction of pixels that must change (per-camera override: Camera.motion_threshold)
+    MOTION_PIXEL_DELTA: int = 25  # Grayscale difference for a pixel to count as changed
+    MOTION_MAX_SKIPPED_FRAMES: int = 30  # Force an inference after this many consecutive skipped frames
+    MOTION_SKIP_MODE: str = "reuse"  # reuse (repeat the last detections) or none (report nothing) for skipped frames
+    
+    # Tracking: follow objects across sampled video frames, stored as one row per track
+    TRACKING_ENABLED: bool = True
+    TRACK_MATCH_IOU: float = 0.3  # Lowest IoU between a track's predicted box and a detection to match them
+    TRACK_HIGH_CONFIDENCE: float = 0.7  # Detections at or above this are associated first
+    TRACK_MAX_MISSES: int = 5  # Sampled frames a track may go undetected before it ends
+    
+    # Live stream ingest (stream_ingest.py), frames are sampled at FRAME_EXTRACTION_FPS
+    STREAM_BUFFER_SIZE: int = 2  # Newest frames kept per camera, older ones are dropped
+    STREAM_RECONNECT_MIN_DELAY: float = 1.0  # Seconds before the first reconnect, doubled on each failure
+    STREAM_RECONNECT_MAX_DELAY: float = 60.0
+    STREAM_CAMERA_SYNC_INTERVAL: int = 30  # Seconds between checks for added/removed live cameras
+    STREAM_ALERT_COOLDOWN: int = 60  # Seconds before the same detection type raises another alert on a camera
+    STREAM_SHARED_INFERENCE: bool = True  # Batch all cameras' frames through one InferenceServer
+    INFERENCE_SERVER_MAX_BATCH_SIZE: int = 16  # Most frames per shared model call
+    INFERENCE_SERVER_MAX_WAIT_MS: int = 20  # Longest a frame waits for its batch to fill
     
     # CORS
     CORS_ORIGINS: List[str] = [
@@ -60,9 +103,61 @@ class Settings(BaseSettings):
     ALLOWED_VIDEO_EXTENSIONS: List[str] = [".mp4", ".avi", ".mov", ".mkv"]
     ALLOWED_IMAGE_EXTENSIONS: List[str] = [".jpg", ".jpeg", ".png"]
     
+    # Media download
+    DOWNLOAD_CHUNK_SIZE: int = 1024 * 1024  # 1MB
+    DOWNLOAD_TIMEOUT: int = 30  # Seconds to connect / between received chunks
+    DOWNLOAD_RETRIES: int = 3
+    VIDEO_DIRECT_URL_DECODE: bool = True  # Let the decoder read HTTP videos directly instead of downloading first
+    
+    # Scans (/api/scan)
+    SCAN_WORKERS: int = 0  # Worker processes, 0 = one per available core (each loads its own model)
+    SCAN_ITEM_TIMEOUT: int = 300  # Seconds one video or stream may take before it is reported as timed out
+    SCAN_JOB_HISTORY: int = 50  # Finished scans kept for polling
+    SCAN_EARLY_EXIT: bool = True  # Coarse-to-fine scan of video files that stops at a confirmed critical threat
+    SCAN_COARSE_INTERVAL: float = 2.0  # Seconds between frames of the first, sparse pass
+    SCAN_CONFIRM_FRAMES: int = 1  # Consecutive dense frames a threat must be seen on to count (1 = no confirmation, as a full scan)
+    SCAN_DENSE_FPS: float = 5.0  # Rate of the confirmation frames after a hit
+    SCAN_BENIGN_FRAMES: int = 0  # Consecutive sparse frames without a threat candidate that end a scan as benign (0 = scan to the end)
+    SCAN_BENIGN_MAX_CONFIDENCE: float = 0.5  # Threat detections below this don't count as candidates for SCAN_BENIGN_FRAMES
+    
+    # Result cache: detections of unchanged files are reused instead of re-running the model
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_PATH: str = "cache/results.db"  # SQLite file, shared by all processes on the host (relative to backend/)
+    RESULT_CACHE_MAX_MB: int = 256  # Least recently used results are evicted beyond this (compressed size)
+    
     # Processing
     CELERY_BROKER_URL: str = "redis://localhost:6379/0"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/0"
+    DETECTION_PERSIST_CHUNK_SIZE: int = 100  # Detections committed at once while a video is still being processed
+    DETECTION_PERSIST_INTERVAL: float = 5.0  # Seconds before a partial chunk is committed anyway
+    DETECTION_BULK_COPY: bool = True  # Write detection chunks with COPY on PostgreSQL (executemany elsewhere)
+    TASK_MAX_RETRIES: int = 3  # Retries of a failed processing task, each resuming from the video's checkpoint
+    TASK_RETRY_DELAY: int = 10  # Seconds before a retry
+    TASK_VISIBILITY_TIMEOUT: int = 6 * 3600  # Seconds before the Redis broker redelivers a task that was never acknowledged, longer than any video takes
+    
+    # Alert events from the workers to the WebSocket clients, over a Redis stream on the broker (alert_events.py)
+    ALERT_EVENTS_ENABLED: bool = True
+    ALERT_EVENT_STREAM: str = "vigilai:alerts"
+    ALERT_EVENT_STREAM_MAXLEN: int = 10000  # Approximate number of events kept in the stream
+    ALERT_EVENT_BLOCK_MS: int = 1000  # Longest an API process waits on the stream per read
+    ALERT_LATENCY_WINDOW: int = 1000  # Latency samples kept per stage in each API process
+    
+    # Celery workers (worker_lifecycle.py)
+    WORKER_PRELOAD_MODEL: bool = True  # Load the model in the prefork parent, children share it copy-on-write
+    WORKER_THREADS_PER_CHILD: int = 0  # torch/OpenCV threads per worker process, 0 = cores / concurrency
+    WORKER_WARMUP: bool = True  # Dummy inference in each worker process before it takes tasks
+    
+    # Task queues (task_queues.py): realtime, standard and bulk, each with its own workers
+    REALTIME_MAX_MB: float = 20.0  # Videos up to this size (and all images) go to the realtime queue
+    BULK_MIN_MB: float = 200.0  # Videos from this size go to the bulk queue
+    QUEUE_PREFETCH_MULTIPLIERS: Dict[str, int] = {"realtime": 1, "standard": 2, "bulk": 1}  # Per consumed queue, the smallest applies
+    QUEUE_METRICS_WINDOW: int = 1000  # Recent wait times kept per queue
+    
+    # Long videos are split into segments processed by parallel Celery tasks (segments.py)
+    VIDEO_SEGMENTS_ENABLED: bool = True
+    VIDEO_SEGMENT_MIN_SECONDS: float = 300.0  # Shortest segment, videos under twice this are processed whole
+    VIDEO_SEGMENTS_PER_WORKER: int = 2  # Segments per worker process, so one slow segment doesn't hold up the rest
+    VIDEO_SEGMENT_WORKERS: int = 0  # Worker processes to plan for, 0 = ask the running workers
     
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=True)
 
@@ -2,9 +2,18 @@
 Database configuration and session management
 """
 from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import sessionmaker, declarative_base
 from config import settings
 
+
+@compiles(UUID, "sqlite")
+def _compile_sqlite_uuid(type_, compiler, **kw):
+    # SQLite has no UUID type, the ids are stored as 32 hex characters there
+    return "CHAR(32)"
+
+
 # Create database engine
 connect_args = {"check_same_thread": False} if settings.USE_SQLITE else {}
 engine = create_engine(
@@ -0,0 +1,156 @@
+"""
+Inference backends for the YOLO model (PyTorch, ONNX Runtime, OpenVINO)
+
+Exported models are cached next to MODEL_PATH and loaded through ultralytics,
+so every backend returns the same Results objects to MLProcessor.
+
+Usage (from backend/):
+    python inference_backends.py export --backend onnxruntime
+    python inference_backends.py export --backend openvino --force
+"""
+from pathlib import Path
+from typing import Optional
+import argparse
+import logging
+
+from ultralytics import YOLO
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('torch', 'onnxruntime', 'openvino')
+PRECISIONS = ('fp32', 'int8')
+
+# ultralytics export format for each converted backend
+EXPORT_FORMATS = {
+    'onnxruntime': 'onnx',
+    'openvino': 'openvino',
+}
+
+
+def _check_backend(backend: str):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {BACKENDS}")
+
+
+def _check_precision(backend: str, precision: str):
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown model precision '{precision}', expected one of {PRECISIONS}")
+    if precision == 'int8' and backend == 'torch':
+        raise ValueError("INT8 models run on the onnxruntime or openvino backend, not torch")
+
+
+def exported_model_path(backend: str, model_path: Optional[str] = None, precision: str = 'fp32') -> Path:
+    """Where the converted model for a backend lives (next to the PyTorch weights)"""
+    _check_backend(backend)
+    _check_precision(backend, precision)
+    base = Path(model_path or settings.MODEL_PATH)
+    stem = base.stem if precision == 'fp32' else f"{base.stem}_{precision}"
+
+    if backend == 'onnxruntime':
+        return base.with_name(f"{stem}.onnx")
+    if backend == 'openvino':
+        return base.parent / f"{stem}_openvino_model"
+    return base
+
+
+def load_torch_model(model_path: Optional[str] = None) -> YOLO:
+    """Load the PyTorch weights"""
+    model_path = model_path or settings.MODEL_PATH
+
+    # Fix for WeightsUnpickler error with newer ultralytics/torch
+    import torch
+    from unittest.mock import patch
+
+    # Monkeypatch torch.load to force weights_only=False
+    # This is required because ultralytics 8.0.0 is not fully compatible with PyTorch 2.6+ default security settings
+    original_load = torch.load
+
+    def safe_load(*args, **kwargs):
+        if 'weights_only' not in kwargs:
+            kwargs['weights_only'] = False
+        return original_load(*args, **kwargs)
+
+    with patch('torch.load', side_effect=safe_load):
+        return YOLO(model_path)
+
+
+def export_model(backend: str, model_path: Optional[str] = None, force: bool = False) -> Path:
+    """
+    Convert the PyTorch model for a backend, reusing a cached export if present
+
+    Args:
+        backend: 'onnxruntime' or 'openvino'
+        model_path: PyTorch weights, defaults to settings.MODEL_PATH
+        force: Re-export even if a converted model already exists
+
+    Returns:
+        Path to the converted model
+    """
+    _check_backend(backend)
+    if backend == 'torch':
+        return exported_model_path(backend, model_path)
+
+    target = exported_model_path(backend, model_path)
+    if target.exists() and not force:
+        return target
+
+    logger.info(f"Exporting {model_path or settings.MODEL_PATH} for {backend}")
+    model = load_torch_model(model_path)
+    # Dynamic axes so batched inference and any input size work with the exported model
+    exported = Path(model.export(format=EXPORT_FORMATS[backend], dynamic=True, verbose=False))
+
+    if exported.resolve() != target.resolve():
+        exported.rename(target)
+    logger.info(f"Exported {backend} model to {target}")
+    return target
+
+
+def load_model(
+    backend: Optional[str] = None,
+    model_path: Optional[str] = None,
+    precision: Optional[str] = None
+) -> YOLO:
+    """
+    Load the detection model for the selected backend and precision
+
+    FP32 models are exported on first use and cached next to MODEL_PATH.
+    INT8 models need a calibration pass first (see quantization.py).
+    """
+    backend = backend or settings.INFERENCE_BACKEND
+    precision = precision or settings.MODEL_PRECISION
+    _check_backend(backend)
+    _check_precision(backend, precision)
+
+    if backend == 'torch':
+        return load_torch_model(model_path)
+
+    if precision == 'int8':
+        path = exported_model_path(backend, model_path, precision)
+        if not path.exists():
+            raise FileNotFoundError(
+                f"No INT8 model at {path}, create it with: python quantization.py quantize --backend {backend}"
+            )
+        return YOLO(str(path), task='detect')
+
+    return YOLO(str(export_model(backend, model_path)), task='detect')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the YOLO model for an inference backend")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Convert MODEL_PATH and cache it next to the weights")
+    export_parser.add_argument("--backend", choices=list(EXPORT_FORMATS), required=True)
+    export_parser.add_argument("--model-path", default=None, help="Defaults to settings.MODEL_PATH")
+    export_parser.add_argument("--force", action="store_true", help="Re-export even if a cached model exists")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        print(export_model(args.backend, args.model_path, force=args.force))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
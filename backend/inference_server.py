@@ -0,0 +1,193 @@
+"""
+Shared inference service that batches frames across cameras
+
+Camera pipelines submit single frames and get a Future back. One thread
+gathers pending frames into dynamic batches. A batch closes when it is
+full (max_batch_size) or when its oldest frame has waited max_wait_ms. It
+then runs through one shared model, and each result goes back to the
+Future of the frame it belongs to. N cameras then cost one model in memory
+and a few batched calls per tick, instead of N batch-of-1 calls.
+"""
+from collections import Counter
+from concurrent.futures import Future
+from typing import Dict, List, NamedTuple, Optional
+import logging
+import queue
+import threading
+import time
+
+import numpy as np
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Marks shutdown on the request queue
+_STOP = object()
+
+# Upper bounds of the queue depth histogram buckets
+DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128)
+_DEPTH_LABELS = [f"<={bucket}" for bucket in DEPTH_BUCKETS] + [f">{DEPTH_BUCKETS[-1]}"]
+
+
+class InferenceRequest(NamedTuple):
+    frame: np.ndarray
+    frame_number: int
+    imgsz: Optional[int]
+    future: Future
+    submitted_at: float
+
+
+class InferenceServer:
+    """
+    Dynamic batching front end for one MLProcessor
+
+    Frames with different imgsz go into separate model calls within the
+    same batch window.
+    """
+
+    def __init__(
+        self,
+        processor=None,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None
+    ):
+        """
+        Args:
+            processor: MLProcessor to run, defaults to the process-wide shared one
+            max_batch_size: Most frames per model call, defaults to settings.INFERENCE_SERVER_MAX_BATCH_SIZE
+            max_wait_ms: Longest a frame waits for a batch to fill, defaults to settings.INFERENCE_SERVER_MAX_WAIT_MS
+        """
+        if processor is None:
+            from ml_service import get_ml_processor
+            processor = get_ml_processor()
+        self.processor = processor
+        self.max_batch_size = max(1, max_batch_size or settings.INFERENCE_SERVER_MAX_BATCH_SIZE)
+        wait_ms = settings.INFERENCE_SERVER_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms
+        self.max_wait = wait_ms / 1000
+
+        self._requests: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        self._batch_sizes: Counter = Counter()
+        self._queue_depths: Counter = Counter()
+        self._waits: List[float] = []
+        self._frames = 0
+        self._batches = 0
+
+    def start(self) -> "InferenceServer":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._serve, name="inference-server", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 10.0):
+        """Finish the frames already queued, then stop"""
+        if self._thread is not None:
+            self._requests.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, frame: np.ndarray, frame_number: int = 0, imgsz: Optional[int] = None) -> Future:
+        """Queue one frame, the Future resolves to its list of detections"""
+        if self._thread is None:
+            raise RuntimeError("Inference server is not running")
+        future = Future()
+        self._requests.put(InferenceRequest(frame, frame_number, imgsz, future, time.monotonic()))
+        return future
+
+    def process_frames(
+        self,
+        frames: List[np.ndarray],
+        frame_numbers: List[int],
+        imgsz: Optional[int] = None
+    ) -> List[Dict]:
+        """Drop-in for MLProcessor.process_frames that goes through the shared batches"""
+        futures = [self.submit(frame, number, imgsz) for frame, number in zip(frames, frame_numbers)]
+        return [detection for future in futures for detection in future.result()]
+
+    def queue_depth(self) -> int:
+        return self._requests.qsize()
+
+    def stats(self) -> Dict:
+        """Batch size and queue depth histograms, plus queueing latency, since start"""
+        with self._stats_lock:
+            waits_ms = np.array(self._waits) * 1000 if self._waits else np.zeros(1)
+            return {
+                "frames": self._frames,
+                "batches": self._batches,
+                "mean_batch_size": self._frames / self._batches if self._batches else 0.0,
+                "batch_sizes": dict(sorted(self._batch_sizes.items())),
+                "queue_depth": self.queue_depth(),
+                "queue_depths": {label: self._queue_depths[label] for label in _DEPTH_LABELS if self._queue_depths[label]},
+                "queue_wait_ms": {
+                    "p50": float(np.percentile(waits_ms, 50)),
+                    "p95": float(np.percentile(waits_ms, 95)),
+                    "max": float(waits_ms.max()),
+                },
+            }
+
+    def _serve(self):
+        stopping = False
+        while not stopping:
+            first = self._requests.get()
+            if first is _STOP:
+                break
+            batch, stopping = self._collect(first)
+            self._run(batch)
+
+        # Anything submitted after stop() won't be served
+        while True:
+            try:
+                request = self._requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is not _STOP:
+                request.future.set_exception(RuntimeError("Inference server stopped"))
+
+    def _collect(self, first: InferenceRequest):
+        """Gather requests until the batch is full or the first one has waited max_wait"""
+        batch = [first]
+        deadline = first.submitted_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                request = self._requests.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if request is _STOP:
+                return batch, True
+            batch.append(request)
+        return batch, False
+
+    def _run(self, batch: List[InferenceRequest]):
+        started = time.monotonic()
+        depth = self.queue_depth()
+        with self._stats_lock:
+            self._frames += len(batch)
+            self._batches += 1
+            self._batch_sizes[len(batch)] += 1
+            self._queue_depths[next((f"<={b}" for b in DEPTH_BUCKETS if depth <= b), _DEPTH_LABELS[-1])] += 1
+            self._waits.extend(started - request.submitted_at for request in batch)
+            # Keep the latency sample bounded on a long-running node
+            del self._waits[:-10000]
+
+        groups: Dict[Optional[int], List[InferenceRequest]] = {}
+        for request in batch:
+            groups.setdefault(request.imgsz, []).append(request)
+
+        for imgsz, requests in groups.items():
+            # Skip frames whose caller gave up and cancelled
+            requests = [request for request in requests if request.future.set_running_or_notify_cancel()]
+            if not requests:
+                continue
+            try:
+                per_frame = self.processor.infer_batch(
+                    [request.frame for request in requests], [request.frame_number for request in requests], imgsz
+                )
+            except Exception as e:
+                logger.error(f"Batch of {len(requests)} frames failed: {e}")
+                for request in requests:
+                    request.future.set_exception(e)
+                continue
+            for request, detections in zip(requests, per_frame):
+                request.future.set_result(detections)
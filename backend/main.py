@@ -1,13 +1,13 @@
 """
 VigilAI FastAPI Backend - Main Application Entry Point
 """
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 
-from datetime import datetime
 import models
 import cameras, media, alerts, analytics, websocket
 from config import settings
@@ -15,10 +15,11 @@ from database import engine, Base
 import os
 from sqlalchemy.orm import Session
 from database import SessionLocal
-from ml_processor import MLProcessor
-
-# Initialize ML Processor
-ml_processor = MLProcessor()
+from ml_service import is_ml_processor_loaded
+from result_cache import get_result_cache
+import scan_jobs
+from scan_jobs import ScanItem
+import alert_events
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -41,10 +42,19 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"Database connection failed: {e}. Running without DB persistence.")
     
+    # Push the alerts the Celery workers publish to this process's WebSocket clients
+    subscriber = None
+    if settings.ALERT_EVENTS_ENABLED:
+        subscriber = alert_events.AlertSubscriber(websocket.broadcast_new_alert)
+        subscriber.start()
+    
     yield
     
     # Shutdown
     logger.info("Shutting down VigilAI Backend...")
+    if subscriber:
+        await subscriber.stop()
+    scan_jobs.shutdown_pool()
 
 
 # Initialize FastAPI app
@@ -85,46 +95,19 @@ def get_db():
     finally:
         db.close()
 
-def analyze_single_video(video_path):
-    """Processes one video using MLProcessor and returns assessment."""
-    try:
-        detections = ml_processor.process_video(video_path)
-        
-        # Determine if there's a threat (weapon, fire, smoke)
-        threat_types = ['weapon', 'fire', 'smoke']
-        
-        # For demo purposes/specific suspicious scenarios, consider 'person' a threat if context implies it
-        if "Burglary" in str(video_path) or "suspicious" in str(video_path).lower():
-            threat_types.append('person')
-            logger.info(f"Suscpicious video detected: {video_path}. Enabling person detection as threat.")
-
-        threats = [d for d in detections if d['type'] in threat_types]
-        
-        highest_conf = 0.0
-        if threats:
-            highest_conf = max(d['confidence'] for d in threats)
-        elif detections:
-            # If no threats, use highest confidence of other detections (e.g. person) 
-            highest_conf = max(d['confidence'] for d in detections)
-
-        is_threat = len(threats) > 0
-        severity = "normal"
-        if is_threat:
-            # If any threat is a weapon OR it's a person in a suspicious video, mark as critical
-            is_suspicious_video = "Burglary" in str(video_path) or "suspicious" in str(video_path).lower()
-            
-            if any(d['type'] == 'weapon' for d in threats) or (is_suspicious_video and any(d['type'] == 'person' for d in threats)):
-                severity = "critical"
-            else:
-                severity = "high"
-                
-        return highest_conf, is_threat, severity
-    except Exception as e:
-        logger.error(f"Error analyzing video {video_path}: {e}")
-        return 0.0, False, "normal"
-
 @app.post("/api/scan")
-async def scan_multiple_videos(video_filename: str = None, db: Session = Depends(get_db)):
+async def scan_multiple_videos(
+    response: Response,
+    video_filename: str = None,
+    async_mode: bool = False,
+    db: Session = Depends(get_db)
+):
+    """
+    Scan stored videos and live cameras for threats on the scan process pool
+
+    With async_mode the scan runs in the background and the response is just
+    its scan_id. Poll GET /api/scan/{scan_id} for progress and results.
+    """
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
     VIDEO_DIR = os.path.join(BASE_DIR, "static", "videos")
     if not os.path.exists(VIDEO_DIR):
@@ -140,56 +123,35 @@ async def scan_multiple_videos(video_filename: str = None, db: Session = Depends
         # Otherwise scan all videos
         video_files = [f for f in os.listdir(VIDEO_DIR) if f.endswith(('.mp4', '.avi'))]
     
-    # Dictionary to store all results
-    scan_report = {}
-    alert_triggered = False
-    mcp_notified = False
+    items = [ScanItem(video_name, os.path.join(VIDEO_DIR, video_name)) for video_name in video_files]
 
-    for video_name in video_files:
-        video_path = os.path.join(VIDEO_DIR, video_name)
-        
-        # 1. Run ML logic for this specific video
-        confidence, is_threat, severity = analyze_single_video(video_path)
-        
-        if is_threat:
-            alert_triggered = True
-            if severity == "critical":
-                mcp_notified = True
-
-        # 2. Add to our return dictionary
-        scan_report[video_name] = {
-            "status": "Suspicious" if is_threat else "Normal",
-            "severity": severity,
-            "confidence": round(confidence, 2),
-            "timestamp": datetime.now().strftime("%H:%M:%S")
-        }
-
-    # 3. Scan live streams from the database
+    # Scan live streams from the database too
     live_cameras = db.query(models.Camera).filter(models.Camera.is_live == True).all()
     for camera in live_cameras:
         if not camera.stream_url:
             continue
-            
-        confidence, is_threat, severity = analyze_single_video(camera.stream_url)
-        
-        if is_threat:
-            alert_triggered = True
-            if severity == "critical":
-                mcp_notified = True
-
-        scan_report[f"Stream: {camera.name}"] = {
-            "status": "Suspicious" if is_threat else "Normal",
-            "severity": severity,
-            "confidence": round(confidence, 2),
-            "timestamp": datetime.now().strftime("%H:%M:%S")
-        }
+        items.append(ScanItem(
+            f"Stream: {camera.name}", camera.stream_url, camera.motion_threshold, camera.inference_imgsz, camera.roi
+        ))
 
-    return {
-        "alert": alert_triggered,
-        "mcp_notified": mcp_notified,
-        "total_scanned": len(video_files) + len(live_cameras),
-        "results": scan_report
-    }
+    job = scan_jobs.create_job(items)
+    if async_mode:
+        scan_jobs.start_job(job)
+        response.status_code = 202
+        return {"scan_id": job.id, "status": job.status, "total": len(items)}
+
+    # Wait on a thread so the event loop keeps serving other requests meanwhile
+    await asyncio.to_thread(scan_jobs.run_job, job)
+    return {"scan_id": job.id, **job.report()}
+
+
+@app.get("/api/scan/{scan_id}")
+async def get_scan(scan_id: str):
+    """Progress of a scan and the results of the items finished so far"""
+    job = scan_jobs.get_job(scan_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Scan not found")
+    return job.progress()
 
 
 # Include routers
@@ -220,9 +182,12 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
+    cache = get_result_cache()
     return {
         "status": "healthy",
-        "service": "vigilai-backend"
+        "service": "vigilai-backend",
+        "model_loaded": is_ml_processor_loaded(),
+        "result_cache": cache.stats() if cache else None
     }
 
 
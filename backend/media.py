@@ -2,6 +2,7 @@
 Media Upload and Processing API Endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import Optional
 from uuid import UUID
@@ -13,6 +14,8 @@ from db import models
 import schemas
 from storage import StorageService
 from celery_app import process_media_task
+from result_cache import file_digest
+from task_queues import route_media, wait_stats
 
 router = APIRouter()
 
@@ -50,6 +53,11 @@ async def upload_media(
             detail="Unsupported file type"
         )
     
+    # Hash before storing, so a re-upload of the same file can reuse its detections.
+    # Off the event loop, a large video takes a while to read.
+    content_hash = await run_in_threadpool(file_digest, file.file)
+    file_size = file.size
+    
     # Upload to storage
     try:
         storage_service = get_storage_service()
@@ -67,18 +75,32 @@ async def upload_media(
         file_name=file.filename,
         file_type=file_type,
         file_url=file_url,
+        content_hash=content_hash,
         processing_status="pending"
     )
     db.add(media_upload)
     db.commit()
     db.refresh(media_upload)
     
-    # Trigger async processing
-    process_media_task.delay(str(media_upload.id))
+    # Trigger async processing, on the queue for its size and the camera's priority
+    queue, priority = route_media(file_type, file_size, camera.priority)
+    process_media_task.apply_async((str(media_upload.id),), queue=queue, priority=priority)
     
     return media_upload
 
 
+@router.get("/queues")
+def get_queue_wait_times():
+    """Recent wait times (publish to start) of processing tasks per queue"""
+    try:
+        return wait_stats()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Queue metrics unavailable: {str(e)}"
+        )
+
+
 @router.get("/{media_id}", response_model=schemas.MediaUpload)
 def get_media_status(
     media_id: UUID,
@@ -0,0 +1,95 @@
+"""
+Media source helpers: pooled HTTP downloads streamed to disk
+"""
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+from urllib.parse import urlparse
+import logging
+import os
+import tempfile
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def is_http_url(url: str) -> bool:
+    """Check if a media location is an HTTP(S) URL rather than a local path"""
+    return url.startswith('http://') or url.startswith('https://')
+
+
+def get_http_session() -> requests.Session:
+    """Shared requests.Session with connection pooling and retries on transient errors"""
+    global _session
+
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=settings.DOWNLOAD_RETRIES,
+                    backoff_factor=0.5,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=frozenset(['GET', 'HEAD'])
+                )
+                adapter = HTTPAdapter(max_retries=retry, pool_connections=4, pool_maxsize=16)
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+
+    return _session
+
+
+def download_to_file(url: str, path: str) -> int:
+    """
+    Stream an HTTP body to disk in chunks
+
+    Args:
+        url: HTTP(S) URL to download
+        path: Destination file path
+
+    Returns:
+        Number of bytes written
+    """
+    written = 0
+    with get_http_session().get(url, stream=True, timeout=settings.DOWNLOAD_TIMEOUT) as response:
+        response.raise_for_status()
+        with open(path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=settings.DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+                written += len(chunk)
+
+    logger.info(f"Downloaded {written} bytes from {url}")
+    return written
+
+
+@contextmanager
+def local_media_path(media_url: str, default_suffix: str = '.mp4') -> Iterator[str]:
+    """
+    Yield a local filesystem path for a media URL or path
+
+    Local paths are used in place without copying. HTTP(S) URLs are streamed
+    into a temporary file, which is removed on exit.
+    """
+    if not is_http_url(media_url):
+        yield media_url
+        return
+
+    suffix = Path(urlparse(media_url).path).suffix or default_suffix
+    fd, tmp_path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+
+    try:
+        download_to_file(media_url, tmp_path)
+        yield tmp_path
+    finally:
+        Path(tmp_path).unlink(missing_ok=True)
@@ -1,48 +1,63 @@
 """
 Machine Learning processor for video/image analysis using YOLOv8
 """
-from ultralytics import YOLO
 import cv2
-import requests
-from pathlib import Path
-import tempfile
+import functools
+import itertools
 import numpy as np
-from typing import List, Dict
+from typing import Callable, List, Dict, Iterable, Iterator, Optional, Tuple
 import logging
+import threading
+import time
 
 from config import settings
+from inference_backends import load_model
+from media_io import is_http_url, local_media_path
+from video_pipeline import VideoPipeline
+from motion import MotionGate
+from preprocess import LetterboxPreprocessor, Transform, round_imgsz, to_frame_coordinates
+from tracker import ByteTracker
+from roi import RegionOfInterest
+from sampling import AdaptiveSampler
 
 logger = logging.getLogger(__name__)
 
+SAMPLING_MODES = ('read', 'grab', 'seek')
+
 
 class MLProcessor:
     """ML processor for detecting objects/activities in media"""
     
-    def __init__(self):
-        """Initialize YOLO model"""
+    def __init__(self, backend: Optional[str] = None, precision: Optional[str] = None):
+        """
+        Initialize YOLO model
+        
+        Args:
+            backend: Inference backend ('torch', 'onnxruntime' or 'openvino'),
+                defaults to settings.INFERENCE_BACKEND
+            precision: Model precision ('fp32' or 'int8'), defaults to settings.MODEL_PRECISION
+        """
+        self.backend = backend or settings.INFERENCE_BACKEND
+        self.precision = precision or settings.MODEL_PRECISION
         try:
-            # Fix for WeightsUnpickler error with newer ultralytics/torch
-            import torch
-            from unittest.mock import patch
-
-            # Monkeypatch torch.load to force weights_only=False
-            # This is required because ultralytics 8.0.0 is not fully compatible with PyTorch 2.6+ default security settings
-            original_load = torch.load
-            
-            def safe_load(*args, **kwargs):
-                if 'weights_only' not in kwargs:
-                    kwargs['weights_only'] = False
-                return original_load(*args, **kwargs)
-
-            with patch('torch.load', side_effect=safe_load):
-                self.model = YOLO(settings.MODEL_PATH)
-            
-            logger.info(f"Loaded model from {settings.MODEL_PATH}")
+            self.model = load_model(self.backend, precision=self.precision)
+            logger.info(f"Loaded model from {settings.MODEL_PATH} ({self.backend} backend, {self.precision})")
         except Exception as e:
             logger.error(f"Failed to load model: {e}")
             raise
         
         self.confidence_threshold = settings.CONFIDENCE_THRESHOLD
+        self.batch_size = max(1, settings.INFERENCE_BATCH_SIZE)
+        self.last_pipeline_stats = {}
+        self.motion_stats = {'frames_checked': 0, 'inferences_skipped': 0}
+        self.triage_stats = {'frames': 0, 'escalated': 0}
+        self.sampling_stats = {'idle': 0, 'normal': 0, 'active': 0, 'transitions': 0}
+        self._stats_lock = threading.Lock()
+        # The ultralytics predictor keeps per-call state, so threads sharing this processor
+        # (e.g. live cameras without STREAM_SHARED_INFERENCE) take turns
+        self._model_lock = threading.Lock()
+        # Letterbox buffers are reused per thread, a video's frames are prepared on one thread at a time
+        self._local = threading.local()
         
         # Define detection type mapping
         self.detection_types = {
@@ -64,118 +79,479 @@ class MLProcessor:
             'fire': 'fire',
             'smoke': 'smoke'
         }
+        
+        self._build_class_lookup()
+    
+    def _build_class_lookup(self):
+        """
+        Precompute class id -> detection type arrays from the model's class names
+        
+        Also collects the class ids we care about so the model can drop every
+        other class before NMS.
+        """
+        names = self.model.names
+        num_classes = max(names) + 1 if names else 0
+        
+        self._type_names = sorted(set(self.detection_types.values()))
+        self._class_names = [names.get(class_id, '') for class_id in range(num_classes)]
+        self._class_type_index = np.full(num_classes, -1, dtype=np.int64)
+        
+        for class_id, class_name in names.items():
+            detection_type = self.detection_types.get(class_name.lower())
+            if detection_type:
+                self._class_type_index[class_id] = self._type_names.index(detection_type)
+        
+        relevant = np.flatnonzero(self._class_type_index >= 0).tolist()
+        self.relevant_classes = relevant or None
     
-    def process_video(self, video_url: str) -> List[Dict]:
+    def process_video(
+        self,
+        video_url: str,
+        sampling: Optional[str] = None,
+        motion_threshold: Optional[float] = None,
+        imgsz: Optional[int] = None,
+        triage_imgsz: Optional[int] = None,
+        roi: Optional[List] = None
+    ) -> List[Dict]:
         """
         Process video file and detect objects/activities
         
         Args:
             video_url: URL or path to video file
+            sampling: Frame sampling mode ('read', 'grab' or 'seek'),
+                defaults to settings.FRAME_SAMPLING_MODE
+            motion_threshold: Per-camera motion sensitivity, defaults to settings.MOTION_THRESHOLD
+            imgsz: Per-camera model input size, defaults to settings.INFERENCE_IMGSZ
+            triage_imgsz: Low-resolution first pass size, defaults to settings.TRIAGE_IMGSZ (0 disables)
+            roi: Per-camera region of interest polygons (normalized), None processes the whole frame
             
         Returns:
             List of detection dictionaries
         """
-        detections = []
-        is_stream = self._is_stream(video_url)
+        frames = self.iter_video(video_url, sampling, motion_threshold, imgsz, triage_imgsz, roi)
+        return [detection for _, frame_detections in frames for detection in frame_detections]
+
+    def iter_video(
+        self,
+        video_url: str,
+        sampling: Optional[str] = None,
+        motion_threshold: Optional[float] = None,
+        imgsz: Optional[int] = None,
+        triage_imgsz: Optional[int] = None,
+        roi: Optional[List] = None,
+        start_frame: int = 0,
+        end_frame: Optional[int] = None
+    ) -> Iterator[Tuple[int, List[Dict]]]:
+        """
+        Process a video like process_video, yielding (frame_number, detections) per sampled frame
+        
+        Results come out while the video is still being decoded, so callers can
+        act on (or persist) them incrementally instead of holding the whole
+        video's detections. Closing the iterator early stops decoding.
+        
+        start_frame and end_frame (exclusive) limit a video file to one segment
+        of it, which is seeked to. Live streams ignore them.
+        """
+        sampling = sampling or settings.FRAME_SAMPLING_MODE
+        if sampling not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode '{sampling}', expected one of {SAMPLING_MODES}")
+        
+        return self._iter_video(
+            video_url, sampling, motion_threshold, imgsz, triage_imgsz, roi, start_frame, end_frame
+        )
+
+    def _iter_video(
+        self,
+        video_url: str,
+        sampling: str,
+        motion_threshold: Optional[float],
+        imgsz: Optional[int],
+        triage_imgsz: Optional[int],
+        roi: Optional[List],
+        start_frame: int = 0,
+        end_frame: Optional[int] = None
+    ) -> Iterator[Tuple[int, List[Dict]]]:
+        options = (motion_threshold, imgsz, triage_imgsz, roi)
+        segment = {'start_frame': start_frame, 'end_frame': end_frame}
+        count = 0
         
-        if is_stream:
+        if self._is_stream(video_url):
             # Process live stream directly
             cap = cv2.VideoCapture(video_url)
             if not cap.isOpened():
                 logger.error(f"Failed to open stream: {video_url}")
-                return []
-            
-            fps = cap.get(cv2.CAP_PROP_FPS) or 30
-            frame_skip = max(1, int(fps // settings.FRAME_EXTRACTION_FPS))
+                return
             
-            # For live streams, we limit processing to a fixed number of frames
-            # to avoid blocking. e.g., process 10 seconds of stream.
-            max_frames = int(fps * 10) 
-            frame_count = 0
-            processed_count = 0
-            
-            while cap.isOpened() and frame_count < max_frames:
-                ret, frame = cap.read()
-                if not ret:
-                    break
+            # Live streams can't seek, grabbing is the cheapest mode they support
+            if sampling == 'seek':
+                sampling = 'grab'
+            for frame_number, frame_detections in self._iter_capture(cap, sampling, *options, is_stream=True):
+                count += len(frame_detections)
+                yield frame_number, frame_detections
+            logger.info(f"Processed stream {video_url}, found {count} detections")
+            return
+        
+        # Let FFmpeg read HTTP videos itself (range requests), nothing is buffered in RAM or on disk
+        if is_http_url(video_url) and settings.VIDEO_DIRECT_URL_DECODE:
+            cap = cv2.VideoCapture(video_url)
+            if cap.isOpened():
+                for frame_number, frame_detections in self._iter_capture(cap, sampling, *options, **segment):
+                    count += len(frame_detections)
+                    yield frame_number, frame_detections
+                logger.info(f"Processed video {video_url}, found {count} detections")
+                return
+            cap.release()
+            logger.warning(f"Decoder could not open {video_url} directly, downloading it first")
+        
+        # Local files are opened in place, URLs are streamed to a temp file in chunks
+        with local_media_path(video_url) as video_path:
+            cap = cv2.VideoCapture(video_path)
+            if not cap.isOpened():
+                # Otherwise a missing or unreadable file would look like a video without detections
+                cap.release()
+                raise IOError(f"Failed to open video: {video_url}")
+            for frame_number, frame_detections in self._iter_capture(cap, sampling, *options, **segment):
+                count += len(frame_detections)
+                yield frame_number, frame_detections
+        
+        logger.info(f"Processed video {video_url}, found {count} detections")
+
+    def _iter_capture(
+        self,
+        cap: cv2.VideoCapture,
+        sampling: str,
+        motion_threshold: Optional[float] = None,
+        imgsz: Optional[int] = None,
+        triage_imgsz: Optional[int] = None,
+        roi: Optional[List] = None,
+        is_stream: bool = False,
+        start_frame: int = 0,
+        end_frame: Optional[int] = None
+    ) -> Iterator[Tuple[int, List[Dict]]]:
+        """Sample frames from an open capture, run batched inference and release it when done"""
+        motion_gate = self.make_motion_gate(motion_threshold)
+        sampler = AdaptiveSampler.from_settings()
+        options = {'imgsz': imgsz, 'triage_imgsz': triage_imgsz, 'roi': roi}
+        try:
+            if is_stream:
+                fps = cap.get(cv2.CAP_PROP_FPS) or 30
+                frame_skip = max(1, int(fps // settings.FRAME_EXTRACTION_FPS))
                 
-                if frame_count % frame_skip == 0:
-                    frame_detections = self._process_frame(frame, frame_count)
-                    detections.extend(frame_detections)
-                    processed_count += 1
+                # For live streams, we limit processing to a fixed number of frames
+                # to avoid blocking. e.g., process 10 seconds of stream.
+                max_frames = int(fps * 10)
+            else:
+                fps = int(cap.get(cv2.CAP_PROP_FPS) or 30)
                 
-                frame_count += 1
+                # Process frames at specified FPS
+                frame_skip = max(1, fps // settings.FRAME_EXTRACTION_FPS)
+                max_frames = None
             
+            if sampler:
+                # The rate follows the detections. They come back once their batch is inferred,
+                # so a pipelined file ramps up a few batches after the frame that triggered it.
+                options['observe'] = lambda frame_number, detections: sampler.observe(frame_number / fps, detections)
+            frames = self._read_sampled_frames(
+                cap, frame_skip, max_frames=max_frames, mode=sampling, sampler=sampler, fps=fps,
+                start_frame=start_frame, end_frame=end_frame
+            )
+            if is_stream:
+                # Frames trickle in at the stream rate, so don't hold a partial batch forever
+                options['max_wait'] = settings.INFERENCE_BATCH_MAX_WAIT_MS / 1000
+            yield from self._iter_batched(frames, motion_gate=motion_gate, **options)
+        finally:
             cap.release()
-            logger.info(f"Processed {processed_count} frames from stream, found {len(detections)} detections")
-            return detections
+            if motion_gate:
+                self._record_motion_stats(motion_gate)
+            if sampler:
+                self._record_sampling_stats(sampler)
 
-        # Download video to temp file for static files
-        with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as tmp_file:
-            video_path = tmp_file.name
-            
-            # Download from URL
-            if video_url.startswith('http'):
-                response = requests.get(video_url)
-                tmp_file.write(response.content)
-            else:
-                # Copy local file
-                with open(video_url, 'rb') as f:
-                    tmp_file.write(f.read())
+    def make_motion_gate(self, motion_threshold: Optional[float] = None) -> Optional[MotionGate]:
+        """Create a fresh motion gate for one video, or None if gating is disabled"""
+        if not settings.MOTION_GATING_ENABLED:
+            return None
         
-        try:
-            # Open video
-            cap = cv2.VideoCapture(video_path)
-            fps = int(cap.get(cv2.CAP_PROP_FPS) or 30)
-            frame_count = 0
+        threshold = settings.MOTION_THRESHOLD if motion_threshold is None else motion_threshold
+        return MotionGate(
+            threshold,
+            pixel_delta=settings.MOTION_PIXEL_DELTA,
+            max_skipped=settings.MOTION_MAX_SKIPPED_FRAMES
+        )
+
+    def _record_sampling_stats(self, sampler: AdaptiveSampler):
+        """Add one video's sampling decisions to the processor-wide totals"""
+        with self._stats_lock:
+            for state, count in sampler.samples.items():
+                self.sampling_stats[state] += count
+            self.sampling_stats['transitions'] += sampler.transitions
+        
+        logger.info(f"Adaptive sampling: {sampler.samples} samples per state, {sampler.transitions} rate changes")
+
+    def _record_motion_stats(self, motion_gate: MotionGate):
+        """Add one video's gating counters to the processor-wide totals"""
+        with self._stats_lock:
+            self.motion_stats['frames_checked'] += motion_gate.frames_checked
+            self.motion_stats['inferences_skipped'] += motion_gate.frames_skipped
+        
+        logger.info(
+            f"Motion gating skipped {motion_gate.frames_skipped} of {motion_gate.frames_checked} inferences"
+        )
+
+    def _read_sampled_frames(
+        self,
+        cap: cv2.VideoCapture,
+        frame_skip: int,
+        max_frames: Optional[int] = None,
+        mode: str = 'grab',
+        sampler: Optional[AdaptiveSampler] = None,
+        fps: float = 30,
+        start_frame: int = 0,
+        end_frame: Optional[int] = None
+    ) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Yield (frame_number, frame) for every Nth frame of an open capture
+        
+        With a sampler, N follows its current rate (fps converts intervals to
+        frames) and is checked on every frame, otherwise it is frame_skip.
+        A start_frame is seeked to first, reading stops before end_frame.
+        
+        Modes:
+            read: decode and convert every frame, keep every Nth
+            grab: grab() every frame but retrieve() only the sampled ones,
+                skipping the colour conversion and copy for the rest
+            seek: jump straight to each sampled frame, so the decoder only
+                works from the nearest keyframe. Best for long files sampled sparsely.
+        """
+        if mode == 'seek':
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+            if total_frames > 0:
+                if end_frame is not None:
+                    total_frames = min(total_frames, end_frame)
+                yield from self._seek_sampled_frames(cap, frame_skip, total_frames, sampler, fps, start_frame)
+                return
+            # Unknown length (e.g. some containers), nothing to seek against
+            mode = 'grab'
+        
+        frame_count = start_frame
+        sampled_count = 0
+        last_sampled = None
+        if start_frame:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        
+        while (cap.isOpened() and (max_frames is None or frame_count < max_frames)
+               and (end_frame is None or frame_count < end_frame)):
+            if mode == 'read':
+                ret, frame = cap.read()
+            else:
+                ret, frame = cap.grab(), None
+            if not ret:
+                break
             
-            # Process frames at specified FPS
-            frame_skip = max(1, fps // settings.FRAME_EXTRACTION_FPS)
+            # Process every Nth frame
+            skip = sampler.frame_skip(frame_count, fps) if sampler else frame_skip
+            if last_sampled is None or frame_count - last_sampled >= skip:
+                if frame is None:
+                    ret, frame = cap.retrieve()
+                    if not ret:
+                        break
+                sampled_count += 1
+                last_sampled = frame_count
+                if sampler:
+                    sampler.record(frame_count / fps)
+                yield frame_count, frame
             
-            while cap.isOpened():
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                # Process every Nth frame
-                if frame_count % frame_skip == 0:
-                    frame_detections = self._process_frame(frame, frame_count)
-                    detections.extend(frame_detections)
-                
-                frame_count += 1
+            frame_count += 1
+        
+        logger.info(f"Read {frame_count - start_frame} frames ({mode}), sampled {sampled_count}")
+
+    def _seek_sampled_frames(
+        self,
+        cap: cv2.VideoCapture,
+        frame_skip: int,
+        total_frames: int,
+        sampler: Optional[AdaptiveSampler] = None,
+        fps: float = 30,
+        start_frame: int = 0
+    ) -> Iterator[Tuple[int, np.ndarray]]:
+        """Yield every Nth frame from start_frame to total_frames by seeking to it instead of decoding the frames in between"""
+        sampled_count = 0
+        frame_number = start_frame
+        position = 0
+        
+        while frame_number < total_frames:
+            # The capture is already positioned on the frame right after the previous read
+            if frame_number != position:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+            ret, frame = cap.read()
+            if not ret:
+                break
+            sampled_count += 1
+            position = frame_number + 1
+            if sampler:
+                sampler.record(frame_number / fps)
+            yield frame_number, frame
+            # Picked after the frame was handed on, so it reflects the detections reported meanwhile
+            frame_number += sampler.frame_skip(frame_number, fps) if sampler else frame_skip
+        
+        logger.info(f"Seeked through {total_frames - start_frame} frames, sampled {sampled_count}")
+
+    def _process_batched(self, frames: Iterable[Tuple[int, np.ndarray]], **options) -> List[Dict]:
+        """All detections of _iter_batched in one list"""
+        return [detection for _, frame_detections in self._iter_batched(frames, **options) for detection in frame_detections]
+
+    def _iter_batched(
+        self,
+        frames: Iterable[Tuple[int, np.ndarray]],
+        max_wait: Optional[float] = None,
+        motion_gate: Optional[MotionGate] = None,
+        imgsz: Optional[int] = None,
+        triage_imgsz: Optional[int] = None,
+        roi: Optional[List] = None,
+        observe: Optional[Callable[[int, List[Dict]], None]] = None
+    ) -> Iterator[Tuple[int, List[Dict]]]:
+        """
+        Group sampled frames into batches and run one inference call per batch
+        
+        Uses the staged VideoPipeline when VIDEO_PIPELINE_ENABLED is set, so
+        decoding overlaps with inference; otherwise runs the batches serially.
+        
+        Args:
+            frames: Iterable of (frame_number, frame) pairs
+            max_wait: Seconds after which a partial batch is flushed (None waits for a full batch)
+            motion_gate: Skips inference on frames without motion
+            imgsz: Model input size, defaults to settings.INFERENCE_IMGSZ
+            triage_imgsz: Low-resolution first pass size, defaults to settings.TRIAGE_IMGSZ
+            roi: Region of interest polygons, frames are cropped to them before motion gating and inference
+            observe: Called with (frame_number, detections) of every inferred frame, in order
             
-            cap.release()
-            logger.info(f"Processed {frame_count} frames, found {len(detections)} detections")
+        Yields:
+            (frame_number, detections) for every frame, in order. Each detection has a
+            'track_id' when TRACKING_ENABLED.
+        """
+        imgsz = imgsz or settings.INFERENCE_IMGSZ
+        region = RegionOfInterest.from_polygons(roi)
+        if region:
+            # Size the crop from the first frame, so the model input shrinks along with it
+            frames = iter(frames)
+            first = next(frames, None)
+            if first is not None:
+                region.crop(first[1])
+                imgsz = region.input_size(imgsz)
+                frames = itertools.chain([first], frames)
+            frames = ((frame_number, region.crop(frame)) for frame_number, frame in frames)
+        if motion_gate:
+            frames = self._gate_frames(frames, motion_gate)
+        batches = self._batch_frames(frames, max_wait)
+        
+        # Letterbox buffers must outlive every batch in flight: one being prepared,
+        # the queued ones and the one in inference
+        in_flight = settings.PIPELINE_QUEUE_SIZE + 2 if settings.VIDEO_PIPELINE_ENABLED else 1
+        preprocessor = self._letterbox(imgsz, self.batch_size * in_flight)
+        preprocess = functools.partial(self._preprocess, preprocessor=preprocessor, triage_imgsz=triage_imgsz)
+        
+        if settings.VIDEO_PIPELINE_ENABLED:
+            pipeline = VideoPipeline(
+                preprocess, self._infer, self._postprocess,
+                queue_size=settings.PIPELINE_QUEUE_SIZE
+            )
+            results = pipeline.run(batches)
+        else:
+            results = self._run_serial(batches, preprocess)
+        
+        # Frames arrive in order, so the tracker sees the video as it plays
+        tracker = ByteTracker() if settings.TRACKING_ENABLED else None
+        previous = []
+        for batch_numbers, per_frame in results:
+            for frame_number, frame_detections in zip(batch_numbers, per_frame):
+                if frame_detections is None:
+                    # Inference was skipped for a static frame
+                    frame_detections = self._reuse_detections(previous, frame_number)
+                else:
+                    if region:
+                        frame_detections = region.to_frame(frame_detections)
+                    if tracker:
+                        tracker.update(frame_detections)
+                    if observe:
+                        observe(frame_number, frame_detections)
+                    previous = frame_detections
+                yield frame_number, frame_detections
+        
+        if settings.VIDEO_PIPELINE_ENABLED:
+            self.last_pipeline_stats = pipeline.stats
+
+    def _run_serial(
+        self,
+        batches: Iterable[Tuple[List[Optional[np.ndarray]], List[int]]],
+        preprocess
+    ) -> Iterator[Tuple[List[int], List[Optional[List[Dict]]]]]:
+        """Run the processing stages one batch at a time on the calling thread"""
+        for batch_frames, batch_numbers in batches:
+            prepared = preprocess(batch_frames)
+            yield batch_numbers, self._postprocess(prepared, self._infer(prepared), batch_numbers)
+
+    def _gate_frames(
+        self,
+        frames: Iterable[Tuple[int, np.ndarray]],
+        motion_gate: MotionGate
+    ) -> Iterator[Tuple[int, Optional[np.ndarray]]]:
+        """Replace frames without motion by None so they skip inference"""
+        for frame_number, frame in frames:
+            yield frame_number, frame if motion_gate.has_motion(frame) else None
+
+    def _reuse_detections(self, previous: List[Dict], frame_number: int) -> List[Dict]:
+        """Detections reported for a frame whose inference was skipped"""
+        if settings.MOTION_SKIP_MODE != 'reuse':
+            return []
+        return [{**d, 'frame_number': frame_number, 'bbox': dict(d['bbox'])} for d in previous]
+
+    def _batch_frames(
+        self,
+        frames: Iterable[Tuple[int, np.ndarray]],
+        max_wait: Optional[float] = None
+    ) -> Iterator[Tuple[List[np.ndarray], List[int]]]:
+        """Yield (frames, frame_numbers) batches of up to batch_size frames"""
+        batch_frames, batch_numbers = [], []
+        batch_started = 0.0
+        
+        for frame_number, frame in frames:
+            if not batch_frames:
+                batch_started = time.monotonic()
+            batch_frames.append(frame)
+            batch_numbers.append(frame_number)
             
-        finally:
-            # Cleanup temp file
-            Path(video_path).unlink(missing_ok=True)
+            waited_too_long = max_wait is not None and time.monotonic() - batch_started >= max_wait
+            if len(batch_frames) >= self.batch_size or waited_too_long:
+                yield batch_frames, batch_numbers
+                batch_frames, batch_numbers = [], []
         
-        return detections
+        if batch_frames:
+            yield batch_frames, batch_numbers
 
     def _is_stream(self, url: str) -> bool:
         """Check if URL is a live stream (HLS, RTSP, etc.)"""
         stream_extensions = ('.m3u8', '.ts', '.mpd')
         return url.startswith('rtsp://') or url.startswith('rtmp://') or any(url.lower().endswith(ext) for ext in stream_extensions)
     
-    def process_image(self, image_url: str) -> List[Dict]:
+    def process_image(self, image_url: str, roi: Optional[List] = None) -> List[Dict]:
         """
         Process single image and detect objects
         
         Args:
             image_url: URL or path to image file
+            roi: Region of interest polygons (normalized), None processes the whole image
             
         Returns:
             List of detection dictionaries
         """
-        # Download image
-        if image_url.startswith('http'):
-            response = requests.get(image_url)
-            image_array = np.frombuffer(response.content, np.uint8)
-            image = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
-        else:
-            image = cv2.imread(image_url)
+        # Local images are read in place, URLs are streamed to a temp file in chunks
+        with local_media_path(image_url, default_suffix='.jpg') as image_path:
+            image = cv2.imread(image_path)
         
+        region = RegionOfInterest.from_polygons(roi)
+        if region:
+            crop = region.crop(image)
+            detections = self.process_frames([crop], [0], imgsz=region.input_size(settings.INFERENCE_IMGSZ))
+            return region.to_frame(detections)
         return self._process_frame(image, frame_number=0)
     
     def _process_frame(self, frame: np.ndarray, frame_number: int) -> List[Dict]:
@@ -189,47 +565,210 @@ class MLProcessor:
         Returns:
             List of detection dictionaries
         """
-        detections = []
-        
-        # Run inference
-        results = self.model(frame, conf=self.confidence_threshold, verbose=False)
+        return self.process_frames([frame], [frame_number])
+    
+    def process_frames(
+        self,
+        frames: List[np.ndarray],
+        frame_numbers: List[int],
+        imgsz: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Process a batch of frames with a single inference call
         
-        # Parse results
-        for result in results:
-            boxes = result.boxes
+        Args:
+            frames: OpenCV image arrays
+            frame_numbers: Frame number in video for each frame
+            imgsz: Model input size, defaults to settings.INFERENCE_IMGSZ
             
-            for box in boxes:
-                # Get detection info
-                class_id = int(box.cls[0])
-                class_name = self.model.names[class_id]
-                confidence = float(box.conf[0])
-                
-                # Get bounding box coordinates
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                
-                # Map to our detection types
-                detection_type = self.detection_types.get(class_name.lower(), 'unknown')
-                
-                # Skip if unknown or low confidence
-                if detection_type == 'unknown' or confidence < self.confidence_threshold:
-                    continue
-                
-                detection = {
-                    'type': detection_type,
-                    'original_class': class_name,
-                    'confidence': confidence,
-                    'frame_number': frame_number,
-                    'bbox': {
-                        'x': int(x1),
-                        'y': int(y1),
-                        'width': int(x2 - x1),
-                        'height': int(y2 - y1)
-                    }
-                }
-                
-                detections.append(detection)
+        Returns:
+            List of detection dictionaries, in frame order
+        """
+        return [detection for frame_detections in self.infer_batch(frames, frame_numbers, imgsz) for detection in frame_detections]
+    
+    def infer_batch(
+        self,
+        frames: List[np.ndarray],
+        frame_numbers: List[int],
+        imgsz: Optional[int] = None
+    ) -> List[List[Dict]]:
+        """
+        process_frames with the detections kept apart per frame
         
-        return detections
+        Returns:
+            One list of detections per frame, in frame order
+        """
+        if not frames:
+            return []
+        
+        prepared = self._preprocess(frames, self._letterbox(imgsz or settings.INFERENCE_IMGSZ, len(frames)))
+        return self._postprocess(prepared, self._infer(prepared), frame_numbers)
+    
+    def _letterbox(self, imgsz: int, pool_size: int) -> LetterboxPreprocessor:
+        """This thread's letterbox preprocessor for imgsz, with at least pool_size buffers"""
+        cache = getattr(self._local, 'letterbox', None)
+        if cache is None:
+            cache = self._local.letterbox = {}
+        
+        imgsz = round_imgsz(imgsz)
+        preprocessor = cache.get(imgsz)
+        if preprocessor is None or preprocessor.pool_size < pool_size:
+            preprocessor = cache[imgsz] = LetterboxPreprocessor(imgsz, pool_size)
+        return preprocessor
+    
+    def _preprocess(
+        self,
+        frames: List[Optional[np.ndarray]],
+        preprocessor: Optional[LetterboxPreprocessor] = None,
+        triage_imgsz: Optional[int] = None
+    ) -> Dict:
+        """
+        Letterbox a batch of frames into model inputs
+        
+        Returns the prepared batch: 'inputs' (None for skipped frames), the
+        'transforms' that map boxes back to each frame, and the input sizes.
+        """
+        if preprocessor is None:
+            preprocessor = self._letterbox(settings.INFERENCE_IMGSZ, len(frames))
+        
+        triage_imgsz = settings.TRIAGE_IMGSZ if triage_imgsz is None else triage_imgsz
+        if triage_imgsz:
+            triage_imgsz = round_imgsz(triage_imgsz)
+            # A triage pass at (or above) the full size would only double the work
+            if triage_imgsz >= preprocessor.imgsz:
+                triage_imgsz = 0
+        
+        inputs, transforms = [], []
+        for frame in frames:
+            if frame is None:
+                inputs.append(None)
+                transforms.append(None)
+            else:
+                model_input, transform = preprocessor(frame)
+                inputs.append(model_input)
+                transforms.append(transform)
+        
+        return {
+            'inputs': inputs,
+            'transforms': transforms,
+            'imgsz': preprocessor.imgsz,
+            'triage_imgsz': triage_imgsz
+        }
+    
+    def _infer(self, prepared: Dict) -> list:
+        """
+        Run the model on a prepared batch
+        
+        With a triage size set, every frame first goes through the model at
+        that lower resolution. Only frames where it finds something are run
+        again at full size. Empty frames, usually most of them, cost a
+        fraction of a full pass.
+        
+        Returns one result per input, None where the input was None (skipped frame).
+        """
+        inputs = prepared['inputs']
+        live = [model_input for model_input in inputs if model_input is not None]
+        if not live:
+            return [None] * len(inputs)
+        
+        triage_imgsz = prepared['triage_imgsz']
+        if triage_imgsz:
+            live_results = self._predict(live, triage_imgsz)
+            hits = [i for i, result in enumerate(live_results) if len(result.boxes)]
+            if hits:
+                for i, result in zip(hits, self._predict([live[i] for i in hits], prepared['imgsz'])):
+                    live_results[i] = result
+            with self._stats_lock:
+                self.triage_stats['frames'] += len(live)
+                self.triage_stats['escalated'] += len(hits)
+        else:
+            live_results = self._predict(live, prepared['imgsz'])
+        
+        results = iter(live_results)
+        return [next(results) if model_input is not None else None for model_input in inputs]
+    
+    def _predict(self, inputs: List[np.ndarray], imgsz: int) -> list:
+        """One model call on letterboxed inputs"""
+        with self._model_lock:
+            return list(self.model(
+                inputs,
+                imgsz=imgsz,
+                conf=self.confidence_threshold,
+                classes=self.relevant_classes,
+                verbose=False
+            ))
+    
+    def _postprocess(self, prepared: Dict, results: list, frame_numbers: List[int]) -> List[Optional[List[Dict]]]:
+        """Parse a batch of results back into frame coordinates"""
+        return self._parse_results(results, frame_numbers, prepared['transforms'])
+    
+    def _parse_results(
+        self,
+        results: list,
+        frame_numbers: List[int],
+        transforms: Optional[List[Optional[Transform]]] = None
+    ) -> List[Optional[List[Dict]]]:
+        """Convert a batch of ultralytics results into one detection list per frame (None if skipped)"""
+        transforms = transforms or [None] * len(results)
+        return [
+            self._parse_result(result, frame_number, transform) if result is not None else None
+            for result, frame_number, transform in zip(results, frame_numbers, transforms)
+        ]
+    
+    def _parse_result(self, result, frame_number: int, transform: Optional[Transform] = None) -> List[Dict]:
+        """
+        Convert one ultralytics result into detection dictionaries
+        
+        Works on the whole cls/conf/xyxy arrays at once instead of walking
+        the boxes one by one in Python. Boxes on a letterboxed input are
+        mapped back to the original frame with its transform.
+        """
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return []
+        
+        boxes = boxes.cpu().numpy()
+        class_ids = boxes.cls.astype(np.int64)
+        confidences = boxes.conf.astype(np.float64)
+        xyxy = boxes.xyxy.astype(np.float64)
+        
+        # Map to our detection types, skipping unknown or low confidence boxes
+        type_index = self._class_type_index[class_ids]
+        keep = (type_index >= 0) & (confidences >= self.confidence_threshold)
+        if not keep.any():
+            return []
+        
+        xyxy = xyxy[keep]
+        if transform is not None:
+            xyxy = to_frame_coordinates(xyxy, transform)
+        # astype truncates toward zero, same as int()
+        bboxes = np.column_stack((
+            xyxy[:, 0],
+            xyxy[:, 1],
+            xyxy[:, 2] - xyxy[:, 0],
+            xyxy[:, 3] - xyxy[:, 1]
+        )).astype(np.int64).tolist()
+        
+        return [
+            {
+                'type': self._type_names[type_id],
+                'original_class': self._class_names[class_id],
+                'confidence': confidence,
+                'frame_number': frame_number,
+                'bbox': {
+                    'x': x,
+                    'y': y,
+                    'width': width,
+                    'height': height
+                }
+            }
+            for type_id, class_id, confidence, (x, y, width, height) in zip(
+                type_index[keep].tolist(),
+                class_ids[keep].tolist(),
+                confidences[keep].tolist(),
+                bboxes
+            )
+        ]
     
     def is_crowd(self, detections: List[Dict]) -> bool:
         """
@@ -0,0 +1,39 @@
+"""
+Process-wide MLProcessor, loaded lazily on first use
+
+Importing this module is cheap: torch, ultralytics and the model are only
+loaded when get_ml_processor() is first called. API routes and task
+producers can import it freely, and only the code that actually runs
+inference pays for the model.
+"""
+from typing import TYPE_CHECKING, Optional
+import logging
+import threading
+import time
+
+if TYPE_CHECKING:
+    from ml_processor import MLProcessor
+
+logger = logging.getLogger(__name__)
+
+_processor: Optional["MLProcessor"] = None
+_processor_lock = threading.Lock()
+
+
+def get_ml_processor() -> "MLProcessor":
+    """Return this process's shared MLProcessor, loading the model on the first call"""
+    global _processor
+    if _processor is None:
+        with _processor_lock:
+            if _processor is None:
+                from ml_processor import MLProcessor
+
+                started = time.perf_counter()
+                _processor = MLProcessor()
+                logger.info(f"ML processor ready in {time.perf_counter() - started:.2f}s")
+    return _processor
+
+
+def is_ml_processor_loaded() -> bool:
+    """Whether the model has been loaded in this process yet"""
+    return _processor is not None
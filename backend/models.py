@@ -21,6 +21,10 @@ class Camera(Base):
     status = Column(String(50), default="active")
     stream_url = Column(String(1000), nullable=True)
     is_live = Column(Boolean, default=False)
+    motion_threshold = Column(Float, nullable=True)  # Fraction of changed pixels that triggers inference, None uses the global setting
+    inference_imgsz = Column(Integer, nullable=True)  # Model input size for this camera, None uses the global setting
+    roi = Column(JSON, nullable=True)  # Region of interest polygons as [[x, y], ...] fractions of the frame, None is the whole frame
+    priority = Column(String(20), default="normal")  # 'high', 'normal' or 'low', picks the task queue for its uploads
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
     
@@ -37,6 +41,7 @@ class MediaUpload(Base):
     file_name = Column(String(255), nullable=False)
     file_type = Column(String(50), nullable=False)  # 'video' or 'image'
     file_url = Column(String(1000), nullable=False)
+    content_hash = Column(String(64), nullable=True, index=True)  # SHA-256 of the file, keys the result cache
     upload_time = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     processing_status = Column(String(50), default="pending")  # pending, processing, completed, failed
     processed_at = Column(DateTime, nullable=True)
@@ -51,7 +56,10 @@ class Detection(Base):
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     media_id = Column(UUID(as_uuid=True), ForeignKey("media_uploads.id"))
-    frame_number = Column(Integer, nullable=True)
+    frame_number = Column(Integer, nullable=True)  # For a track, the frame of its peak confidence
+    track_id = Column(Integer, nullable=True)  # Set when the row summarizes a whole track
+    first_frame_number = Column(Integer, nullable=True)
+    last_frame_number = Column(Integer, nullable=True)
     detection_type = Column(String(100), nullable=False)  # 'weapon', 'crowd', 'accident', etc.
     confidence = Column(Float, nullable=False)
     bounding_box = Column(JSON, nullable=True)  # {x, y, width, height}
@@ -90,4 +98,14 @@ class AnalyticsEvent(Base):
     event_type = Column(String(100), nullable=False)
     camera_id = Column(UUID(as_uuid=True), ForeignKey("cameras.id"), nullable=True)
     meta = Column(JSON, nullable=True)
-    occurred_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
\ No newline at end of file
+    occurred_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+class ProcessingCheckpoint(Base):
+    __tablename__ = "processing_checkpoints"
+    
+    # Progress of a video being processed, committed along with its detections and
+    # removed once it completes. A retried or redelivered task resumes from it.
+    media_id = Column(UUID(as_uuid=True), ForeignKey("media_uploads.id"), primary_key=True)
+    next_frame = Column(Integer, nullable=False, default=0)  # First frame not yet processed
+    state = Column(JSON, nullable=True)  # Tracks still open at next_frame, see tracker.TrackSummaries.state
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
@@ -0,0 +1,69 @@
+"""
+Cheap motion/change detection used to skip inference on static frames
+"""
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Frame differencing on downscaled grayscale frames
+
+    Each frame is compared against the last frame that was let through, so
+    slow changes add up until they cross the threshold.
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        pixel_delta: int = 25,
+        width: int = 160,
+        max_skipped: int = 30
+    ):
+        """
+        Args:
+            threshold: Fraction of pixels (0-1) that must change to count as motion
+            pixel_delta: Grayscale difference for a pixel to count as changed
+            width: Width frames are downscaled to before comparing
+            max_skipped: Let a frame through after this many consecutive skips regardless
+        """
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.width = width
+        self.max_skipped = max_skipped
+        self.frames_checked = 0
+        self.frames_skipped = 0
+        self._reference = None
+        self._consecutive_skips = 0
+
+    def has_motion(self, frame: np.ndarray) -> bool:
+        """Return True if the frame changed enough since the last accepted frame to need inference"""
+        self.frames_checked += 1
+        small = self._downscale(frame)
+
+        if self._reference is None or self._reference.shape != small.shape:
+            return self._accept(small)
+
+        diff = cv2.absdiff(small, self._reference)
+        changed = np.count_nonzero(diff > self.pixel_delta) / diff.size
+
+        if changed >= self.threshold or self._consecutive_skips >= self.max_skipped:
+            return self._accept(small)
+
+        self._consecutive_skips += 1
+        self.frames_skipped += 1
+        return False
+
+    def _accept(self, small: np.ndarray) -> bool:
+        self._reference = small
+        self._consecutive_skips = 0
+        return True
+
+    def _downscale(self, frame: np.ndarray) -> np.ndarray:
+        height, width = frame.shape[:2]
+        size = (self.width, max(1, round(height * self.width / width)))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        # Blur away sensor noise and compression artifacts
+        return cv2.GaussianBlur(small, (5, 5), 0)
@@ -0,0 +1,86 @@
+"""
+Letterbox preprocessing into reusable, preallocated input buffers
+"""
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Grey padding, same as ultralytics
+PAD_VALUE = 114
+
+# Model input sides must be a multiple of the model's largest stride
+STRIDE = 32
+
+# (scale, pad_x, pad_y, frame_width, frame_height) to map model boxes back to the frame
+Transform = Tuple[float, int, int, int, int]
+
+
+def round_imgsz(imgsz: int) -> int:
+    """Round an inference size up to a multiple of the model stride"""
+    return max(STRIDE, -(-int(imgsz) // STRIDE) * STRIDE)
+
+
+class LetterboxPreprocessor:
+    """
+    Resizes frames into a ring of preallocated model input buffers
+
+    The longer side is scaled to imgsz, and the shorter side is padded with grey
+    up to the next multiple of the stride. This is the minimal-padding letterbox
+    ultralytics uses, so a 720p frame becomes a 640x384 input, not 640x640. The
+    model then receives inputs it does not need to resize again.
+
+    A buffer is reused once `pool_size` newer frames have been prepared. The
+    pool must therefore cover every frame that can be in flight before
+    inference copies it. Buffers are only reallocated when the frame size changes.
+    """
+
+    def __init__(self, imgsz: int, pool_size: int):
+        self.imgsz = round_imgsz(imgsz)
+        self._buffers: List[Optional[np.ndarray]] = [None] * max(1, pool_size)
+        # Content area last written into each buffer, so padding is only refilled when the geometry changes
+        self._layouts: List[Optional[Tuple[int, int, int, int]]] = [None] * len(self._buffers)
+        self._next = 0
+
+    @property
+    def pool_size(self) -> int:
+        return len(self._buffers)
+
+    def __call__(self, frame: np.ndarray) -> Tuple[np.ndarray, Transform]:
+        """Letterbox one frame, returning the model input and its transform back to frame coordinates"""
+        height, width = frame.shape[:2]
+        scale = min(self.imgsz / height, self.imgsz / width)
+        new_w, new_h = round(width * scale), round(height * scale)
+        canvas_w, canvas_h = round_imgsz(new_w), round_imgsz(new_h)
+        pad_x, pad_y = (canvas_w - new_w) // 2, (canvas_h - new_h) // 2
+        layout = (pad_x, pad_y, new_w, new_h)
+
+        index = self._next
+        self._next = (self._next + 1) % len(self._buffers)
+        buffer = self._buffers[index]
+
+        if buffer is None or buffer.shape[:2] != (canvas_h, canvas_w):
+            buffer = self._buffers[index] = np.full((canvas_h, canvas_w, 3), PAD_VALUE, dtype=np.uint8)
+        elif self._layouts[index] != layout:
+            buffer.fill(PAD_VALUE)
+        self._layouts[index] = layout
+
+        if new_w == canvas_w:
+            # Full-width rows are contiguous, so resize straight into the buffer. With a single
+            # column of padding pad_x is 0 as well, but the slice would be wider than the resize.
+            cv2.resize(frame, (new_w, new_h), dst=buffer[pad_y:pad_y + new_h], interpolation=cv2.INTER_LINEAR)
+        else:
+            buffer[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = cv2.resize(
+                frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR
+            )
+
+        return buffer, (scale, pad_x, pad_y, width, height)
+
+
+def to_frame_coordinates(xyxy: np.ndarray, transform: Transform) -> np.ndarray:
+    """Map (N, 4) xyxy boxes from letterboxed model input back to the original frame"""
+    scale, pad_x, pad_y, width, height = transform
+    boxes = (xyxy - (pad_x, pad_y, pad_x, pad_y)) / scale
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+    return boxes
@@ -0,0 +1,290 @@
+"""
+INT8 quantization of the detection model and FP32 vs INT8 accuracy/latency report
+
+The FP32 ONNX export is statically quantized with ONNX Runtime, calibrated on
+frames drawn from QUANTIZATION_CALIBRATION_DIR. The openvino backend gets the
+same INT8 model converted to OpenVINO IR. Select it at runtime with
+MODEL_PRECISION=int8.
+
+Usage (from backend/):
+    python quantization.py quantize --backend onnxruntime
+    python quantization.py report --backend onnxruntime --frames 100
+"""
+from pathlib import Path
+from typing import Dict, List, Optional
+import argparse
+import logging
+import os
+import shutil
+import time
+
+import cv2
+import numpy as np
+
+from config import settings
+from inference_backends import export_model, exported_model_path
+from preprocess import LetterboxPreprocessor
+
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+
+def sample_video_frames(video_dir: str, count: int, offset: float = 0.0) -> List[np.ndarray]:
+    """
+    Draw `count` frames spread evenly over every video in a directory
+
+    Args:
+        video_dir: Directory with the videos
+        count: Total number of frames to return
+        offset: Fraction of the sampling interval to shift by. Use 0.5 for
+            frames disjoint from the calibration set.
+    """
+    videos = sorted(
+        os.path.join(video_dir, name) for name in os.listdir(video_dir)
+        if name.lower().endswith(VIDEO_EXTENSIONS)
+    )
+    if not videos:
+        raise FileNotFoundError(f"No videos found in {video_dir}")
+
+    frames = []
+    per_video = max(1, -(-count // len(videos)))
+    for video in videos:
+        cap = cv2.VideoCapture(video)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        step = max(1, total // per_video)
+        for i in range(per_video):
+            frame_number = int((i + offset) * step)
+            if frame_number >= total:
+                break
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+            ret, frame = cap.read()
+            if ret:
+                frames.append(frame)
+        cap.release()
+
+    return frames[:count]
+
+
+def _to_model_input(frame: np.ndarray, preprocessor: LetterboxPreprocessor) -> np.ndarray:
+    """Letterbox a BGR frame as inference does, as a 1x3xHxW float tensor"""
+    buffer, _ = preprocessor(frame)
+    tensor = buffer[:, :, ::-1].transpose(2, 0, 1)  # BGR HWC -> RGB CHW, copied below before the buffer is reused
+    return np.ascontiguousarray(tensor, dtype=np.float32)[None] / 255.0
+
+
+def _head_nodes(model) -> List[str]:
+    """
+    Nodes of the box decoding head that must stay in FP32
+
+    Everything downstream of the DFL Softmax: the fixed-weight convolution that
+    turns bin probabilities into box distances, and the box arithmetic after it.
+    Quantizing these costs localization accuracy for no real speedup.
+    """
+    consumers = {}
+    for node in model.graph.node:
+        for name in node.input:
+            consumers.setdefault(name, []).append(node)
+
+    pending = [out for node in model.graph.node if node.op_type == 'Softmax' for out in node.output]
+    excluded = set()
+    while pending:
+        for node in consumers.get(pending.pop(), []):
+            if node.name not in excluded:
+                excluded.add(node.name)
+                pending.extend(node.output)
+
+    return sorted(excluded)
+
+
+def quantize_model(
+    backend: str = 'onnxruntime',
+    model_path: Optional[str] = None,
+    calibration_dir: Optional[str] = None,
+    calibration_frames: Optional[int] = None,
+    force: bool = False
+) -> Path:
+    """
+    Build the INT8 model for a backend
+
+    Args:
+        backend: 'onnxruntime' or 'openvino'
+        model_path: PyTorch weights, defaults to settings.MODEL_PATH
+        calibration_dir: Videos to calibrate on, defaults to settings.QUANTIZATION_CALIBRATION_DIR
+        calibration_frames: Number of calibration frames, defaults to settings.QUANTIZATION_CALIBRATION_FRAMES
+        force: Rebuild even if the INT8 model already exists
+
+    Returns:
+        Path to the INT8 model
+    """
+    import onnx
+    from onnxruntime.quantization import (
+        CalibrationDataReader, CalibrationMethod, QuantFormat, QuantType, quantize_static
+    )
+
+    target = exported_model_path(backend, model_path, precision='int8')
+    if target.exists() and not force:
+        return target
+
+    fp32_path = export_model('onnxruntime', model_path)
+    int8_onnx_path = exported_model_path('onnxruntime', model_path, precision='int8')
+
+    if backend == 'onnxruntime' or force or not int8_onnx_path.exists():
+        fp32_model = onnx.load(str(fp32_path))
+        input_name = fp32_model.graph.input[0].name
+        metadata = {prop.key: prop.value for prop in fp32_model.metadata_props}
+        # The same letterbox as inference (the export takes dynamic shapes)
+        preprocessor = LetterboxPreprocessor(settings.INFERENCE_IMGSZ, pool_size=1)
+
+        frames = sample_video_frames(
+            calibration_dir or settings.QUANTIZATION_CALIBRATION_DIR,
+            calibration_frames or settings.QUANTIZATION_CALIBRATION_FRAMES
+        )
+        logger.info(f"Calibrating INT8 model on {len(frames)} frames")
+
+        class FrameReader(CalibrationDataReader):
+            def __init__(self):
+                self._frames = iter(frames)
+
+            def get_next(self):
+                frame = next(self._frames, None)
+                return None if frame is None else {input_name: _to_model_input(frame, preprocessor)}
+
+        quantize_static(
+            str(fp32_path),
+            str(int8_onnx_path),
+            FrameReader(),
+            quant_format=QuantFormat.QDQ,
+            op_types_to_quantize=['Conv'],
+            nodes_to_exclude=_head_nodes(fp32_model),
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            calibrate_method=CalibrationMethod.MinMax
+        )
+
+        # Keep the ultralytics metadata (class names, stride, imgsz) on the quantized model
+        int8_model = onnx.load(str(int8_onnx_path))
+        onnx.helper.set_model_props(int8_model, metadata)
+        onnx.save(int8_model, str(int8_onnx_path))
+
+    if backend == 'openvino':
+        import openvino as ov
+
+        fp32_dir = export_model('openvino', model_path)
+        target.mkdir(parents=True, exist_ok=True)
+        ov.save_model(ov.convert_model(str(int8_onnx_path)), str(target / f"{int8_onnx_path.stem}.xml"), compress_to_fp16=False)
+        shutil.copy(fp32_dir / 'metadata.yaml', target / 'metadata.yaml')
+
+    logger.info(f"INT8 model written to {target}")
+    return target
+
+
+def _iou(a: Dict, b: Dict) -> float:
+    ax2, ay2 = a['x'] + a['width'], a['y'] + a['height']
+    bx2, by2 = b['x'] + b['width'], b['y'] + b['height']
+    inter_w = max(0, min(ax2, bx2) - max(a['x'], b['x']))
+    inter_h = max(0, min(ay2, by2) - max(a['y'], b['y']))
+    inter = inter_w * inter_h
+    union = a['width'] * a['height'] + b['width'] * b['height'] - inter
+    return inter / union if union > 0 else 0.0
+
+
+def compare_detections(reference: List[Dict], candidate: List[Dict], iou_threshold: float = 0.5) -> Dict[str, Dict]:
+    """
+    Per-class agreement of candidate (INT8) detections with reference (FP32) ones
+
+    There are no ground-truth labels for our footage, so FP32 output is the
+    reference. Precision is the share of INT8 detections that match an FP32
+    detection of the same class (IoU >= iou_threshold, greedy by confidence).
+    Recall is the share of FP32 detections that INT8 still finds.
+    """
+    report = {}
+    classes = {d['original_class'] for d in reference} | {d['original_class'] for d in candidate}
+
+    for class_name in sorted(classes):
+        refs = [d for d in reference if d['original_class'] == class_name]
+        cands = sorted(
+            (d for d in candidate if d['original_class'] == class_name),
+            key=lambda d: d['confidence'],
+            reverse=True
+        )
+        matched = set()
+        true_positives = 0
+        for cand in cands:
+            best, best_iou = None, iou_threshold
+            for i, ref in enumerate(refs):
+                if i in matched or ref['frame_number'] != cand['frame_number']:
+                    continue
+                iou = _iou(ref['bbox'], cand['bbox'])
+                if iou >= best_iou:
+                    best, best_iou = i, iou
+            if best is not None:
+                matched.add(best)
+                true_positives += 1
+
+        report[class_name] = {
+            'fp32': len(refs),
+            'int8': len(cands),
+            'precision': true_positives / len(cands) if cands else 1.0,
+            'recall': true_positives / len(refs) if refs else 1.0,
+        }
+
+    return report
+
+
+def _timed_detections(processor, frames: List[np.ndarray]):
+    detections, latencies = [], []
+    processor.process_frames(frames[:1], [0])  # warm up
+    for frame_number, frame in enumerate(frames):
+        start = time.perf_counter()
+        detections.extend(processor.process_frames([frame], [frame_number]))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return detections, latencies
+
+
+def report(backend: str = 'onnxruntime', frames: int = 100, calibration_dir: Optional[str] = None):
+    """Print per-class precision/recall and latency of the INT8 model against FP32"""
+    from ml_processor import MLProcessor
+
+    # Half-interval offset keeps the evaluation frames apart from the calibration frames
+    eval_frames = sample_video_frames(calibration_dir or settings.QUANTIZATION_CALIBRATION_DIR, frames, offset=0.5)
+
+    fp32_detections, fp32_latency = _timed_detections(MLProcessor(backend=backend, precision='fp32'), eval_frames)
+    int8_detections, int8_latency = _timed_detections(MLProcessor(backend=backend, precision='int8'), eval_frames)
+
+    print(f"{backend} INT8 vs FP32 on {len(eval_frames)} frames (FP32 detections as reference)")
+    print(f"{'class':>12} {'fp32':>6} {'int8':>6} {'precision':>10} {'recall':>8}")
+    for class_name, row in compare_detections(fp32_detections, int8_detections).items():
+        print(f"{class_name:>12} {row['fp32']:>6} {row['int8']:>6} {row['precision']:>10.2%} {row['recall']:>8.2%}")
+
+    for name, latencies in (('fp32', fp32_latency), ('int8', int8_latency)):
+        print(f"{name} latency: {np.mean(latencies):7.1f} ms mean, {np.percentile(latencies, 95):7.1f} ms p95")
+    print(f"speedup: {np.mean(fp32_latency) / np.mean(int8_latency):.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="INT8 quantization of the detection model")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    quantize_parser = subparsers.add_parser("quantize", help="Calibrate and write the INT8 model next to MODEL_PATH")
+    quantize_parser.add_argument("--backend", choices=['onnxruntime', 'openvino'], default='onnxruntime')
+    quantize_parser.add_argument("--calibration-dir", default=None)
+    quantize_parser.add_argument("--frames", type=int, default=None, help="Number of calibration frames")
+    quantize_parser.add_argument("--force", action="store_true")
+
+    report_parser = subparsers.add_parser("report", help="Compare INT8 against FP32 accuracy and latency")
+    report_parser.add_argument("--backend", choices=['onnxruntime', 'openvino'], default='onnxruntime')
+    report_parser.add_argument("--calibration-dir", default=None)
+    report_parser.add_argument("--frames", type=int, default=100, help="Number of evaluation frames")
+
+    args = parser.parse_args()
+    if args.command == "quantize":
+        print(quantize_model(args.backend, calibration_dir=args.calibration_dir, calibration_frames=args.frames, force=args.force))
+    elif args.command == "report":
+        report(args.backend, args.frames, args.calibration_dir)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
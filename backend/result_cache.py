@@ -0,0 +1,322 @@
+"""
+Persistent cache of detection results, keyed by media content
+
+A result is stored under the SHA-256 of the file's bytes plus everything
+that changes what the model reports for it (model file, backend, thresholds,
+sampling rate, input size, ...). Rescanning an unchanged video, or processing
+a re-upload of the same file, returns the stored detections without decoding
+a single frame.
+
+The cache is a SQLite file shared by every process on the host (API, scan
+workers, Celery workers). Results are stored as compressed JSON, the least
+recently used ones are evicted once RESULT_CACHE_MAX_MB is exceeded, and
+hit/miss counters are kept in the same file so they add up across processes.
+"""
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Union
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# A relative RESULT_CACHE_PATH is under backend/, whichever directory a process was started from
+_BACKEND_DIR = Path(__file__).resolve().parent
+
+# Bump when the detection format changes, so older entries stop matching
+CACHE_FORMAT_VERSION = 2
+
+# Settings that change which detections a file produces
+_DETECTION_SETTINGS = (
+    'MODEL_PATH',
+    'INFERENCE_BACKEND',
+    'MODEL_PRECISION',
+    'CONFIDENCE_THRESHOLD',
+    'FRAME_EXTRACTION_FPS',
+    'FRAME_SAMPLING_MODE',
+    'ADAPTIVE_SAMPLING_ENABLED',
+    'SAMPLING_FLOOR_FPS',
+    'SAMPLING_ACTIVE_FPS',
+    'SAMPLING_IDLE_SECONDS',
+    'SAMPLING_HOLD_SECONDS',
+    'SAMPLING_TRIGGER_TYPES',
+    'INFERENCE_IMGSZ',
+    'TRIAGE_IMGSZ',
+    'MOTION_GATING_ENABLED',
+    'MOTION_THRESHOLD',
+    'MOTION_PIXEL_DELTA',
+    'MOTION_MAX_SKIPPED_FRAMES',
+    'MOTION_SKIP_MODE',
+    'TRACKING_ENABLED',
+    'TRACK_MATCH_IOU',
+    'TRACK_HIGH_CONFIDENCE',
+    'TRACK_MAX_MISSES',
+    'VIDEO_SEGMENT_MIN_SECONDS',
+    'VIDEO_SEGMENTS_PER_WORKER',
+    'SCAN_COARSE_INTERVAL',
+    'SCAN_CONFIRM_FRAMES',
+    'SCAN_DENSE_FPS',
+    'SCAN_BENIGN_FRAMES',
+    'SCAN_BENIGN_MAX_CONFIDENCE',
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    payload BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+CREATE TABLE IF NOT EXISTS file_digests (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def file_digest(source: Union[str, BinaryIO]) -> str:
+    """SHA-256 of a file's content, read in chunks (a path or an open binary file, which is rewound)"""
+    digest = hashlib.sha256()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(settings.DOWNLOAD_CHUNK_SIZE), b''):
+                digest.update(chunk)
+    else:
+        for chunk in iter(lambda: source.read(settings.DOWNLOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+        source.seek(0)
+    return digest.hexdigest()
+
+
+def cache_key(content_hash: str, kind: str, **params) -> str:
+    """
+    Key of one file's detections under the current settings
+
+    Args:
+        content_hash: file_digest of the media
+        kind: 'video' or 'image'
+        params: Per-call overrides (e.g. a camera's motion_threshold/imgsz), None means the setting
+    """
+    model_path = settings.MODEL_PATH
+    try:
+        model_stat = os.stat(model_path)
+        model_version = [model_stat.st_size, model_stat.st_mtime_ns]
+    except OSError:
+        model_version = None
+
+    fingerprint = {name: getattr(settings, name) for name in _DETECTION_SETTINGS}
+    fingerprint.update({name: value for name, value in params.items() if value is not None})
+    material = json.dumps(
+        [CACHE_FORMAT_VERSION, content_hash, kind, model_version, fingerprint],
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+class ResultCache:
+    """Size-bounded LRU store of detection lists in a SQLite file"""
+
+    def __init__(self, path: Optional[str] = None, max_bytes: Optional[int] = None):
+        """
+        Args:
+            path: SQLite file, defaults to settings.RESULT_CACHE_PATH
+            max_bytes: Total stored payload before LRU eviction, defaults to settings.RESULT_CACHE_MAX_MB
+        """
+        self.path = str(_BACKEND_DIR / (path or settings.RESULT_CACHE_PATH))
+        self.max_bytes = max_bytes if max_bytes is not None else settings.RESULT_CACHE_MAX_MB * 1024 * 1024
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # A short-lived connection per call, so the cache can be used from any thread or process
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            with conn:
+                yield conn
+
+    def get(self, key: str) -> Optional[List[Dict]]:
+        """Stored detections for a key, or None on a miss"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT payload FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._count(conn, 'misses')
+                return None
+            conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._count(conn, 'hits')
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key: str, detections: List[Dict]):
+        """Store detections, evicting the least recently used entries beyond max_bytes"""
+        payload = zlib.compress(json.dumps(detections, separators=(',', ':')).encode(), 6)
+        if len(payload) > self.max_bytes:
+            logger.warning(f"Result of {len(payload)} bytes is larger than the whole cache, not stored")
+            return
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, payload, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, payload, len(payload), time.time())
+            )
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+
+            evicted = 0
+            for old_key, size in conn.execute("SELECT key, size FROM results ORDER BY last_used").fetchall():
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM results WHERE key = ?", (old_key,))
+                total -= size
+                evicted += 1
+            self._count(conn, 'evictions', evicted)
+            logger.info(f"Evicted {evicted} cached results, {total} bytes left")
+
+    def local_file_digest(self, path: str) -> str:
+        """file_digest of a local file, remembered until its size or mtime changes"""
+        stat = os.stat(path)
+        path = os.path.abspath(path)
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT digest FROM file_digests WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (path, stat.st_size, stat.st_mtime_ns)
+            ).fetchone()
+        if row:
+            return row[0]
+
+        digest = file_digest(path)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO file_digests (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, digest)
+            )
+        return digest
+
+    def stats(self) -> Dict:
+        """Hit/miss/eviction counts (all processes) and current size"""
+        with self._connect() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        hits, misses = counters.get('hits', 0), counters.get('misses', 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "evictions": counters.get('evictions', 0),
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+        }
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM results")
+            conn.execute("DELETE FROM file_digests")
+            conn.execute("DELETE FROM counters")
+
+    @staticmethod
+    def _count(conn: sqlite3.Connection, name: str, amount: int = 1):
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + ?",
+            (name, amount, amount)
+        )
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """This process's ResultCache, or None when RESULT_CACHE_ENABLED is off"""
+    global _cache
+    if not settings.RESULT_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResultCache()
+    return _cache
+
+
+def local_content_hash(source: str) -> Optional[str]:
+    """Content hash of a local media file, None if caching is off or the source isn't a file (streams, URLs)"""
+    cache = get_result_cache()
+    if cache is None or not os.path.isfile(source):
+        return None
+    try:
+        return cache.local_file_digest(source)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"Could not hash {source}: {e}")
+        return None
+
+
+def cached_result(content_hash: Optional[str], kind: str, **params) -> Optional[List[Dict]]:
+    """
+    Stored detections for a file, None on a miss or when the cache can't be used
+
+    Args:
+        content_hash: file_digest of the media, None to bypass the cache (e.g. live streams)
+        kind: 'video' or 'image'
+        params: Per-call overrides that go into the key, see cache_key
+    """
+    cache = get_result_cache()
+    if cache is None or content_hash is None:
+        return None
+    try:
+        detections = cache.get(cache_key(content_hash, kind, **params))
+    except sqlite3.Error as e:
+        logger.warning(f"Result cache lookup failed, processing without it: {e}")
+        return None
+    if detections is not None:
+        logger.info(f"Result cache hit for {kind} {content_hash[:12]}, {len(detections)} detections")
+    return detections
+
+
+def store_result(content_hash: Optional[str], kind: str, detections: List[Dict], **params):
+    """Store a file's detections for cached_result, a no-op when the cache can't be used"""
+    cache = get_result_cache()
+    if cache is None or content_hash is None:
+        return
+    try:
+        cache.put(cache_key(content_hash, kind, **params), detections)
+    except sqlite3.Error as e:
+        logger.warning(f"Could not store result in cache: {e}")
+
+
+def cached_detections(
+    content_hash: Optional[str],
+    kind: str,
+    compute: Callable[[], List[Dict]],
+    **params
+) -> List[Dict]:
+    """
+    Detections for a file from the cache, or from compute() on a miss (then stored)
+
+    Args:
+        content_hash: file_digest of the media, None to bypass the cache (e.g. live streams)
+        kind: 'video' or 'image'
+        compute: Runs the model on the file
+        params: Per-call overrides that go into the key, see cache_key
+    """
+    detections = cached_result(content_hash, kind, **params)
+    if detections is None:
+        detections = compute()
+        store_result(content_hash, kind, detections, **params)
+    return detections
@@ -0,0 +1,104 @@
+"""
+Per-camera regions of interest
+
+A camera's ROI is a list of polygons in normalized coordinates ([x, y]
+fractions of the frame width and height, so it survives a resolution
+change). Frames are cropped to the bounding box of the polygons before
+inference, which keeps sky, walls and the lot next door out of the model
+input. The crop is fed at the scale the whole frame would have had, so the
+model input shrinks with it. Detections are then shifted back to frame
+coordinates, and those whose center falls outside every polygon are dropped.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+
+import cv2
+import numpy as np
+
+from preprocess import round_imgsz
+
+logger = logging.getLogger(__name__)
+
+Polygon = Sequence[Sequence[float]]
+
+
+class RegionOfInterest:
+    """
+    Crops frames to a camera's ROI and maps detections back
+
+    The pixel layout is computed for the size of the frames being cropped,
+    and recomputed if that size changes (e.g. a stream reconnects at another
+    resolution). Use one instance per video or stream.
+    """
+
+    def __init__(self, polygons: Sequence[Polygon]):
+        self.polygons = [np.asarray(polygon, dtype=np.float64).reshape(-1, 2) for polygon in polygons]
+        if not self.polygons or any(len(polygon) < 3 for polygon in self.polygons):
+            raise ValueError("A region of interest needs at least one polygon of 3 or more points")
+        self._frame_size: Optional[Tuple[int, int]] = None
+        self._origin = (0, 0)
+        self._mask: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_polygons(cls, polygons: Optional[Sequence[Polygon]]) -> Optional["RegionOfInterest"]:
+        """RegionOfInterest for a camera's stored polygons, None when it has none (whole frame)"""
+        return cls(polygons) if polygons else None
+
+    def crop(self, frame: np.ndarray) -> np.ndarray:
+        """View of the frame cropped to the ROI bounding box (no copy)"""
+        height, width = frame.shape[:2]
+        if self._frame_size != (width, height):
+            self._bind(width, height)
+        x, y = self._origin
+        mask_height, mask_width = self._mask.shape
+        return frame[y:y + mask_height, x:x + mask_width]
+
+    def to_frame(self, detections: List[Dict]) -> List[Dict]:
+        """Shift detections on a cropped frame to frame coordinates, dropping those outside the polygons"""
+        if self._mask is None or not detections:
+            return detections
+
+        x, y = self._origin
+        mask_height, mask_width = self._mask.shape
+        kept = []
+        for detection in detections:
+            bbox = detection['bbox']
+            center_x = min(max(int(bbox['x'] + bbox['width'] / 2), 0), mask_width - 1)
+            center_y = min(max(int(bbox['y'] + bbox['height'] / 2), 0), mask_height - 1)
+            if not self._mask[center_y, center_x]:
+                continue
+            bbox['x'] += x
+            bbox['y'] += y
+            kept.append(detection)
+        return kept
+
+    def input_size(self, imgsz: int) -> int:
+        """Model input size for the crop that keeps the scale imgsz gives the whole frame"""
+        if self._mask is None:
+            return imgsz
+        mask_height, mask_width = self._mask.shape
+        return round_imgsz(imgsz * max(mask_width, mask_height) / max(self._frame_size))
+
+    @property
+    def area_fraction(self) -> float:
+        """Share of the frame's pixels that go to the model"""
+        if self._mask is None:
+            return 1.0
+        width, height = self._frame_size
+        return self._mask.size / (width * height)
+
+    def _bind(self, width: int, height: int):
+        points = [np.round(polygon * (width, height)).astype(np.int32) for polygon in self.polygons]
+        stacked = np.concatenate(points)
+        x0, y0 = np.clip(stacked.min(axis=0), 0, (width - 1, height - 1))
+        x1, y1 = np.clip(stacked.max(axis=0) + 1, 1, (width, height))
+        # Degenerate polygons still crop to at least one pixel
+        x1, y1 = max(x1, x0 + 1), max(y1, y0 + 1)
+
+        mask = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+        cv2.fillPoly(mask, [p - (x0, y0) for p in points], 1)
+
+        self._frame_size = (width, height)
+        self._origin = (int(x0), int(y0))
+        self._mask = mask.astype(bool)
+        logger.info(f"ROI crop {x1 - x0}x{y1 - y0} at ({x0}, {y0}) of a {width}x{height} frame")
@@ -0,0 +1,141 @@
+"""
+Adaptive frame sampling driven by recent detections
+
+Sampling runs at the base rate by default. After idle_seconds without a
+relevant detection (person, weapon, fire, ...) it drops to a low floor rate,
+and as soon as one shows up it ramps to a high rate for hold_seconds. A
+quiet camera then costs a fraction of the steady-state inferences, and an
+incident is still covered frame after frame.
+
+Positions are seconds on any monotonic clock: media time for files
+(frame_number / fps), wall time for live streams.
+"""
+from typing import Dict, Iterable, List, Optional
+import logging
+import threading
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+IDLE = 'idle'
+NORMAL = 'normal'
+ACTIVE = 'active'
+
+
+class AdaptiveSampler:
+    """
+    Picks the interval to the next sampled frame from what was detected recently
+
+    The sampling side asks interval() and record()s the frames it takes, the
+    inference side reports detections with observe(), possibly from another
+    thread. Asking again on every frame lets the rate change as soon as a
+    detection comes back, instead of after the next scheduled sample.
+    """
+
+    def __init__(
+        self,
+        base_fps: float,
+        floor_fps: float,
+        active_fps: float,
+        idle_seconds: float,
+        hold_seconds: float,
+        trigger_types: Iterable[str],
+        label: str = ''
+    ):
+        """
+        Args:
+            base_fps: Rate until the camera has been idle for idle_seconds
+            floor_fps: Rate while nothing relevant has been detected for idle_seconds
+            active_fps: Rate for hold_seconds after a relevant detection
+            idle_seconds: Quiet time before dropping to floor_fps
+            hold_seconds: How long a relevant detection keeps the rate at active_fps
+            trigger_types: Detection types that count as relevant
+            label: Video or camera name for the log
+        """
+        self.base_fps = base_fps
+        self.floor_fps = min(floor_fps, base_fps)
+        self.active_fps = max(active_fps, base_fps)
+        self.idle_seconds = idle_seconds
+        self.hold_seconds = hold_seconds
+        self.trigger_types = set(trigger_types)
+        self.label = label
+
+        self.samples = {IDLE: 0, NORMAL: 0, ACTIVE: 0}
+        self.transitions = 0
+        self._state = NORMAL
+        self._start: Optional[float] = None
+        self._last_trigger: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, base_fps: Optional[float] = None, label: str = '') -> Optional["AdaptiveSampler"]:
+        """Sampler configured from settings, or None when ADAPTIVE_SAMPLING_ENABLED is off"""
+        if not settings.ADAPTIVE_SAMPLING_ENABLED:
+            return None
+        return cls(
+            base_fps or settings.FRAME_EXTRACTION_FPS,
+            floor_fps=settings.SAMPLING_FLOOR_FPS,
+            active_fps=settings.SAMPLING_ACTIVE_FPS,
+            idle_seconds=settings.SAMPLING_IDLE_SECONDS,
+            hold_seconds=settings.SAMPLING_HOLD_SECONDS,
+            trigger_types=settings.SAMPLING_TRIGGER_TYPES,
+            label=label
+        )
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def observe(self, position: float, detections: List[Dict]):
+        """Report one inferred frame's detections"""
+        if any(d['type'] in self.trigger_types for d in detections):
+            with self._lock:
+                if self._last_trigger is None or position > self._last_trigger:
+                    self._last_trigger = position
+
+    def interval(self, position: float) -> float:
+        """Seconds between samples at position, given the detections reported so far"""
+        with self._lock:
+            return 1.0 / self._fps(self._update(position))
+
+    def record(self, position: float):
+        """Count a frame sampled at position"""
+        with self._lock:
+            self.samples[self._update(position)] += 1
+
+    def next_interval(self, position: float) -> float:
+        """Record a sample taken at position and return the seconds until the next one"""
+        self.record(position)
+        return self.interval(position)
+
+    def frame_skip(self, frame_number: int, fps: float) -> int:
+        """interval in frames, for a video at fps"""
+        return max(1, round(self.interval(frame_number / fps) * fps))
+
+    def stats(self) -> Dict:
+        return {"state": self._state, "samples": dict(self.samples), "transitions": self.transitions}
+
+    def _update(self, position: float) -> str:
+        if self._start is None:
+            self._start = position
+        state = self._state_at(position)
+        if state != self._state:
+            self.transitions += 1
+            logger.info(
+                f"Sampling {self.label or 'rate'}: {self._state} -> {state} "
+                f"({self._fps(state):g} fps) at {position - self._start:.1f}s"
+            )
+            self._state = state
+        return state
+
+    def _state_at(self, position: float) -> str:
+        last_active = self._start if self._last_trigger is None else self._last_trigger
+        if self._last_trigger is not None and position - self._last_trigger < self.hold_seconds:
+            return ACTIVE
+        if position - last_active >= self.idle_seconds:
+            return IDLE
+        return NORMAL
+
+    def _fps(self, state: str) -> float:
+        return {IDLE: self.floor_fps, NORMAL: self.base_fps, ACTIVE: self.active_fps}[state]
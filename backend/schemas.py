@@ -1,13 +1,32 @@
 """
 Pydantic schemas for request/response validation
 """
-from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional, List, Dict
+from pydantic import BaseModel, Field, ConfigDict, field_validator
+from typing import Optional, List, Dict, Tuple
 from datetime import datetime
 from uuid import UUID
 
 
 # Camera Schemas
+# Upload queue of a camera's media, see task_queues.py
+CAMERA_PRIORITY_PATTERN = "^(high|normal|low)$"
+
+# Region of interest: polygons of [x, y] points, as fractions of the frame width and height
+RoiPolygons = List[List[Tuple[float, float]]]
+
+
+def _validate_roi(roi: Optional[RoiPolygons]) -> Optional[RoiPolygons]:
+    if roi is None:
+        return None
+    for polygon in roi:
+        if len(polygon) < 3:
+            raise ValueError("Each ROI polygon needs at least 3 points")
+        if any(not (0 <= x <= 1 and 0 <= y <= 1) for x, y in polygon):
+            raise ValueError("ROI points are fractions of the frame size, between 0 and 1")
+    # An empty list means no ROI, i.e. the whole frame
+    return roi or None
+
+
 class CameraBase(BaseModel):
     name: str
     location: str
@@ -16,6 +35,12 @@ class CameraBase(BaseModel):
     status: str = "active"
     stream_url: Optional[str] = None
     is_live: bool = False
+    motion_threshold: Optional[float] = Field(None, ge=0, le=1)
+    inference_imgsz: Optional[int] = Field(None, ge=32, le=1920)
+    roi: Optional[RoiPolygons] = None
+    priority: str = Field("normal", pattern=CAMERA_PRIORITY_PATTERN)
+
+    _check_roi = field_validator('roi')(_validate_roi)
 
 
 class CameraCreate(CameraBase):
@@ -30,6 +55,12 @@ class CameraUpdate(BaseModel):
     status: Optional[str] = None
     stream_url: Optional[str] = None
     is_live: Optional[bool] = None
+    motion_threshold: Optional[float] = Field(None, ge=0, le=1)
+    inference_imgsz: Optional[int] = Field(None, ge=32, le=1920)
+    roi: Optional[RoiPolygons] = None
+    priority: Optional[str] = Field(None, pattern=CAMERA_PRIORITY_PATTERN)
+
+    _check_roi = field_validator('roi')(_validate_roi)
 
 
 class Camera(CameraBase):
@@ -56,6 +87,7 @@ class MediaUpload(MediaUploadBase):
     file_url: str
     upload_time: datetime
     processing_status: str
+    content_hash: Optional[str] = None
     processed_at: Optional[datetime] = None
     
     model_config = ConfigDict(from_attributes=True)
@@ -67,6 +99,9 @@ class DetectionBase(BaseModel):
     confidence: float
     frame_number: Optional[int] = None
     bounding_box: Optional[Dict] = None
+    track_id: Optional[int] = None
+    first_frame_number: Optional[int] = None
+    last_frame_number: Optional[int] = None
 
 
 class Detection(DetectionBase):
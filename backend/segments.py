@@ -0,0 +1,160 @@
+"""
+Splitting long videos into segments that are processed in parallel
+
+A long upload is cut into frame ranges, each processed by its own Celery task
+on whichever worker is free (see celery_app.process_media_task). The number
+of segments follows the video length and the number of worker processes:
+enough for every worker to take a couple, but none shorter than
+VIDEO_SEGMENT_MIN_SECONDS, since each one pays for opening the file, seeking
+and a fresh tracker.
+
+Each segment is tracked on its own, so an object in view across a boundary
+comes back as two tracks. merge_segment_tracks stitches those back together
+and renumbers the tracks so ids are unique across the video.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+import math
+import os
+
+import numpy as np
+
+from config import settings
+from media_io import is_http_url
+from tracker import _to_xyxy, iou_matrix
+
+logger = logging.getLogger(__name__)
+
+
+def probe_video(video_url: str) -> Tuple[int, float]:
+    """(frame count, fps) of a video file, (0, 0.0) when it can't be opened or has no known length"""
+    # Imported here so the API process doesn't pull in OpenCV through celery_app
+    import cv2
+
+    cap = cv2.VideoCapture(video_url)
+    try:
+        if not cap.isOpened():
+            return 0, 0.0
+        return int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0), float(cap.get(cv2.CAP_PROP_FPS) or 0.0)
+    finally:
+        cap.release()
+
+
+def is_seekable(video_url: str) -> bool:
+    """Whether each segment task can open the video and seek in it without downloading it first"""
+    return os.path.isfile(video_url) or (is_http_url(video_url) and settings.VIDEO_DIRECT_URL_DECODE)
+
+
+def plan_segments(total_frames: int, fps: float, workers: int) -> List[Tuple[int, int]]:
+    """
+    Frame ranges [start, end) to process in parallel, a single range when splitting isn't worth it
+
+    Boundaries are multiples of the sampling step, so the segments sample the
+    same frames one pass over the whole video would.
+    """
+    if total_frames <= 0 or fps <= 0:
+        return [(0, total_frames)]
+
+    duration = total_frames / fps
+    count = min(
+        max(1, workers) * settings.VIDEO_SEGMENTS_PER_WORKER,
+        int(duration // settings.VIDEO_SEGMENT_MIN_SECONDS)
+    )
+    if count <= 1:
+        return [(0, total_frames)]
+
+    step = max(1, int(fps) // settings.FRAME_EXTRACTION_FPS)
+    length = math.ceil(total_frames / count / step) * step
+    return [(start, min(start + length, total_frames)) for start in range(0, total_frames, length)]
+
+
+def stitch_window(fps: float) -> int:
+    """Frames from a boundary within which tracks on both sides may be the same object"""
+    # As long as the tracker keeps a lost track at the base sampling rate
+    step = max(1, int(fps) // settings.FRAME_EXTRACTION_FPS)
+    return (settings.TRACK_MAX_MISSES + 1) * step
+
+
+def merge_segment_tracks(segments: Sequence[Dict], window: int) -> List[Dict]:
+    """
+    Track summaries of a whole video from those of its segments
+
+    Args:
+        segments: {'start_frame', 'end_frame', 'tracks'} per segment, tracks as
+            produced by tracker.collapse_tracks / TrackSummaries for that segment
+        window: Frames from a boundary within which tracks are stitched, see stitch_window
+
+    Returns:
+        Summaries with track ids renumbered from 1, ordered by first frame,
+        followed by the untracked detections
+    """
+    merged: List[Dict] = []
+    untracked: List[Dict] = []
+    # Tracks of the previous segment that were still in view at its end
+    ending: List[Dict] = []
+    previous_end: Optional[int] = None
+
+    for segment in sorted(segments, key=lambda s: s['start_frame']):
+        start, end = segment['start_frame'], segment['end_frame']
+        tracks = []
+        for summary in segment['tracks']:
+            if summary.get('track_id') is None:
+                untracked.append(summary)
+            else:
+                tracks.append(dict(summary))
+
+        starting = [t for t in tracks if t['first_frame'] < start + window]
+        continued = _stitch(ending, starting) if previous_end == start else {}
+        for track in tracks:
+            if id(track) in continued:
+                _combine(continued[id(track)], track)
+            else:
+                track['track_id'] = len(merged) + 1
+                merged.append(track)
+
+        ending = [
+            continued.get(id(track), track) for track in tracks if track['last_frame'] >= end - window
+        ]
+        previous_end = end
+
+    stitched = sum(len(segment['tracks']) for segment in segments) - len(untracked) - len(merged)
+    if stitched:
+        logger.info(f"Stitched {stitched} tracks across segment boundaries")
+    return sorted(merged, key=lambda t: (t['first_frame'], t['track_id'])) + untracked
+
+
+def _stitch(ending: List[Dict], starting: List[Dict]) -> Dict[int, Dict]:
+    """Greedily pair tracks that end at a boundary with those that start right after it, by box overlap"""
+    if not ending or not starting:
+        return {}
+
+    last_boxes = np.array([_to_xyxy(track['last_bbox']) for track in ending])
+    first_boxes = np.array([_to_xyxy(track['first_bbox']) for track in starting])
+    ious = iou_matrix(last_boxes, first_boxes)
+    for i, before in enumerate(ending):
+        for j, after in enumerate(starting):
+            if before['type'] != after['type']:
+                ious[i, j] = 0.0
+
+    pairs = {}
+    while ious.size and ious.max() >= settings.TRACK_MATCH_IOU:
+        i, j = np.unravel_index(np.argmax(ious), ious.shape)
+        pairs[id(starting[j])] = ending[i]
+        ious[i, :] = 0.0
+        ious[:, j] = 0.0
+    return pairs
+
+
+def _combine(summary: Dict, continuation: Dict):
+    """Extend a track summary with the one that continues it in the next segment"""
+    count = summary['detection_count'] + continuation['detection_count']
+    first_frame, first_bbox = summary['first_frame'], summary['first_bbox']
+    if continuation['confidence'] > summary['confidence']:
+        summary.update({k: v for k, v in continuation.items() if k != 'track_id'})
+    summary.update({
+        'detection_count': count,
+        'first_frame': first_frame,
+        'first_bbox': first_bbox,
+        'last_frame': continuation['last_frame'],
+        'last_bbox': continuation['last_bbox'],
+    })
@@ -0,0 +1,34 @@
+"""
+Alert severity of detections, shared by the Celery tasks and the live ingest
+"""
+from typing import Dict
+
+# Detections at least this confident raise an alert
+ALERT_CONFIDENCE = 0.7
+
+
+def determine_severity(detection_type: str, confidence: float) -> str:
+    """Determine alert severity based on detection type and confidence"""
+    
+    # Critical detections
+    if detection_type in ['weapon', 'gun', 'knife', 'fire']:
+        return 'critical'
+    
+    # High severity
+    if detection_type in ['accident', 'fight', 'violence']:
+        return 'high'
+    
+    # Medium severity
+    if detection_type in ['crowd', 'abandoned_vehicle', 'suspicious_activity']:
+        return 'medium'
+    
+    # Low severity (default)
+    return 'low'
+
+
+def is_critical(detection: Dict) -> bool:
+    """Whether a detection raises a critical alert"""
+    return (
+        detection['confidence'] >= ALERT_CONFIDENCE
+        and determine_severity(detection['type'], detection['confidence']) == 'critical'
+    )
@@ -0,0 +1,465 @@
+"""
+Persistent ingest workers for live cameras
+
+Each live camera (Camera.is_live with a stream_url) gets a StreamIngestWorker
+that keeps its capture open, instead of reconnecting on every /api/scan. A
+reader thread drains the stream, reconnecting with exponential backoff when
+it drops. Frames sampled at FRAME_EXTRACTION_FPS go into a small ring buffer
+that always serves the newest frame. An inference thread takes that frame,
+skipping any stale ones it fell behind on, and runs the model on it. With
+STREAM_SHARED_INFERENCE, frames from all cameras are batched through one
+InferenceServer.
+
+Run it as its own process next to the API and the Celery worker (from backend/):
+    python stream_ingest.py                    # every live camera in the database
+    python stream_ingest.py --file clip.mp4    # a local file played back as a live stream
+"""
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID, uuid4
+import argparse
+import logging
+import threading
+import time
+
+import cv2
+import numpy as np
+from sqlalchemy import insert
+
+import alert_events
+from config import settings
+from database import SessionLocal
+from db import models
+from inference_server import InferenceServer
+from ml_service import get_ml_processor
+from roi import RegionOfInterest
+from sampling import AdaptiveSampler
+from severity import ALERT_CONFIDENCE, determine_severity
+
+logger = logging.getLogger(__name__)
+
+# How long blocked threads wait before checking for shutdown
+_POLL_INTERVAL = 0.5
+
+# (worker, frame_number, detections) for every frame that went through the model
+DetectionCallback = Callable[["StreamIngestWorker", int, List[Dict]], None]
+
+
+class LatestFrameBuffer:
+    """
+    Small ring buffer of the most recent frames
+
+    The reader never blocks: when the buffer is full, the oldest frame is
+    overwritten. The consumer always gets the newest frame. Frames it never
+    took are counted as dropped.
+    """
+
+    def __init__(self, capacity: int = 2):
+        self._frames = deque(maxlen=max(1, capacity))
+        self._condition = threading.Condition()
+        self._next_seq = 0
+        self._consumed_seq = -1
+        self.frames_in = 0
+        self.frames_dropped = 0
+
+    def put(self, frame: np.ndarray, timestamp: Optional[float] = None) -> int:
+        """Add a frame and return its sequence number"""
+        with self._condition:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._frames.append((seq, timestamp or time.time(), frame))
+            self.frames_in += 1
+            self._condition.notify_all()
+            return seq
+
+    def get_latest(self, after: int = -1, timeout: Optional[float] = None) -> Optional[Tuple[int, float, np.ndarray]]:
+        """
+        Wait for a frame newer than `after` and return the newest one as (seq, timestamp, frame)
+
+        Returns None on timeout.
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._frames and self._frames[-1][0] > after, timeout):
+                return None
+            seq, timestamp, frame = self._frames[-1]
+            # Everything between the last frame handed out and this one was skipped
+            self.frames_dropped += seq - max(after, self._consumed_seq) - 1
+            self._consumed_seq = seq
+            return seq, timestamp, frame
+
+
+class FileStreamCapture:
+    """
+    Stand-in for a live camera: plays a local video file back in real time
+
+    Mirrors the cv2.VideoCapture calls the ingest worker uses. grab() paces
+    itself to the file's frame rate and fails at the end of the file, the
+    way a dropped stream does, so the worker reconnects and it plays again.
+    """
+
+    def __init__(self, path: str):
+        self._cap = cv2.VideoCapture(path)
+        self._interval = 1.0 / (self._cap.get(cv2.CAP_PROP_FPS) or 30)
+        self._next_frame_at = time.monotonic()
+
+    def isOpened(self) -> bool:
+        return self._cap.isOpened()
+
+    def get(self, prop: int) -> float:
+        return self._cap.get(prop)
+
+    def set(self, prop: int, value: float) -> bool:
+        return False
+
+    def grab(self) -> bool:
+        delay = self._next_frame_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._next_frame_at = max(self._next_frame_at + self._interval, time.monotonic() - self._interval)
+        return self._cap.grab()
+
+    def retrieve(self):
+        return self._cap.retrieve()
+
+    def release(self):
+        self._cap.release()
+
+
+class StreamIngestWorker:
+    """Keeps one camera's stream open and runs inference on its newest frame"""
+
+    def __init__(
+        self,
+        camera_id: str,
+        stream_url: str,
+        on_detections: Optional[DetectionCallback] = None,
+        fps: Optional[float] = None,
+        motion_threshold: Optional[float] = None,
+        imgsz: Optional[int] = None,
+        roi: Optional[List] = None,
+        processor_factory=get_ml_processor,
+        capture_factory=cv2.VideoCapture,
+        inference_server: Optional[InferenceServer] = None
+    ):
+        """
+        Args:
+            camera_id: Camera the stream belongs to
+            stream_url: RTSP/RTMP/HLS URL (anything capture_factory opens)
+            on_detections: Called with the detections of every processed frame
+            fps: Fixed frames per second fed to inference. Defaults to settings.FRAME_EXTRACTION_FPS,
+                adapted to recent detections when ADAPTIVE_SAMPLING_ENABLED
+            motion_threshold: Per-camera motion sensitivity, defaults to settings.MOTION_THRESHOLD
+            imgsz: Per-camera model input size, defaults to settings.INFERENCE_IMGSZ
+            roi: Per-camera region of interest polygons, frames are cropped to them before inference
+            processor_factory: Returns the MLProcessor (the shared one by default)
+            capture_factory: Opens the stream, cv2.VideoCapture or FileStreamCapture
+            inference_server: Shared batching server to run frames through, instead of
+                calling the processor directly
+        """
+        self.camera_id = camera_id
+        self.stream_url = stream_url
+        self.on_detections = on_detections
+        self.fps = fps or settings.FRAME_EXTRACTION_FPS
+        self.sampler = None if fps else AdaptiveSampler.from_settings(label=f"camera {camera_id}")
+        self.motion_threshold = motion_threshold
+        self.imgsz = imgsz
+        self.roi = roi
+        self.processor_factory = processor_factory
+        self.capture_factory = capture_factory
+        self.inference_server = inference_server
+
+        self.buffer = LatestFrameBuffer(settings.STREAM_BUFFER_SIZE)
+        self.connected = False
+        self.reconnects = 0
+        self.inferences = 0
+        self.inferences_skipped = 0
+        self.last_frame_age: Optional[float] = None
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        self._threads = [
+            threading.Thread(target=self._read_loop, name=f"ingest-read-{self.camera_id}", daemon=True),
+            threading.Thread(target=self._infer_loop, name=f"ingest-infer-{self.camera_id}", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Started ingest for camera {self.camera_id} ({self.stream_url})")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        logger.info(f"Stopped ingest for camera {self.camera_id}")
+
+    def is_alive(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def stats(self) -> Dict:
+        return {
+            "stream_url": self.stream_url,
+            "connected": self.connected,
+            "reconnects": self.reconnects,
+            "frames_sampled": self.buffer.frames_in,
+            "frames_dropped": self.buffer.frames_dropped,
+            "inferences": self.inferences,
+            "inferences_skipped": self.inferences_skipped,
+            "last_frame_age": self.last_frame_age,
+            "sampling": self.sampler.stats() if self.sampler else None,
+        }
+
+    def _read_loop(self):
+        """Keep the capture open and sample frames into the buffer, reconnecting with backoff"""
+        delay = settings.STREAM_RECONNECT_MIN_DELAY
+        interval = 1.0 / self.fps
+
+        while not self._stop.is_set():
+            cap = self.capture_factory(self.stream_url)
+            if not cap.isOpened():
+                cap.release()
+                logger.warning(f"Camera {self.camera_id}: could not open stream, retrying in {delay:.1f}s")
+                self.reconnects += 1
+                self._stop.wait(delay)
+                delay = min(delay * 2, settings.STREAM_RECONNECT_MAX_DELAY)
+                continue
+
+            # Keep the decoder's own queue short, our buffer decides what is fresh
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            self.connected = True
+            delay = settings.STREAM_RECONNECT_MIN_DELAY
+            next_sample = time.monotonic()
+            try:
+                while not self._stop.is_set():
+                    # grab() every frame so the stream never backs up, decode only the sampled ones
+                    if not cap.grab():
+                        break
+                    if time.monotonic() >= next_sample:
+                        ret, frame = cap.retrieve()
+                        if not ret:
+                            break
+                        self.buffer.put(frame)
+                        now = time.monotonic()
+                        if self.sampler:
+                            interval = self.sampler.next_interval(now)
+                        next_sample = max(next_sample + interval, now - interval)
+            finally:
+                cap.release()
+                self.connected = False
+
+            if not self._stop.is_set():
+                logger.warning(f"Camera {self.camera_id}: stream dropped, reconnecting in {delay:.1f}s")
+                self.reconnects += 1
+                self._stop.wait(delay)
+
+    def _infer_loop(self):
+        """Run the model on the newest sampled frame, whenever there is a new one"""
+        processor = self.processor_factory()
+        motion_gate = processor.make_motion_gate(self.motion_threshold)
+        # Both have the same process_frames, the server batches this camera's frame with the others'
+        model = self.inference_server or processor
+        region = RegionOfInterest.from_polygons(self.roi)
+        last_seq = -1
+
+        while not self._stop.is_set():
+            latest = self.buffer.get_latest(after=last_seq, timeout=_POLL_INTERVAL)
+            if latest is None:
+                continue
+            last_seq, timestamp, frame = latest
+            self.last_frame_age = time.time() - timestamp
+            if region:
+                frame = region.crop(frame)
+
+            if motion_gate and not motion_gate.has_motion(frame):
+                self.inferences_skipped += 1
+                continue
+
+            try:
+                imgsz = self.imgsz or settings.INFERENCE_IMGSZ
+                if region:
+                    imgsz = region.input_size(imgsz)
+                detections = model.process_frames([frame], [last_seq], imgsz=imgsz)
+                if region:
+                    detections = region.to_frame(detections)
+            except Exception as e:
+                logger.error(f"Camera {self.camera_id}: inference failed: {e}")
+                self._stop.wait(_POLL_INTERVAL)
+                continue
+            self.inferences += 1
+            if self.sampler:
+                self.sampler.observe(time.monotonic(), detections)
+
+            if self.on_detections:
+                try:
+                    self.on_detections(self, last_seq, detections)
+                except Exception as e:
+                    logger.error(f"Camera {self.camera_id}: detection handler failed: {e}")
+
+
+class IngestManager:
+    """Runs one StreamIngestWorker per live camera and keeps them in sync with the cameras table"""
+
+    def __init__(
+        self,
+        on_detections: Optional[DetectionCallback] = None,
+        inference_server: Optional[InferenceServer] = None,
+        **worker_options
+    ):
+        self.on_detections = on_detections
+        self.inference_server = inference_server
+        self.worker_options = worker_options
+        self.workers: Dict[str, StreamIngestWorker] = {}
+
+    def sync(self, cameras: Iterable):
+        """Start workers for new or changed live cameras and stop the ones that went away"""
+        wanted = {
+            str(camera.id): camera for camera in cameras
+            if camera.is_live and camera.stream_url
+        }
+
+        for camera_id in list(self.workers):
+            worker = self.workers[camera_id]
+            camera = wanted.get(camera_id)
+            if camera is None or (
+                (camera.stream_url, camera.motion_threshold, camera.inference_imgsz, camera.roi)
+                != (worker.stream_url, worker.motion_threshold, worker.imgsz, worker.roi)
+            ):
+                worker.stop()
+                del self.workers[camera_id]
+
+        for camera_id, camera in wanted.items():
+            if camera_id not in self.workers:
+                worker = StreamIngestWorker(
+                    camera_id,
+                    camera.stream_url,
+                    on_detections=self.on_detections,
+                    motion_threshold=camera.motion_threshold,
+                    imgsz=camera.inference_imgsz,
+                    roi=camera.roi,
+                    inference_server=self.inference_server,
+                    **self.worker_options
+                )
+                worker.start()
+                self.workers[camera_id] = worker
+
+    def stop_all(self):
+        for worker in self.workers.values():
+            worker.stop()
+        self.workers.clear()
+
+    def status(self) -> Dict:
+        status = {"cameras": {camera_id: worker.stats() for camera_id, worker in self.workers.items()}}
+        if self.inference_server:
+            status["inference"] = self.inference_server.stats()
+        return status
+
+    def run_forever(self, sync_interval: Optional[float] = None):
+        """Sync with the cameras table every sync_interval seconds until interrupted"""
+        sync_interval = sync_interval or settings.STREAM_CAMERA_SYNC_INTERVAL
+        try:
+            while True:
+                db = SessionLocal()
+                try:
+                    self.sync(db.query(models.Camera).filter(models.Camera.is_live == True).all())
+                except Exception as e:
+                    logger.error(f"Could not load live cameras: {e}")
+                finally:
+                    db.close()
+                time.sleep(sync_interval)
+                logger.info(f"Ingest status: {self.status()}")
+        finally:
+            self.stop_all()
+            if self.inference_server:
+                self.inference_server.stop()
+
+
+class AlertRecorder:
+    """
+    Stores high-confidence live detections as alerts
+
+    Repeats of the same detection type on a camera are suppressed for
+    STREAM_ALERT_COOLDOWN seconds. Otherwise a person standing in view would
+    raise an alert every frame.
+    """
+
+    def __init__(self):
+        self._last_alert: Dict[Tuple[str, str], float] = {}
+
+    def __call__(self, worker: StreamIngestWorker, frame_number: int, detections: List[Dict]):
+        now = time.monotonic()
+        fresh = []
+        for detection in detections:
+            key = (worker.camera_id, detection['type'])
+            if detection['confidence'] < ALERT_CONFIDENCE or now - self._last_alert.get(key, -float('inf')) < settings.STREAM_ALERT_COOLDOWN:
+                continue
+            self._last_alert[key] = now
+            fresh.append(detection)
+
+        if not fresh:
+            return
+
+        # Bulk rows with ids generated here, as celery_app._save_detections does
+        now = datetime.now(timezone.utc)
+        detection_rows, alert_rows = [], []
+        for detection_data in fresh:
+            detection_rows.append({
+                'id': uuid4(),
+                'media_id': None,
+                'frame_number': frame_number,
+                'track_id': None,
+                'detection_type': detection_data['type'],
+                'confidence': detection_data['confidence'],
+                'bounding_box': detection_data.get('bbox'),
+                'detected_at': now,
+            })
+            alert_rows.append({
+                'id': uuid4(),
+                'detection_id': detection_rows[-1]['id'],
+                'camera_id': UUID(worker.camera_id),
+                'severity': determine_severity(detection_data['type'], detection_data['confidence']),
+                'status': 'new',
+                'description': f"{detection_data['type']} detected on live stream with {detection_data['confidence']:.2%} confidence",
+                'thumbnail_url': None,
+                'created_at': now,
+            })
+
+        db = SessionLocal()
+        try:
+            db.execute(insert(models.Detection), detection_rows)
+            db.execute(insert(models.Alert), alert_rows)
+            db.commit()
+            logger.info(f"Camera {worker.camera_id}: raised {len(fresh)} alerts")
+        finally:
+            db.close()
+        # Pushed to the WebSocket clients by the API processes
+        alert_events.publish_alerts([
+            alert_events.alert_event(alert, detection) for alert, detection in zip(alert_rows, detection_rows)
+        ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Continuous inference on live camera streams")
+    parser.add_argument("--file", help="Play a local video back as a live stream instead of using the database")
+    args = parser.parse_args()
+
+    if args.file:
+        def log_detections(worker, frame_number, detections):
+            if detections:
+                logger.info(f"frame {frame_number}: {[d['original_class'] for d in detections]} {worker.stats()}")
+
+        worker = StreamIngestWorker("file", args.file, on_detections=log_detections, capture_factory=FileStreamCapture)
+        worker.start()
+        try:
+            while worker.is_alive():
+                time.sleep(1)
+        except KeyboardInterrupt:
+            worker.stop()
+        return
+
+    server = InferenceServer().start() if settings.STREAM_SHARED_INFERENCE else None
+    IngestManager(on_detections=AlertRecorder(), inference_server=server).run_forever()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
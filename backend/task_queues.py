@@ -0,0 +1,114 @@
+"""
+Celery queues for media processing, and how long tasks wait in them
+
+Uploads are routed to one of three queues, each meant for its own workers
+(see README):
+
+- realtime: images, short clips and anything from a high priority camera.
+  Small tasks that someone is waiting on.
+- standard: ordinary uploads.
+- bulk: large archival videos and low priority cameras. They may take
+  hours, but can't hold up the queues above.
+
+Within a queue, tasks also carry a priority (0 is served first on the Redis
+broker), so a high priority camera's clip goes ahead of routine ones.
+
+Each task's wait between publishing and starting is recorded per queue in
+Redis (the broker), so the wait times of all workers can be compared.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+
+import numpy as np
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+REALTIME = 'realtime'
+STANDARD = 'standard'
+BULK = 'bulk'
+QUEUES = (REALTIME, STANDARD, BULK)
+
+CAMERA_PRIORITIES = ('high', 'normal', 'low')
+
+# Redis broker priorities, 0 is consumed first
+_PRIORITY = {REALTIME: 0, STANDARD: 4, BULK: 8}
+
+_WAIT_KEY = "vigilai:queue_wait:{}"
+
+_redis = None
+
+
+def route_media(file_type: str, size_bytes: Optional[int], camera_priority: Optional[str] = None) -> Tuple[str, int]:
+    """
+    Queue and priority for processing an upload
+
+    Args:
+        file_type: 'video' or 'image'
+        size_bytes: File size, None if unknown
+        camera_priority: The camera's priority ('high', 'normal' or 'low')
+    """
+    size_mb = (size_bytes or 0) / (1024 * 1024)
+    if camera_priority == 'high' or file_type == 'image' or (size_bytes is not None and size_mb <= settings.REALTIME_MAX_MB):
+        queue = REALTIME
+    elif camera_priority == 'low' or size_mb >= settings.BULK_MIN_MB:
+        queue = BULK
+    else:
+        queue = STANDARD
+
+    priority = _PRIORITY[queue]
+    if camera_priority == 'high':
+        priority = max(0, priority - 1)
+    elif camera_priority == 'low':
+        priority = min(9, priority + 1)
+    return queue, priority
+
+
+def prefetch_multiplier(queues: Sequence[str]) -> Optional[int]:
+    """QUEUE_PREFETCH_MULTIPLIERS for a worker consuming these queues (the smallest applies), None if none is set"""
+    multipliers = [settings.QUEUE_PREFETCH_MULTIPLIERS[q] for q in queues if q in settings.QUEUE_PREFETCH_MULTIPLIERS]
+    return min(multipliers) if multipliers else None
+
+
+def summarize_waits(waits: List[float]) -> Dict:
+    """Count and percentiles (ms) of wait times in seconds"""
+    if not waits:
+        return {"count": 0, "p50_ms": None, "p95_ms": None, "max_ms": None}
+    p50, p95 = np.percentile(waits, [50, 95])
+    return {
+        "count": len(waits),
+        "p50_ms": round(float(p50) * 1000, 1),
+        "p95_ms": round(float(p95) * 1000, 1),
+        "max_ms": round(max(waits) * 1000, 1),
+    }
+
+
+def _get_redis():
+    global _redis
+    if _redis is None:
+        import redis
+
+        _redis = redis.Redis.from_url(settings.CELERY_BROKER_URL, socket_timeout=2, socket_connect_timeout=2)
+    return _redis
+
+
+def record_wait(queue: str, seconds: float):
+    """Add one task's queue wait, keeping the last QUEUE_METRICS_WINDOW per queue"""
+    key = _WAIT_KEY.format(queue)
+    try:
+        pipe = _get_redis().pipeline()
+        pipe.lpush(key, seconds)
+        pipe.ltrim(key, 0, settings.QUEUE_METRICS_WINDOW - 1)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not record wait time for queue {queue}: {e}")
+
+
+def wait_stats() -> Dict[str, Dict]:
+    """Recent wait times per queue, recorded by all workers"""
+    client = _get_redis()
+    return {
+        queue: summarize_waits([float(w) for w in client.lrange(_WAIT_KEY.format(queue), 0, -1)])
+        for queue in QUEUES
+    }
@@ -0,0 +1,53 @@
+import pytest
+import torch
+from ultralytics.engine.results import Results
+
+import result_cache
+from config import settings
+
+
+@pytest.fixture(autouse=True)
+def isolated_result_cache(tmp_path, monkeypatch):
+    """Keep every test's result cache in its own temp dir, never backend/cache"""
+    path = str(tmp_path / 'cache' / 'results.db')
+    monkeypatch.setattr(settings, 'RESULT_CACHE_PATH', path)
+    # Scan pool workers are spawned and read their settings from the environment
+    monkeypatch.setenv('RESULT_CACHE_PATH', path)
+    monkeypatch.setattr(result_cache, '_cache', None)
+
+
+class FakeYOLO:
+    """Stand-in for ultralytics.YOLO that returns deterministic boxes per frame"""
+
+    names = {0: 'person', 2: 'car', 43: 'knife', 56: 'chair'}
+
+    def __init__(self, *args, **kwargs):
+        self.batch_sizes = []
+        self.imgsz = []
+        self.classes = None
+
+    def __call__(self, source, conf=0.25, verbose=False, classes=None, imgsz=640, **kwargs):
+        frames = source if isinstance(source, list) else [source]
+        self.batch_sizes.append(len(frames))
+        self.imgsz.append(imgsz)
+        self.classes = classes
+        return [self._result(frame, classes) for frame in frames]
+
+    def _result(self, frame, classes=None):
+        # Shift boxes by frame brightness so results depend on which frame was passed
+        shift = float(frame.mean())
+        boxes = torch.tensor([
+            [10.5 + shift, 20.25, 110.75 + shift, 220.5, 0.9, 0],  # person
+            [5.0, 5.0 + shift, 50.9, 40.2 + shift, 0.65, 43],  # knife
+            [0.0, 0.0, 30.0, 30.0, 0.95, 56],  # chair, not a surveillance class
+            [1.0, 1.0, 2.0, 2.0, 0.3, 2],  # car, below threshold
+        ])
+        if classes is not None:
+            boxes = boxes[torch.isin(boxes[:, 5], torch.tensor(classes, dtype=boxes.dtype))]
+        return Results(frame, path='', names=self.names, boxes=boxes)
+
+
+@pytest.fixture
+def fake_yolo():
+    """FakeYOLO, to patch in for inference_backends.YOLO"""
+    return FakeYOLO
@@ -0,0 +1,84 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+import alert_events
+from config import settings
+from main import app
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def event(alert_id='a1', detected=0.0, published=0.2):
+    return {
+        'id': alert_id,
+        'detection_type': 'weapon',
+        'detected_at': (T0 + timedelta(seconds=detected)).isoformat(),
+        'published_at': (T0 + timedelta(seconds=published)).isoformat(),
+    }
+
+
+def test_latency_is_measured_per_stage():
+    latency = alert_events.AlertLatency(window=10)
+    latency.record_sent(event(), sent_at=T0.timestamp() + 0.25)
+    # The browser's ack arrives 40 ms after sending, 20 ms each way
+    latency.record_ack('a1', received_at=T0.timestamp() + 0.29)
+    latency.record_ack('unknown')
+
+    stats = latency.stats()
+    assert stats['publish']['p50_ms'] == 200.0
+    assert stats['delivery']['p50_ms'] == 50.0
+    assert stats['detection_to_send']['p50_ms'] == 250.0
+    assert stats['detection_to_browser'] == {'count': 1, 'p50_ms': 270.0, 'p95_ms': 270.0, 'max_ms': 270.0}
+
+
+def test_browser_acks_are_reported(monkeypatch):
+    latency = alert_events.AlertLatency(window=10)
+    monkeypatch.setattr(alert_events, 'latency', latency)
+    latency.record_sent(event(published=0.0), sent_at=T0.timestamp() + 0.1)
+
+    client = TestClient(app)
+    with client.websocket_connect("/ws/alerts") as ws:
+        assert ws.receive_json()['type'] == 'connection'
+        ws.send_json({'type': 'alert_ack', 'alert_id': 'a1'})
+        ws.send_json({'type': 'ping'})
+        assert ws.receive_json() == {'type': 'pong'}
+
+    stats = client.get("/api/alerts/stats/latency").json()
+    assert stats['detection_to_browser']['count'] == 1
+    assert stats['delivery']['count'] == 1
+
+
+def test_published_alerts_reach_the_subscriber(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(alert_events, 'latency', alert_events.AlertLatency(window=10))
+    monkeypatch.setattr(settings, 'ALERT_EVENT_BLOCK_MS', 50)
+
+    received = []
+
+    async def broadcast(alert):
+        received.append(alert)
+
+    async def scenario():
+        subscriber = alert_events.AlertSubscriber(broadcast, client=fakeredis.aioredis.FakeRedis(server=server))
+        subscriber.start()
+        # Only events published after the subscriber started are delivered
+        await asyncio.sleep(0.1)
+        now = datetime.now(timezone.utc).isoformat()
+        alert_events.publish_alerts(
+            [{**event('a1'), 'detected_at': now}, {**event('a2'), 'detected_at': now}],
+            client=fakeredis.FakeRedis(server=server)
+        )
+        for _ in range(50):
+            if len(received) == 2:
+                break
+            await asyncio.sleep(0.02)
+        await subscriber.stop()
+
+    asyncio.run(scenario())
+    assert [e['id'] for e in received] == ['a1', 'a2']
+    assert 'published_at' in received[0]
+    assert alert_events.latency.stats()['detection_to_send']['count'] == 2
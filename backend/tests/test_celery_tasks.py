@@ -0,0 +1,328 @@
+import csv
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import celery_app
+import models
+from config import settings
+from database import Base
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tasks.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(celery_app, 'SessionLocal', factory)
+    monkeypatch.setattr(settings, 'RESULT_CACHE_ENABLED', False)
+    return factory
+
+
+def track(frame_number, confidence=0.9):
+    return {
+        'type': 'person',
+        'confidence': confidence,
+        'frame_number': frame_number,
+        'bbox': {'x': 0, 'y': 0, 'width': 10, 'height': 10},
+        'track_id': frame_number + 1,
+    }
+
+
+def test_video_detections_are_saved_while_processing(session_factory, monkeypatch):
+    with session_factory() as db:
+        media = models.MediaUpload(file_name='clip.mp4', file_type='video', file_url='/videos/clip.mp4')
+        db.add(media)
+        db.commit()
+        media_id = media.id
+
+    def saved_rows():
+        with session_factory() as db:
+            return db.query(models.Detection).filter(models.Detection.media_id == media_id).count()
+
+    seen_while_processing = []
+
+    class Processor:
+        def iter_video(self, video_url, **options):
+            # A new, short-lived track on every frame
+            for frame_number in range(10):
+                seen_while_processing.append(saved_rows())
+                yield frame_number, [track(frame_number, confidence=0.9 if frame_number % 2 else 0.5)]
+
+    monkeypatch.setattr(celery_app, 'get_ml_processor', lambda: Processor())
+    monkeypatch.setattr(settings, 'TRACK_MAX_MISSES', 0)
+    monkeypatch.setattr(settings, 'MOTION_MAX_SKIPPED_FRAMES', 0)
+    monkeypatch.setattr(settings, 'DETECTION_PERSIST_CHUNK_SIZE', 3)
+
+    celery_app.process_media_task(str(media_id))
+
+    # A track is final one frame after its last detection, then saved in chunks of 3
+    assert seen_while_processing == [0, 0, 0, 0, 3, 3, 3, 6, 6, 6]
+    with session_factory() as db:
+        detections = db.query(models.Detection).order_by(models.Detection.track_id).all()
+        assert [d.track_id for d in detections] == list(range(1, 11))
+        assert detections[0].bounding_box == {'x': 0, 'y': 0, 'width': 10, 'height': 10}
+        alerts = db.query(models.Alert).all()
+        assert sorted(alert.detection.track_id for alert in alerts) == [2, 4, 6, 8, 10]
+        assert {alert.status for alert in alerts} == {'new'}
+        assert db.get(models.MediaUpload, media_id).processing_status == 'completed'
+
+
+def test_postgres_chunks_are_written_with_copy(monkeypatch):
+    copied = {}
+
+    class Cursor:
+        def copy_expert(self, sql, buffer):
+            copied[sql.split()[1]] = (sql, list(csv.reader(buffer)))
+
+        def close(self):
+            pass
+
+    class Session:
+        def get_bind(self):
+            return type('Engine', (), {'dialect': type('Dialect', (), {'name': 'postgresql'})})
+
+        def connection(self):
+            return type('Connection', (), {'connection': type('Raw', (), {'cursor': lambda self: Cursor()})()})
+
+        def execute(self, *args):
+            raise AssertionError("executemany used instead of COPY")
+
+    media = models.MediaUpload(id=uuid.uuid4(), camera_id=None)
+
+    assert celery_app._save_detections(Session(), media, [track(0), track(1, confidence=0.5)])
+
+    sql, rows = copied['detections']
+    assert sql.startswith("COPY detections (id, media_id, frame_number, track_id,")
+    assert len(rows) == 2
+    assert rows[0][1] == str(media.id)
+    assert rows[1][4:6] == ['\\N', '\\N']
+    assert rows[1][8] == '{"x": 0, "y": 0, "width": 10, "height": 10}'
+    _, alert_rows = copied['alerts']
+    assert [row[1] for row in alert_rows] == [rows[0][0]]
+
+
+def test_long_videos_are_processed_in_parallel_segments(session_factory, monkeypatch):
+    with session_factory() as db:
+        media = models.MediaUpload(file_name='long.mp4', file_type='video', file_url='/videos/long.mp4')
+        db.add(media)
+        db.commit()
+        media_id = media.id
+
+    processed = []
+
+    class Processor:
+        def iter_video(self, video_url, start_frame=0, end_frame=None, **options):
+            # Every segment has its own tracker, so its ids start at 1 again
+            processed.append((start_frame, end_frame))
+            for frame_number in range(start_frame, end_frame, 10):
+                frame = [{**track(frame_number), 'track_id': 1}]
+                if 1500 <= frame_number < 1600:
+                    frame.append({**track(frame_number), 'type': 'weapon', 'track_id': 2,
+                                  'bbox': {'x': 300, 'y': 0, 'width': 10, 'height': 10}})
+                yield frame_number, frame
+
+    monkeypatch.setattr(celery_app.celery_app.conf, 'task_always_eager', True)
+    monkeypatch.setattr(celery_app, 'get_ml_processor', lambda: Processor())
+    monkeypatch.setattr(celery_app, 'is_seekable', lambda url: True)
+    monkeypatch.setattr(celery_app, 'probe_video', lambda url: (3000, 10.0))
+    monkeypatch.setattr(settings, 'FRAME_EXTRACTION_FPS', 1)
+    monkeypatch.setattr(settings, 'VIDEO_SEGMENT_MIN_SECONDS', 60)
+    monkeypatch.setattr(settings, 'VIDEO_SEGMENT_WORKERS', 1)
+    monkeypatch.setattr(settings, 'VIDEO_SEGMENTS_PER_WORKER', 3)
+
+    celery_app.process_media_task(str(media_id))
+
+    assert processed == [(0, 1000), (1000, 2000), (2000, 3000)]
+    with session_factory() as db:
+        detections = db.query(models.Detection).order_by(models.Detection.track_id).all()
+        # The person seen throughout is stitched back into one track
+        assert [(d.track_id, d.detection_type, d.first_frame_number, d.last_frame_number) for d in detections] == [
+            (1, 'person', 0, 2990),
+            (2, 'weapon', 1500, 1590),
+        ]
+        assert db.get(models.MediaUpload, media_id).processing_status == 'completed'
+
+
+def test_interrupted_video_resumes_from_its_checkpoint(session_factory, monkeypatch):
+    with session_factory() as db:
+        media = models.MediaUpload(file_name='clip.mp4', file_type='video', file_url='/videos/clip.mp4')
+        db.add(media)
+        db.commit()
+        media_id = media.id
+
+    runs = []
+
+    class Processor:
+        def __init__(self, crash_at=None):
+            self.crash_at = crash_at
+
+        def iter_video(self, video_url, start_frame=0, **options):
+            runs.append(start_frame)
+            # A new, short-lived track on every frame, numbered from 1 by each run's tracker
+            for track_id, frame_number in enumerate(range(start_frame, 10), start=1):
+                if frame_number == self.crash_at:
+                    raise RuntimeError("worker lost")
+                yield frame_number, [{**track(frame_number), 'track_id': track_id,
+                                      'bbox': {'x': 100 * frame_number, 'y': 0, 'width': 10, 'height': 10}}]
+
+    monkeypatch.setattr(settings, 'TRACK_MAX_MISSES', 0)
+    monkeypatch.setattr(settings, 'MOTION_MAX_SKIPPED_FRAMES', 0)
+    monkeypatch.setattr(settings, 'DETECTION_PERSIST_CHUNK_SIZE', 3)
+
+    monkeypatch.setattr(celery_app, 'get_ml_processor', lambda: Processor(crash_at=8))
+    with pytest.raises(RuntimeError):
+        celery_app.process_media_task(str(media_id))
+    with session_factory() as db:
+        # Two chunks were committed, the last one along with a checkpoint at frame 7
+        assert db.query(models.Detection).count() == 6
+        assert db.get(models.ProcessingCheckpoint, media_id).next_frame == 7
+
+    monkeypatch.setattr(celery_app, 'get_ml_processor', lambda: Processor())
+    celery_app.process_media_task(str(media_id))
+
+    assert runs == [0, 7]
+    with session_factory() as db:
+        detections = db.query(models.Detection).order_by(models.Detection.track_id).all()
+        assert [(d.track_id, d.frame_number) for d in detections] == [(i + 1, i) for i in range(10)]
+        assert db.get(models.ProcessingCheckpoint, media_id) is None
+        assert db.get(models.MediaUpload, media_id).processing_status == 'completed'
+
+    # Delivered once more after completing: nothing is processed or saved again
+    celery_app.process_media_task(str(media_id))
+    assert runs == [0, 7]
+    with session_factory() as db:
+        assert db.query(models.Detection).count() == 10
+
+
+def test_critical_alerts_are_published_as_soon_as_they_are_committed(session_factory, monkeypatch):
+    with session_factory() as db:
+        media = models.MediaUpload(file_name='clip.mp4', file_type='video', file_url='/videos/clip.mp4')
+        db.add(media)
+        db.commit()
+        media_id = media.id
+
+    published = []
+
+    def publish_alerts(events):
+        with session_factory() as db:
+            published.append((db.query(models.Alert).count(), [e['detection_type'] for e in events]))
+
+    class Processor:
+        def iter_video(self, video_url, **options):
+            for frame_number in range(6):
+                yield frame_number, [{**track(frame_number), 'type': 'weapon' if frame_number == 2 else 'person'}]
+
+    monkeypatch.setattr(celery_app, 'get_ml_processor', lambda: Processor())
+    monkeypatch.setattr(celery_app.alert_events, 'publish_alerts', publish_alerts)
+    monkeypatch.setattr(settings, 'TRACK_MAX_MISSES', 0)
+    monkeypatch.setattr(settings, 'MOTION_MAX_SKIPPED_FRAMES', 0)
+
+    celery_app.process_media_task(str(media_id))
+
+    # The weapon's track is pushed as soon as it is seen on frame 2, with what is pending, the rest at the end
+    assert published == [(3, ['person', 'person', 'weapon']), (6, ['person'] * 3)]
+
+
+def test_critical_track_is_alerted_on_while_still_in_view(session_factory, monkeypatch):
+    with session_factory() as db:
+        media = models.MediaUpload(file_name='clip.mp4', file_type='video', file_url='/videos/clip.mp4')
+        db.add(media)
+        db.commit()
+        media_id = media.id
+
+    frames_read = []
+    published = []
+
+    def publish_alerts(events):
+        published.extend((frames_read[-1], event) for event in events)
+
+    class Processor:
+        def __init__(self, crash_at=None):
+            self.crash_at = crash_at
+
+        def iter_video(self, video_url, start_frame=0, **options):
+            # A weapon in view from frame 2 to the end, most clearly on frame 7
+            for frame_number in range(start_frame, 10):
+                if frame_number == self.crash_at:
+                    raise RuntimeError("worker lost")
+                frames_read.append(frame_number)
+                confidence = 0.95 if frame_number == 7 else 0.8
+                weapon = {**track(frame_number, confidence), 'type': 'weapon', 'track_id': 1}
+                yield frame_number, [weapon] if frame_number >= 2 else []
+
+    monkeypatch.setattr(celery_app.alert_events, 'publish_alerts', publish_alerts)
+    monkeypatch.setattr(settings, 'TRACK_MAX_MISSES', 0)
+    monkeypatch.setattr(settings, 'MOTION_MAX_SKIPPED_FRAMES', 0)
+
+    monkeypatch.setattr(celery_app, 'get_ml_processor', lambda: Processor(crash_at=6))
+    with pytest.raises(RuntimeError):
+        celery_app.process_media_task(str(media_id))
+
+    # Published from frame 2, while the track is still open
+    assert [(frame, event['detection_type'], event['frame_number']) for frame, event in published] == [
+        (2, 'weapon', 2)
+    ]
+    with session_factory() as db:
+        assert db.get(models.ProcessingCheckpoint, media_id).next_frame == 3
+
+    # The resumed run finishes the same track, and updates its row instead of adding one
+    monkeypatch.setattr(celery_app, 'get_ml_processor', lambda: Processor())
+    celery_app.process_media_task(str(media_id))
+
+    assert len(published) == 1
+    with session_factory() as db:
+        detection = db.query(models.Detection).one()
+        assert (detection.frame_number, detection.first_frame_number, detection.last_frame_number) == (7, 2, 9)
+        assert detection.confidence == 0.95
+        # Detected when first seen, not when the track ended
+        assert detection.detected_at == datetime.fromisoformat(published[0][1]['detected_at']).replace(tzinfo=None)
+        assert db.query(models.Alert).one().detection_id == detection.id
+
+
+def test_reupload_of_a_segmented_video_is_served_from_the_cache(session_factory, monkeypatch):
+    with session_factory() as db:
+        uploads = [
+            models.MediaUpload(file_name='long.mp4', file_type='video', file_url=f'/videos/long{i}.mp4', content_hash='ab' * 32)
+            for i in range(2)
+        ]
+        db.add_all(uploads)
+        db.commit()
+        media_ids = [media.id for media in uploads]
+
+    processed = []
+
+    class Processor:
+        def iter_video(self, video_url, start_frame=0, end_frame=None, **options):
+            processed.append(video_url)
+            for frame_number in range(start_frame, end_frame, 10):
+                yield frame_number, [{**track(frame_number), 'track_id': 1}]
+
+    monkeypatch.setattr(settings, 'RESULT_CACHE_ENABLED', True)
+    monkeypatch.setattr(celery_app.celery_app.conf, 'task_always_eager', True)
+    monkeypatch.setattr(celery_app, 'get_ml_processor', lambda: Processor())
+    monkeypatch.setattr(celery_app, 'is_seekable', lambda url: True)
+    monkeypatch.setattr(celery_app, 'probe_video', lambda url: (3000, 10.0))
+    monkeypatch.setattr(settings, 'FRAME_EXTRACTION_FPS', 1)
+    monkeypatch.setattr(settings, 'VIDEO_SEGMENT_MIN_SECONDS', 60)
+    monkeypatch.setattr(settings, 'VIDEO_SEGMENT_WORKERS', 1)
+
+    for media_id in media_ids:
+        celery_app.process_media_task(str(media_id))
+
+    # Only the first upload was split and processed
+    assert set(processed) == {'/videos/long0.mp4'}
+    with session_factory() as db:
+        for media_id in media_ids:
+            detections = db.query(models.Detection).filter(models.Detection.media_id == media_id).all()
+            assert [(d.track_id, d.first_frame_number, d.last_frame_number) for d in detections] == [(1, 0, 2990)]
+            assert db.get(models.MediaUpload, media_id).processing_status == 'completed'
+
+
+def test_segment_tasks_of_a_deleted_media_fail_quietly(session_factory):
+    missing = str(uuid.uuid4())
+    assert celery_app.process_video_segment_task(missing, 0, 100) is None
+    assert celery_app.merge_video_segments_task([None], missing, 10) is None
@@ -0,0 +1,119 @@
+import os
+import shutil
+from pathlib import Path
+
+import cv2
+import pytest
+
+import inference_backends
+from config import settings
+from ml_processor import MLProcessor
+
+SAMPLE_VIDEO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'videos', 'Burglary001_x264_14.mp4')
+
+BACKEND_PACKAGES = {'onnxruntime': 'onnxruntime', 'openvino': 'openvino'}
+
+
+@pytest.fixture(scope='module')
+def sample_frames():
+    cap = cv2.VideoCapture(SAMPLE_VIDEO)
+    frames, numbers = [], []
+    frame_number = 0
+    while len(frames) < 4:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if frame_number % 30 == 0:
+            frames.append(frame)
+            numbers.append(frame_number)
+        frame_number += 1
+    cap.release()
+    return frames, numbers
+
+
+@pytest.fixture(scope='module')
+def model_copy(tmp_path_factory):
+    # Export into a temp dir so the test never writes converted models next to the real weights
+    if not os.path.isfile(settings.MODEL_PATH):
+        # ultralytics would try to download them
+        pytest.skip(f"Model weights {settings.MODEL_PATH} not available locally")
+    weights = Path(inference_backends.load_torch_model().ckpt_path)
+    path = tmp_path_factory.mktemp('models') / weights.name
+    shutil.copy(weights, path)
+    return str(path)
+
+
+def assert_same_detections(expected, actual, conf_tol=0.05, px_tol=8):
+    """Every clearly-above-threshold detection must have a close counterpart in the other backend"""
+    def confident(detections):
+        return [d for d in detections if d['confidence'] >= settings.CONFIDENCE_THRESHOLD + conf_tol]
+
+    def has_match(detection, candidates):
+        return any(
+            c.keys() == detection.keys()
+            and c['frame_number'] == detection['frame_number']
+            and c['original_class'] == detection['original_class']
+            and abs(c['confidence'] - detection['confidence']) <= conf_tol
+            and all(abs(c['bbox'][k] - detection['bbox'][k]) <= px_tol for k in detection['bbox'])
+            for c in candidates
+        )
+
+    for detection in confident(expected):
+        assert has_match(detection, actual), detection
+    for detection in confident(actual):
+        assert has_match(detection, expected), detection
+
+
+@pytest.mark.parametrize('backend', list(BACKEND_PACKAGES))
+def test_backend_parity(backend, model_copy, sample_frames, monkeypatch):
+    pytest.importorskip(BACKEND_PACKAGES[backend])
+    monkeypatch.setattr(settings, 'MODEL_PATH', model_copy)
+    frames, numbers = sample_frames
+
+    expected = MLProcessor(backend='torch').process_frames(frames, numbers)
+    actual = MLProcessor(backend=backend).process_frames(frames, numbers)
+
+    assert inference_backends.exported_model_path(backend).exists()
+    assert_same_detections(expected, actual)
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        inference_backends.load_model('tensorrt-but-misspelled')
+
+
+def test_int8_model_is_built_and_loadable(model_copy, sample_frames, monkeypatch):
+    pytest.importorskip('onnxruntime')
+    import quantization
+
+    monkeypatch.setattr(settings, 'MODEL_PATH', model_copy)
+    frames, numbers = sample_frames
+
+    path = quantization.quantize_model('onnxruntime', calibration_dir=os.path.dirname(SAMPLE_VIDEO), calibration_frames=4)
+    processor = MLProcessor(backend='onnxruntime', precision='int8')
+
+    assert path == inference_backends.exported_model_path('onnxruntime', precision='int8')
+    assert processor.model.names == MLProcessor(backend='torch').model.names
+    for detection in processor.process_frames(frames, numbers):
+        assert set(detection) == {'type', 'original_class', 'confidence', 'frame_number', 'bbox'}
+
+
+def test_int8_requires_a_converted_backend():
+    with pytest.raises(ValueError):
+        inference_backends.load_model('torch', precision='int8')
+
+
+def test_compare_detections_per_class():
+    import quantization
+
+    def detection(class_name, x, frame_number=0):
+        return {'original_class': class_name, 'confidence': 0.9, 'frame_number': frame_number,
+                'bbox': {'x': x, 'y': 0, 'width': 10, 'height': 10}}
+
+    reference = [detection('person', 0), detection('person', 50), detection('knife', 0)]
+    candidate = [detection('person', 1), detection('person', 100), detection('knife', 0, frame_number=1)]
+
+    report = quantization.compare_detections(reference, candidate)
+
+    assert report['person'] == {'fp32': 2, 'int8': 2, 'precision': 0.5, 'recall': 0.5}
+    assert report['knife'] == {'fp32': 1, 'int8': 1, 'precision': 0.0, 'recall': 0.0}
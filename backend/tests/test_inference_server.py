@@ -0,0 +1,89 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import inference_backends
+import ml_processor
+from config import settings
+from inference_server import InferenceServer
+
+
+@pytest.fixture
+def processor(monkeypatch, fake_yolo):
+    monkeypatch.setattr(inference_backends, 'YOLO', fake_yolo)
+    return ml_processor.MLProcessor()
+
+
+def camera_frame(value):
+    return np.full((120, 160, 3), value, dtype=np.uint8)
+
+
+def test_frames_from_many_cameras_share_batches(processor):
+    server = InferenceServer(processor, max_batch_size=4, max_wait_ms=200).start()
+    try:
+        futures = [server.submit(camera_frame(i * 10), frame_number=i) for i in range(10)]
+        results = [future.result(timeout=10) for future in futures]
+    finally:
+        server.stop()
+
+    # Each camera gets back exactly what it would have got on its own
+    for i, detections in enumerate(results):
+        assert detections == processor.process_frames([camera_frame(i * 10)], [i])
+    assert processor.model.batch_sizes[:3] == [4, 4, 2]
+    stats = server.stats()
+    assert stats['frames'] == 10 and stats['batches'] == 3
+    assert stats['batch_sizes'] == {2: 1, 4: 2}
+    assert sum(stats['queue_depths'].values()) == 3
+
+
+def test_partial_batch_is_flushed_after_max_wait(processor):
+    server = InferenceServer(processor, max_batch_size=16, max_wait_ms=50).start()
+    try:
+        started = time.monotonic()
+        server.submit(camera_frame(0)).result(timeout=10)
+        elapsed = time.monotonic() - started
+    finally:
+        server.stop()
+
+    assert 0.04 <= elapsed < 2
+    assert server.stats()['batch_sizes'] == {1: 1}
+
+
+def test_concurrent_cameras_use_process_frames_drop_in(processor):
+    server = InferenceServer(processor, max_batch_size=8, max_wait_ms=100).start()
+    results = {}
+
+    def camera(camera_id):
+        results[camera_id] = server.process_frames([camera_frame(camera_id * 20)], [camera_id])
+
+    threads = [threading.Thread(target=camera, args=(i,)) for i in range(6)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.stop()
+
+    assert {i: [d['frame_number'] for d in results[i]] for i in results} == {i: [i, i] for i in range(6)}
+    assert max(processor.model.batch_sizes) > 1
+
+
+def test_mixed_imgsz_and_errors_are_routed_per_frame(processor, monkeypatch):
+    server = InferenceServer(processor, max_batch_size=4, max_wait_ms=200).start()
+    try:
+        small = server.submit(camera_frame(0), imgsz=320)
+        full = server.submit(camera_frame(0))
+        assert small.result(timeout=10) and full.result(timeout=10)
+        assert sorted(processor.model.imgsz) == [320, settings.INFERENCE_IMGSZ]
+
+        monkeypatch.setattr(processor, '_infer', lambda prepared: 1 / 0)
+        with pytest.raises(ZeroDivisionError):
+            server.submit(camera_frame(0)).result(timeout=10)
+    finally:
+        server.stop()
+
+    with pytest.raises(RuntimeError):
+        server.submit(camera_frame(0))
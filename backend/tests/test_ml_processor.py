@@ -0,0 +1,395 @@
+import functools
+import os
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+import pytest
+
+import inference_backends
+import ml_processor
+from config import settings
+from preprocess import LetterboxPreprocessor, to_frame_coordinates
+
+
+@pytest.fixture
+def processor(monkeypatch, fake_yolo):
+    monkeypatch.setattr(inference_backends, 'YOLO', fake_yolo)
+    # The synthetic video only fades in brightness, which the motion gate would skip
+    monkeypatch.setattr(settings, 'MOTION_GATING_ENABLED', False)
+    return ml_processor.MLProcessor()
+
+
+@pytest.fixture
+def video_path(tmp_path):
+    path = str(tmp_path / 'synthetic.mp4')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 10, (160, 120))
+    for i in range(30):
+        writer.write(np.full((120, 160, 3), i * 8, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def test_process_frame_detection_format(processor):
+    # Already at the model input size, so letterboxing leaves it untouched
+    frame = np.zeros((640, 640, 3), dtype=np.uint8)
+    detections = processor._process_frame(frame, frame_number=7)
+
+    assert [d['type'] for d in detections] == ['person', 'weapon']
+    assert detections[0] == {
+        'type': 'person',
+        'original_class': 'person',
+        'confidence': pytest.approx(0.9),
+        'frame_number': 7,
+        'bbox': {'x': 10, 'y': 20, 'width': 100, 'height': 200},
+    }
+
+
+def test_parse_result_matches_per_box_parsing(processor):
+    frame = np.full((120, 160, 3), 37, dtype=np.uint8)
+    result = processor.model._result(frame)
+
+    expected = []
+    for box in result.boxes:
+        class_name = processor.model.names[int(box.cls[0])]
+        confidence = float(box.conf[0])
+        x1, y1, x2, y2 = box.xyxy[0].tolist()
+        detection_type = processor.detection_types.get(class_name.lower(), 'unknown')
+        if detection_type == 'unknown' or confidence < processor.confidence_threshold:
+            continue
+        expected.append({
+            'type': detection_type,
+            'original_class': class_name,
+            'confidence': confidence,
+            'frame_number': 3,
+            'bbox': {'x': int(x1), 'y': int(y1), 'width': int(x2 - x1), 'height': int(y2 - y1)},
+        })
+
+    assert processor._parse_result(result, 3) == expected
+
+
+def test_only_surveillance_classes_are_requested(processor):
+    processor._process_frame(np.zeros((120, 160, 3), dtype=np.uint8), 0)
+    assert processor.model.classes == [0, 2, 43]
+
+
+def test_process_frames_matches_per_frame_path(processor):
+    frames = [np.full((120, 160, 3), i * 20, dtype=np.uint8) for i in range(5)]
+    numbers = [0, 3, 6, 9, 12]
+
+    expected = []
+    for frame, number in zip(frames, numbers):
+        expected.extend(processor._process_frame(frame, number))
+
+    assert processor.process_frames(frames, numbers) == expected
+    assert processor.model.batch_sizes[-1] == 5
+
+
+def test_process_video_batches_inference(processor, video_path, monkeypatch):
+    monkeypatch.setattr(settings, 'FRAME_EXTRACTION_FPS', 5)
+
+    processor.batch_size = 1
+    per_frame = processor.process_video(video_path)
+    processor.model.batch_sizes.clear()
+
+    processor.batch_size = 4
+    batched = processor.process_video(video_path)
+
+    assert batched == per_frame
+    assert sorted({d['frame_number'] for d in batched}) == list(range(0, 30, 2))
+    assert processor.model.batch_sizes == [4, 4, 4, 3]
+
+
+@pytest.mark.parametrize('mode', ['grab', 'seek'])
+def test_sampling_modes_match_full_decode(processor, video_path, monkeypatch, mode):
+    monkeypatch.setattr(settings, 'FRAME_EXTRACTION_FPS', 2)
+
+    expected = processor.process_video(video_path, sampling='read')
+
+    assert processor.process_video(video_path, sampling=mode) == expected
+    assert sorted({d['frame_number'] for d in expected}) == [0, 5, 10, 15, 20, 25]
+
+
+def test_unknown_sampling_mode_is_rejected(processor, video_path):
+    with pytest.raises(ValueError):
+        processor.process_video(video_path, sampling='every-other')
+
+
+def test_missing_video_file_raises(processor, tmp_path):
+    with pytest.raises(IOError):
+        processor.process_video(str(tmp_path / 'missing.mp4'))
+    (tmp_path / 'broken.mp4').write_bytes(b'not a video')
+    with pytest.raises(IOError):
+        processor.process_video(str(tmp_path / 'broken.mp4'))
+
+
+@pytest.fixture
+def http_video_url(video_path):
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=os.path.dirname(video_path))
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}/{os.path.basename(video_path)}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.parametrize('direct_decode', [True, False])
+def test_http_video_matches_local_file(processor, video_path, http_video_url, monkeypatch, direct_decode):
+    monkeypatch.setattr(settings, 'FRAME_EXTRACTION_FPS', 2)
+    monkeypatch.setattr(settings, 'VIDEO_DIRECT_URL_DECODE', direct_decode)
+    monkeypatch.setattr(settings, 'DOWNLOAD_CHUNK_SIZE', 4096)
+
+    assert processor.process_video(http_video_url) == processor.process_video(video_path)
+
+
+def test_iter_video_yields_frames_as_they_are_processed(processor, video_path, monkeypatch):
+    monkeypatch.setattr(settings, 'FRAME_EXTRACTION_FPS', 5)
+    processor.batch_size = 2
+    expected = processor.process_video(video_path)
+
+    frames = list(processor.iter_video(video_path))
+    assert [frame_number for frame_number, _ in frames] == list(range(0, 30, 2))
+    assert [d for _, frame_detections in frames for d in frame_detections] == expected
+
+    # Stopping early ends decoding and the pipeline threads
+    partial = processor.iter_video(video_path)
+    assert next(partial)[0] == 0
+    partial.close()
+    assert not [t for t in threading.enumerate() if t.name.startswith('pipeline-')]
+
+
+@pytest.mark.parametrize('mode', ['grab', 'seek'])
+def test_segments_cover_the_same_frames_as_the_whole_video(processor, video_path, monkeypatch, mode):
+    monkeypatch.setattr(settings, 'FRAME_EXTRACTION_FPS', 2)
+    monkeypatch.setattr(settings, 'TRACKING_ENABLED', False)
+    whole = processor.process_video(video_path, sampling=mode)
+
+    segments = [
+        list(processor.iter_video(video_path, sampling=mode, start_frame=start, end_frame=end))
+        for start, end in [(0, 10), (10, 25), (25, 30)]
+    ]
+
+    assert [[n for n, _ in frames] for frames in segments] == [[0, 5], [10, 15, 20], [25]]
+    assert [d for frames in segments for _, detections in frames for d in detections] == whole
+
+
+def test_pipeline_matches_serial_processing(processor, video_path, monkeypatch):
+    monkeypatch.setattr(settings, 'FRAME_EXTRACTION_FPS', 5)
+    processor.batch_size = 2
+
+    monkeypatch.setattr(settings, 'VIDEO_PIPELINE_ENABLED', False)
+    serial = processor.process_video(video_path)
+
+    monkeypatch.setattr(settings, 'VIDEO_PIPELINE_ENABLED', True)
+    pipelined = processor.process_video(video_path)
+
+    assert pipelined == serial
+    assert processor.last_pipeline_stats['frames'] == 15
+    assert processor.last_pipeline_stats['batches'] == 8
+    assert set(processor.last_pipeline_stats) >= {'decode', 'preprocess', 'inference', 'postprocess', 'wall'}
+
+
+def test_pipeline_stops_and_reraises_stage_errors(processor):
+    def failing_infer(inputs):
+        raise RuntimeError("inference blew up")
+
+    processor._infer = failing_infer
+    frames = ((n, np.zeros((8, 8, 3), dtype=np.uint8)) for n in range(1000))
+
+    with pytest.raises(RuntimeError, match="inference blew up"):
+        processor._process_batched(frames)
+
+    assert not [t for t in threading.enumerate() if t.name.startswith('pipeline-')]
+
+
+def test_motion_gate_skips_static_frames(processor, monkeypatch):
+    monkeypatch.setattr(settings, 'MOTION_GATING_ENABLED', True)
+    static = np.full((120, 160, 3), 60, dtype=np.uint8)
+    moved = static.copy()
+    moved[30:90, 40:120] = 200
+    frames = [(n, static) for n in range(5)] + [(n, moved) for n in range(5, 8)]
+
+    detections = processor._process_batched(frames, motion_gate=processor.make_motion_gate())
+
+    # Only the first frame and the first frame after the change reach the model
+    assert sum(processor.model.batch_sizes) == 2
+    assert sorted({d['frame_number'] for d in detections}) == list(range(8))
+    reused = [d for d in detections if d['frame_number'] == 4]
+    assert reused == [{**d, 'frame_number': 4} for d in detections if d['frame_number'] == 0]
+    assert processor.motion_stats == {'frames_checked': 0, 'inferences_skipped': 0}
+
+
+def test_motion_gate_reports_saved_inferences(processor, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'MOTION_GATING_ENABLED', True)
+    monkeypatch.setattr(settings, 'MOTION_SKIP_MODE', 'none')
+    monkeypatch.setattr(settings, 'FRAME_EXTRACTION_FPS', 5)
+
+    # An empty corridor: the same frame for three seconds
+    video_path = str(tmp_path / 'static.mp4')
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'mp4v'), 10, (160, 120))
+    for _ in range(30):
+        writer.write(np.full((120, 160, 3), 90, dtype=np.uint8))
+    writer.release()
+
+    detections = processor.process_video(video_path, motion_threshold=0.01)
+
+    assert {d['frame_number'] for d in detections} == {0}
+    assert processor.motion_stats == {'frames_checked': 15, 'inferences_skipped': 14}
+
+
+def test_letterbox_reuses_buffers_and_maps_boxes_back():
+    letterbox = LetterboxPreprocessor(300, pool_size=2)
+    frame = np.random.default_rng(0).integers(0, 255, (120, 160, 3), dtype=np.uint8)
+
+    first, transform = letterbox(frame)
+    second, _ = letterbox(frame)
+    third, _ = letterbox(frame)
+
+    assert letterbox.imgsz == 320
+    assert third is first and second is not first
+    # 160x120 scales by 2 to 320x240, padded to 256 rows (a multiple of 32) with 8 above and below
+    assert first.shape == (256, 320, 3)
+    assert transform == (2.0, 0, 8, 160, 120)
+    assert (first[:8] == 114).all() and (first[248:] == 114).all()
+    np.testing.assert_array_equal(first[8:248], cv2.resize(frame, (320, 240), interpolation=cv2.INTER_LINEAR))
+
+    boxes = to_frame_coordinates(np.array([[20.0, 28.0, 120.0, 400.0]]), transform)
+    np.testing.assert_allclose(boxes, [[10.0, 10.0, 60.0, 120.0]])
+
+
+def test_letterbox_fills_an_odd_width_frame():
+    letterbox = LetterboxPreprocessor(640, pool_size=1)
+    frame = np.random.default_rng(0).integers(0, 255, (640, 479, 3), dtype=np.uint8)
+
+    buffer, transform = letterbox(frame)
+
+    # 479 columns padded to 480, the single padding column goes on the right
+    assert buffer.shape == (640, 480, 3)
+    assert transform == (1.0, 0, 0, 479, 640)
+    assert (buffer[:, 479] == 114).all()
+    np.testing.assert_array_equal(buffer[:, :479], frame)
+
+
+def test_detections_are_in_frame_coordinates(processor, monkeypatch):
+    monkeypatch.setattr(settings, 'INFERENCE_IMGSZ', 320)
+    frame = np.zeros((240, 640, 3), dtype=np.uint8)
+
+    detections = processor._process_frame(frame, 0)
+
+    # The model saw a 320x128 input, the frame at half size with 4 rows of padding above. Its
+    # mean of 7.125 shifts the fake person box to x 17.6-117.9, y 20.25-220.5 there, so the box
+    # is mapped back and clipped to the frame.
+    assert detections[0]['bbox'] == {'x': 35, 'y': 32, 'width': 200, 'height': 207}
+    assert processor.model.imgsz == [320]
+
+
+def test_triage_pass_only_escalates_frames_with_detections(processor, monkeypatch):
+    def only_bright_frames_have_boxes(frame, classes=None):
+        result = type(processor.model)._result(processor.model, frame, classes)
+        return result if frame.mean() > 150 else result[:0]
+
+    monkeypatch.setattr(processor.model, '_result', only_bright_frames_have_boxes)
+    frames = [np.full((120, 160, 3), value, dtype=np.uint8) for value in (10, 250, 20, 240)]
+
+    full = processor.process_frames(frames, [0, 1, 2, 3])
+    assert processor.model.imgsz == [640]
+
+    monkeypatch.setattr(settings, 'TRIAGE_IMGSZ', 320)
+    processor.model.imgsz.clear()
+    processor.model.batch_sizes.clear()
+
+    assert processor.process_frames(frames, [0, 1, 2, 3]) == full
+    assert processor.model.imgsz == [320, 640]
+    assert processor.model.batch_sizes == [4, 2]
+    assert processor.triage_stats == {'frames': 4, 'escalated': 2}
+
+
+def test_roi_crops_the_frame_and_drops_detections_outside(processor, tmp_path):
+    path = str(tmp_path / 'frame.png')
+    cv2.imwrite(path, np.zeros((640, 640, 3), dtype=np.uint8))
+    # The 321x520 box from (160, 120), with its top-left corner cut off
+    roi = [[(0.35, 0.1875), (0.75, 0.1875), (0.75, 1.0), (0.25, 1.0), (0.25, 0.45)]]
+
+    detections = processor.process_image(path, roi=roi)
+
+    # Same boxes as running the crop on its own, at the scale of the whole frame (520 of 640
+    # rows fed at imgsz 544 instead of 640), shifted to frame coordinates. The knife's center
+    # lands in the cut-off corner, so only the person is left.
+    crop_detections = processor.process_frames([np.zeros((520, 321, 3), dtype=np.uint8)], [0], imgsz=544)
+    assert processor.model.imgsz == [544, 544]
+    person = next(d for d in crop_detections if d['type'] == 'person')
+    assert [d['type'] for d in crop_detections] == ['person', 'weapon']
+    assert [d['type'] for d in detections] == ['person']
+    assert detections[0]['bbox'] == {
+        **person['bbox'], 'x': person['bbox']['x'] + 160, 'y': person['bbox']['y'] + 120
+    }
+
+
+def test_adaptive_sampling_follows_detections(processor, tmp_path, monkeypatch):
+    # 60s at 10 fps, dark except for a bright stretch at 30-35s that has detections
+    path = str(tmp_path / 'incident.mp4')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 10, (64, 48))
+    for i in range(600):
+        writer.write(np.full((48, 64, 3), 250 if 300 <= i < 350 else 0, dtype=np.uint8))
+    writer.release()
+
+    def only_bright_frames_have_boxes(frame, classes=None):
+        result = type(processor.model)._result(processor.model, frame, classes)
+        return result if frame.mean() > 150 else result[:0]
+
+    monkeypatch.setattr(processor.model, '_result', only_bright_frames_have_boxes)
+    monkeypatch.setattr(settings, 'VIDEO_PIPELINE_ENABLED', False)
+    monkeypatch.setattr(settings, 'SAMPLING_FLOOR_FPS', 0.2)
+    monkeypatch.setattr(settings, 'SAMPLING_ACTIVE_FPS', 5.0)
+    monkeypatch.setattr(settings, 'SAMPLING_IDLE_SECONDS', 10.0)
+    monkeypatch.setattr(settings, 'SAMPLING_HOLD_SECONDS', 5.0)
+    # One frame per batch, so every detection is reported before the next frame is picked
+    processor.batch_size = 1
+    sampled = []
+    original = processor._postprocess
+    monkeypatch.setattr(processor, '_postprocess', lambda prepared, results, numbers: (
+        sampled.extend(numbers) or original(prepared, results, numbers)
+    ))
+
+    detections = processor.process_video(path, sampling='grab')
+
+    # 1 fps for 10s, then every 5s until the incident is seen at 34s, 5 fps while it lasts
+    # and for 5s after the last detection (34.8s), 1 fps until it has been quiet for 10s,
+    # then the floor again
+    assert sampled == (
+        list(range(0, 100, 10)) + [140, 190, 240, 290]
+        + list(range(340, 398, 2))
+        + list(range(406, 456, 10)) + [496, 546, 596]
+    )
+    assert min(d['frame_number'] for d in detections) == 340
+    assert processor.sampling_stats == {'idle': 8, 'normal': 15, 'active': 28, 'transitions': 4}
+
+
+def test_threads_sharing_a_processor_take_turns_on_the_model(processor):
+    model = processor.model
+    running, overlaps = [], []
+
+    def call(*args, **kwargs):
+        running.append(1)
+        overlaps.append(len(running) > 1)
+        time.sleep(0.01)
+        try:
+            return model(*args, **kwargs)
+        finally:
+            running.pop()
+
+    processor.model = call
+    frames = [np.full((120, 160, 3), i * 20, dtype=np.uint8) for i in range(6)]
+    threads = [threading.Thread(target=processor.process_frames, args=([frame], [i])) for i, frame in enumerate(frames)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(overlaps) == 6
+    assert not any(overlaps)
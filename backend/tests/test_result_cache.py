@@ -0,0 +1,105 @@
+import os
+
+import pytest
+
+import result_cache
+import scan_jobs
+from config import settings
+from result_cache import ResultCache, cache_key, cached_detections, local_content_hash
+
+
+def detections(frame_count, confidence=0.9):
+    return [
+        {
+            'type': 'person',
+            'original_class': 'person',
+            'confidence': confidence,
+            'frame_number': frame_number,
+            'bbox': {'x': 10, 'y': 20, 'width': 100, 'height': 200},
+            'track_id': 1,
+        }
+        for frame_number in range(frame_count)
+    ]
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'RESULT_CACHE_ENABLED', True)
+    monkeypatch.setattr(settings, 'RESULT_CACHE_PATH', str(tmp_path / 'cache' / 'results.db'))
+    monkeypatch.setattr(result_cache, '_cache', None)
+    return result_cache.get_result_cache()
+
+
+def test_repeated_lookups_are_served_from_cache(cache):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return detections(3)
+
+    first = cached_detections('a' * 64, 'video', compute, imgsz=320)
+    second = cached_detections('a' * 64, 'video', compute, imgsz=320)
+
+    assert first == second == detections(3)
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+    assert stats['hit_rate'] == 0.5
+
+
+def test_settings_and_overrides_are_part_of_the_key(cache, monkeypatch):
+    key = cache_key('a' * 64, 'video')
+
+    assert cache_key('a' * 64, 'video', imgsz=None) == key
+    assert cache_key('a' * 64, 'video', imgsz=320) != key
+    assert cache_key('a' * 64, 'image') != key
+    assert cache_key('b' * 64, 'video') != key
+    monkeypatch.setattr(settings, 'CONFIDENCE_THRESHOLD', 0.3)
+    assert cache_key('a' * 64, 'video') != key
+
+
+def test_least_recently_used_results_are_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path / 'results.db'), max_bytes=10_000)
+    cache.put('old', detections(50))
+    cache.put('used', detections(50, confidence=0.8))
+    entry_size = cache.stats()['bytes'] // 2
+    cache.max_bytes = entry_size * 2 + entry_size // 2
+    assert cache.get('old') is not None
+
+    cache.put('new', detections(50, confidence=0.7))
+
+    assert cache.get('used') is None
+    assert cache.get('old') == detections(50)
+    assert cache.get('new') == detections(50, confidence=0.7)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_local_files_are_hashed_by_content(cache, tmp_path):
+    path = tmp_path / 'clip.mp4'
+    path.write_bytes(b'frames')
+    digest = local_content_hash(str(path))
+
+    assert digest == result_cache.file_digest(str(path))
+    assert local_content_hash(str(path)) == digest
+    path.write_bytes(b'other frames')
+    assert local_content_hash(str(path)) != digest
+    assert local_content_hash('rtsp://camera/stream') is None
+
+
+def test_rescanning_an_unchanged_video_skips_the_model(cache, tmp_path, monkeypatch):
+    path = tmp_path / 'clip.mp4'
+    path.write_bytes(os.urandom(1024))
+    calls = []
+
+    class Processor:
+        def process_video(self, video_path, motion_threshold=None, imgsz=None, roi=None):
+            calls.append(video_path)
+            return [{**d, 'type': 'weapon'} for d in detections(2)]
+
+    monkeypatch.setattr(scan_jobs, 'get_ml_processor', lambda: Processor())
+
+    first = scan_jobs.analyze_single_video(str(path))
+    second = scan_jobs.analyze_single_video(str(path))
+
+    assert first == second == (0.9, True, 'critical')
+    assert len(calls) == 1
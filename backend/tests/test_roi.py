@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from roi import RegionOfInterest
+
+
+def detection(x, y, width=10, height=10):
+    return {'type': 'person', 'confidence': 0.9, 'bbox': {'x': x, 'y': y, 'width': width, 'height': height}}
+
+
+def test_crop_is_a_view_of_the_polygon_bounding_box():
+    frame = np.arange(100 * 200 * 3, dtype=np.uint8).reshape(100, 200, 3)
+    roi = RegionOfInterest([[(0.5, 0.0), (1.0, 0.0), (1.0, 0.5)]])
+
+    crop = roi.crop(frame)
+
+    assert crop.shape == (51, 100, 3)
+    assert np.shares_memory(crop, frame)
+    assert np.array_equal(crop, frame[:51, 100:])
+    assert roi.area_fraction == pytest.approx(51 * 100 / (100 * 200))
+
+    # Only the triangle above the diagonal of the crop counts
+    kept = roi.to_frame([detection(80, 5), detection(5, 40)])
+    assert [d['bbox']['x'] for d in kept] == [180]
+
+
+def test_layout_follows_the_frame_size():
+    roi = RegionOfInterest([[(0.0, 0.5), (1.0, 0.5), (1.0, 1.0), (0.0, 1.0)]])
+
+    assert roi.crop(np.zeros((100, 200, 3), dtype=np.uint8)).shape == (50, 200, 3)
+    assert roi.crop(np.zeros((480, 640, 3), dtype=np.uint8)).shape == (240, 640, 3)
+    assert roi.to_frame([detection(0, 0)])[0]['bbox']['y'] == 240
+    assert RegionOfInterest.from_polygons(None) is None
+    with pytest.raises(ValueError):
+        RegionOfInterest([[(0.0, 0.0), (1.0, 1.0)]])
@@ -0,0 +1,47 @@
+import pytest
+
+from sampling import AdaptiveSampler
+
+
+def person():
+    return [{'type': 'person', 'confidence': 0.9}]
+
+
+@pytest.fixture
+def sampler():
+    return AdaptiveSampler(
+        1.0, floor_fps=0.2, active_fps=5.0, idle_seconds=10, hold_seconds=4, trigger_types=['person', 'weapon']
+    )
+
+
+def test_quiet_camera_drops_to_the_floor_rate(sampler):
+    positions = [0.0]
+    while positions[-1] < 30:
+        positions.append(positions[-1] + sampler.next_interval(positions[-1]))
+
+    assert positions == [float(i) for i in range(11)] + [15.0, 20.0, 25.0, 30.0]
+    assert sampler.stats() == {'state': 'idle', 'samples': {'idle': 4, 'normal': 10, 'active': 0}, 'transitions': 1}
+
+
+def test_relevant_detection_ramps_up_for_the_hold_window(sampler):
+    for position in range(0, 20, 5):
+        sampler.next_interval(float(position))
+    assert sampler.state == 'idle'
+
+    sampler.observe(20.0, [{'type': 'vehicle', 'confidence': 0.9}])
+    assert sampler.interval(20.0) == 5.0
+
+    sampler.observe(20.0, person())
+    assert sampler.interval(20.1) == pytest.approx(0.2)
+    assert sampler.interval(23.9) == pytest.approx(0.2)
+    # After the hold window back to the base rate, and to the floor once idle again
+    assert sampler.interval(24.0) == 1.0
+    assert sampler.interval(29.9) == 1.0
+    assert sampler.interval(30.0) == 5.0
+    assert sampler.transitions == 4
+
+
+def test_frame_skip_converts_intervals_to_frames(sampler):
+    assert sampler.frame_skip(0, 30) == 30
+    sampler.observe(1.0, person())
+    assert sampler.frame_skip(30, 30) == 6
@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+import scan_jobs
+from config import settings
+from scan_jobs import ScanItem
+
+
+def fake_analysis(item):
+    """Pool task stand-in: threat if the source says so, hangs on 'hang'"""
+    if item.source == "hang":
+        time.sleep(60)
+    if item.source == "broken":
+        raise RuntimeError("decoder crashed")
+    return 0.8, item.source == "weapon", "critical" if item.source == "weapon" else "normal"
+
+
+@pytest.fixture(autouse=True)
+def scan_pool(monkeypatch):
+    monkeypatch.setattr(settings, "SCAN_WORKERS", 2)
+    yield
+    scan_jobs.shutdown_pool()
+
+
+def test_job_runs_items_on_the_pool_and_reports():
+    items = [ScanItem("a.mp4", "normal"), ScanItem("b.mp4", "weapon"), ScanItem("c.mp4", "broken")]
+    job = scan_jobs.create_job(items)
+
+    scan_jobs.run_job(job, fake_analysis)
+
+    report = job.report()
+    assert job.status == "completed"
+    assert report["alert"] is True and report["mcp_notified"] is True
+    assert report["total_scanned"] == 3
+    assert report["results"]["a.mp4"]["status"] == "Normal"
+    assert report["results"]["b.mp4"]["severity"] == "critical"
+    assert report["results"]["c.mp4"]["status"] == "Error"
+    assert scan_jobs.get_job(job.id) is job
+
+
+def test_slow_item_times_out_without_stalling_the_rest(monkeypatch):
+    monkeypatch.setattr(settings, "SCAN_ITEM_TIMEOUT", 5)
+    items = [ScanItem("Stream: lobby", "hang")] + [ScanItem(f"{i}.mp4", "normal") for i in range(4)]
+    job = scan_jobs.create_job(items)
+
+    started = time.monotonic()
+    scan_jobs.run_job(job, fake_analysis)
+
+    assert time.monotonic() - started < 30
+    assert job.results["Stream: lobby"]["status"] == "Timeout"
+    assert [job.results[f"{i}.mp4"]["status"] for i in range(4)] == ["Normal"] * 4
+
+
+def test_background_job_can_be_polled():
+    job = scan_jobs.create_job([ScanItem("a.mp4", "normal")])
+    scan_jobs.start_job(job, fake_analysis)
+
+    assert job.wait(timeout=60)
+    progress = job.progress()
+    assert progress["status"] == "completed"
+    assert progress["completed"] == progress["total"] == 1
+    assert progress["results"]["a.mp4"]["status"] == "Normal"
@@ -0,0 +1,61 @@
+from config import settings
+from segments import merge_segment_tracks, plan_segments
+
+
+def summary(track_id, first_frame, last_frame, x, confidence=0.8, type_='person'):
+    bbox = {'x': x, 'y': 0, 'width': 100, 'height': 100}
+    return {
+        'type': type_,
+        'confidence': confidence,
+        'frame_number': first_frame,
+        'bbox': bbox,
+        'track_id': track_id,
+        'first_frame': first_frame,
+        'last_frame': last_frame,
+        'first_bbox': bbox,
+        'last_bbox': bbox,
+        'detection_count': (last_frame - first_frame) // 30 + 1,
+    }
+
+
+def test_segments_follow_video_length_and_workers(monkeypatch):
+    monkeypatch.setattr(settings, 'FRAME_EXTRACTION_FPS', 1)
+    monkeypatch.setattr(settings, 'VIDEO_SEGMENT_MIN_SECONDS', 300)
+    monkeypatch.setattr(settings, 'VIDEO_SEGMENTS_PER_WORKER', 2)
+    two_hours = 2 * 3600 * 30
+
+    assert plan_segments(9 * 60 * 30, 30.0, workers=8) == [(0, 9 * 60 * 30)]
+    assert len(plan_segments(two_hours, 30.0, workers=1)) == 2
+    segments = plan_segments(two_hours, 30.0, workers=10)
+    assert len(segments) == 20
+    # Contiguous, and on the 1 fps sampling grid
+    assert segments[0][0] == 0 and segments[-1][1] == two_hours
+    assert all(end == next_start for (_, end), (next_start, _) in zip(segments, segments[1:]))
+    assert all(start % 30 == 0 for start, _ in segments)
+
+
+def test_only_overlapping_tracks_of_the_same_type_are_stitched():
+    segments = [
+        {'start_frame': 0, 'end_frame': 3000, 'tracks': [
+            summary(1, 2400, 2970, x=100, confidence=0.7),
+            summary(2, 0, 600, x=100),
+            summary(3, 2700, 2970, x=800),
+        ]},
+        {'start_frame': 3000, 'end_frame': 6000, 'tracks': [
+            summary(1, 3000, 3300, x=110, confidence=0.9),
+            summary(2, 3000, 3090, x=800, type_='weapon'),
+        ]},
+    ]
+
+    merged = merge_segment_tracks(segments, window=180)
+
+    assert [(t['track_id'], t['type'], t['first_frame'], t['last_frame']) for t in merged] == [
+        (2, 'person', 0, 600),
+        (1, 'person', 2400, 3300),
+        (3, 'person', 2700, 2970),
+        (4, 'weapon', 3000, 3090),
+    ]
+    stitched = merged[1]
+    assert stitched['confidence'] == 0.9
+    assert stitched['detection_count'] == 20 + 11
+    assert stitched['first_bbox']['x'] == 100 and stitched['last_bbox']['x'] == 110
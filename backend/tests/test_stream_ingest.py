@@ -0,0 +1,184 @@
+import time
+import uuid
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+import stream_ingest
+from config import settings
+from database import Base
+from stream_ingest import FileStreamCapture, IngestManager, LatestFrameBuffer, StreamIngestWorker
+
+
+class FakeProcessor:
+    """Records the frames it was asked to process"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.frame_numbers = []
+
+    def make_motion_gate(self, motion_threshold=None):
+        return None
+
+    def process_frames(self, frames, frame_numbers, imgsz=None):
+        time.sleep(self.delay)
+        self.frame_numbers.extend(frame_numbers)
+        return [{'type': 'person', 'confidence': 0.9, 'frame_number': frame_numbers[0]}]
+
+
+@pytest.fixture
+def live_file(tmp_path):
+    """Two seconds of 20 fps footage for FileStreamCapture to play back"""
+    path = str(tmp_path / 'camera.mp4')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 20, (64, 48))
+    for i in range(40):
+        writer.write(np.full((48, 64, 3), i * 6, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+@pytest.fixture(autouse=True)
+def fast_reconnect(monkeypatch):
+    monkeypatch.setattr(settings, 'STREAM_RECONNECT_MIN_DELAY', 0.05)
+    monkeypatch.setattr(settings, 'STREAM_RECONNECT_MAX_DELAY', 0.4)
+
+
+def wait_until(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def test_buffer_serves_newest_frame_and_counts_dropped():
+    buffer = LatestFrameBuffer(capacity=2)
+    for i in range(5):
+        buffer.put(np.full((2, 2), i, dtype=np.uint8))
+
+    seq, _, frame = buffer.get_latest()
+    assert seq == 4 and frame[0, 0] == 4
+    assert buffer.frames_dropped == 4
+
+    assert buffer.get_latest(after=seq, timeout=0.05) is None
+    buffer.put(np.zeros((2, 2), dtype=np.uint8))
+    assert buffer.get_latest(after=seq)[0] == 5
+    assert buffer.frames_dropped == 4
+
+
+def test_worker_feeds_inference_continuously_and_reconnects(live_file):
+    processor = FakeProcessor()
+    seen = []
+    worker = StreamIngestWorker(
+        'cam-1', live_file,
+        on_detections=lambda w, n, detections: seen.append((n, detections)),
+        fps=10,
+        processor_factory=lambda: processor,
+        capture_factory=FileStreamCapture
+    )
+    worker.start()
+    try:
+        # The two second file ends, the worker reconnects and keeps going
+        assert wait_until(lambda: worker.reconnects >= 1 and worker.connected)
+        assert wait_until(lambda: worker.inferences > 20)
+    finally:
+        worker.stop()
+
+    assert not worker.is_alive()
+    numbers = [n for n, _ in seen]
+    assert numbers == sorted(numbers) and len(set(numbers)) == len(numbers)
+    assert seen[0][1][0]['type'] == 'person'
+    assert worker.stats()['last_frame_age'] < 1.0
+
+
+def test_slow_inference_drops_stale_frames(live_file):
+    processor = FakeProcessor(delay=0.3)
+    worker = StreamIngestWorker(
+        'cam-1', live_file, fps=20,
+        processor_factory=lambda: processor,
+        capture_factory=FileStreamCapture
+    )
+    worker.start()
+    try:
+        assert wait_until(lambda: worker.inferences >= 4)
+    finally:
+        worker.stop()
+
+    # Inference keeps up with a fraction of the frames and always takes the newest
+    assert worker.buffer.frames_dropped > 0
+    assert worker.stats()['last_frame_age'] < 0.5
+
+
+def test_reconnects_with_backoff_when_stream_is_down():
+    attempts = []
+
+    def unreachable(url):
+        attempts.append(time.monotonic())
+        return SimpleNamespace(isOpened=lambda: False, release=lambda: None)
+
+    worker = StreamIngestWorker(
+        'cam-1', 'rtsp://offline', processor_factory=FakeProcessor, capture_factory=unreachable
+    )
+    worker.start()
+    try:
+        assert wait_until(lambda: len(attempts) >= 5)
+    finally:
+        worker.stop()
+
+    gaps = np.diff(attempts[:5])
+    assert not worker.connected
+    assert gaps[-1] > gaps[0] * 3  # 0.05, 0.1, 0.2, 0.4 (capped)
+
+
+def test_manager_follows_live_cameras(live_file, monkeypatch):
+    def camera(camera_id, is_live=True, motion_threshold=None):
+        return SimpleNamespace(
+            id=camera_id, stream_url=live_file, is_live=is_live,
+            motion_threshold=motion_threshold, inference_imgsz=None, roi=None
+        )
+
+    manager = IngestManager(processor_factory=FakeProcessor, capture_factory=FileStreamCapture)
+    try:
+        manager.sync([camera('a'), camera('b'), camera('c', is_live=False)])
+        assert set(manager.workers) == {'a', 'b'}
+        first = manager.workers['a']
+
+        manager.sync([camera('a'), camera('b', motion_threshold=0.2)])
+        assert manager.workers['a'] is first
+        assert manager.workers['b'].motion_threshold == 0.2
+
+        manager.sync([camera('b', motion_threshold=0.2)])
+        assert set(manager.workers) == {'b'} and not first.is_alive()
+    finally:
+        manager.stop_all()
+
+
+def test_live_alerts_are_saved_and_published(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ingest.db'}")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(stream_ingest, 'SessionLocal', factory)
+    published = []
+    monkeypatch.setattr(stream_ingest.alert_events, 'publish_alerts', published.extend)
+
+    camera_id = str(uuid.uuid4())
+    worker = SimpleNamespace(camera_id=camera_id)
+    recorder = stream_ingest.AlertRecorder()
+    knife = {'type': 'knife', 'confidence': 0.9, 'bbox': {'x': 1, 'y': 2, 'width': 3, 'height': 4}}
+    recorder(worker, 7, [knife, {'type': 'person', 'confidence': 0.5}])
+    # Within the cooldown, the same type on the same camera isn't raised again
+    recorder(worker, 8, [knife])
+
+    with factory() as db:
+        alert = db.query(models.Alert).one()
+        assert (alert.severity, alert.status, str(alert.camera_id)) == ('critical', 'new', camera_id)
+        assert (alert.detection.frame_number, alert.detection.bounding_box) == (7, knife['bbox'])
+    assert [(e['id'], e['detection_type'], e['camera_id'], e['media_id']) for e in published] == [
+        (str(alert.id), 'knife', camera_id, None)
+    ]
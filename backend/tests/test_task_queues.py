@@ -0,0 +1,40 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import celery_app
+import task_queues
+from task_queues import route_media
+
+MB = 1024 * 1024
+
+
+def test_uploads_are_routed_by_type_size_and_camera_priority():
+    assert route_media('image', 3 * MB) == ('realtime', 0)
+    assert route_media('video', 5 * MB) == ('realtime', 0)
+    assert route_media('video', 80 * MB) == ('standard', 4)
+    assert route_media('video', 80 * MB, 'high') == ('realtime', 0)
+    assert route_media('video', 80 * MB, 'low') == ('bulk', 9)
+    assert route_media('video', 900 * MB) == ('bulk', 8)
+    assert route_media('video', 900 * MB, 'high') == ('realtime', 0)
+    assert route_media('video', None) == ('standard', 4)
+
+
+def test_workers_prefetch_by_the_queues_they_consume():
+    assert task_queues.prefetch_multiplier(['standard']) == 2
+    assert task_queues.prefetch_multiplier(['realtime', 'standard']) == 1
+    assert task_queues.prefetch_multiplier(['other']) is None
+
+
+def test_queue_wait_is_recorded_when_a_task_starts(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(task_queues, 'record_wait', lambda queue, seconds: recorded.append((queue, seconds)))
+    request = SimpleNamespace(enqueued_at=time.time() - 2.5, delivery_info={'routing_key': 'bulk'})
+
+    celery_app._task_started(task=SimpleNamespace(request=request))
+
+    assert recorded == [('bulk', pytest.approx(2.5, abs=0.5))]
+    assert task_queues.summarize_waits([0.01, 0.02, 0.03, 1.0]) == {
+        "count": 4, "p50_ms": 25.0, "p95_ms": 854.5, "max_ms": 1000.0
+    }
@@ -0,0 +1,109 @@
+import cv2
+import numpy as np
+import pytest
+
+import inference_backends
+import ml_processor
+import scan_jobs
+from config import settings
+from threat_scan import ThreatScan
+
+
+@pytest.fixture
+def processor(monkeypatch, fake_yolo):
+    class BrightFramesYOLO(fake_yolo):
+        """Boxes (a person and a knife) only on bright frames"""
+
+        def _result(self, frame, classes=None):
+            result = super()._result(frame, classes)
+            return result if frame.mean() > 150 else result[:0]
+
+    monkeypatch.setattr(inference_backends, 'YOLO', BrightFramesYOLO)
+    return ml_processor.MLProcessor()
+
+
+def write_video(path, bright_frames=(), frame_count=300):
+    """30s at 10 fps, dark except for bright_frames"""
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), 10, (64, 48))
+    for i in range(frame_count):
+        writer.write(np.full((48, 64, 3), 250 if i in bright_frames else 0, dtype=np.uint8))
+    writer.release()
+    return str(path)
+
+
+def run_scan(processor, path, **options):
+    cap = cv2.VideoCapture(path)
+    try:
+        scan = ThreatScan(
+            processor, cap, ['weapon', 'fire'], ['weapon'],
+            coarse_interval=2.0, confirm_frames=2, dense_fps=5.0, **options
+        )
+        return scan, scan.run()
+    finally:
+        cap.release()
+
+
+def test_scan_stops_at_a_confirmed_critical_threat(processor, tmp_path):
+    path = write_video(tmp_path / 'weapon.mp4', bright_frames=range(150, 200))
+
+    scan, evidence = run_scan(processor, path)
+
+    # Sparse batches of 8 frames 2s apart: 0-140, then 160-280 where 160 hits and 162 confirms
+    assert scan.confirmed == {'weapon'}
+    assert scan.stopped_at == 160
+    assert scan.frames_inferred == 8 + 7 + 1
+    assert {d['frame_number'] for d in evidence if d['type'] == 'weapon'} == {160, 162}
+
+
+def test_single_frame_hit_is_not_confirmed(processor, tmp_path):
+    path = write_video(tmp_path / 'flash.mp4', bright_frames={160})
+
+    scan, evidence = run_scan(processor, path)
+
+    assert scan.confirmed == set()
+    assert scan.stopped_at is None
+    assert all(d['type'] == 'person' for d in evidence)
+
+
+def test_benign_video_only_gets_the_sparse_pass(processor, tmp_path):
+    path = write_video(tmp_path / 'quiet.mp4')
+
+    scan, evidence = run_scan(processor, path)
+
+    assert evidence == []
+    assert scan.frames_inferred == 15
+
+
+def test_benign_video_ends_after_enough_quiet_frames(processor, tmp_path):
+    quiet = write_video(tmp_path / 'quiet.mp4')
+    # The knife on frame 60 (0.65) is a candidate, but isn't confirmed
+    flash = write_video(tmp_path / 'flash.mp4', bright_frames={60})
+
+    scan, evidence = run_scan(processor, quiet, benign_frames=5, benign_confidence=0.5)
+    # Sparse frames 0-80 are quiet, the rest of the first batch was inferred with them
+    assert (scan.stopped_at, scan.frames_inferred, evidence) == (80, 8, [])
+
+    scan, _ = run_scan(processor, flash, benign_frames=5, benign_confidence=0.5)
+    # The count starts again after frame 60, so the scan goes on to frame 160
+    assert scan.confirmed == set()
+    assert scan.stopped_at == 160
+
+    scan, _ = run_scan(processor, flash, benign_frames=5, benign_confidence=0.7)
+    # A candidate below benign_confidence doesn't hold the scan up
+    assert scan.stopped_at == 80
+
+
+def test_analyze_single_video_uses_the_early_exit_scan(processor, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'RESULT_CACHE_ENABLED', False)
+    monkeypatch.setattr(scan_jobs, 'get_ml_processor', lambda: processor)
+    path = write_video(tmp_path / 'weapon.mp4', bright_frames=range(150, 200))
+    quiet = write_video(tmp_path / 'quiet.mp4')
+    flash = write_video(tmp_path / 'flash.mp4', bright_frames={160})
+
+    assert scan_jobs.analyze_single_video(path) == (pytest.approx(0.65), True, 'critical')
+    assert scan_jobs.analyze_single_video(quiet) == (0.0, False, 'normal')
+    assert processor.model.batch_sizes == [8, 7, 8, 7]
+    # Without confirmation a single-frame hit counts, as in a full scan, with it the video is cleared
+    assert scan_jobs.analyze_single_video(flash)[1:] == (True, 'critical')
+    monkeypatch.setattr(settings, 'SCAN_CONFIRM_FRAMES', 2)
+    assert scan_jobs.analyze_single_video(flash)[1:] == (False, 'normal')
@@ -0,0 +1,122 @@
+import json
+
+from tracker import ByteTracker, TrackSummaries, collapse_tracks
+
+
+def detection(frame_number, x, y=50, size=100, confidence=0.9, type_='person'):
+    return {
+        'type': type_,
+        'original_class': type_,
+        'confidence': confidence,
+        'frame_number': frame_number,
+        'bbox': {'x': x, 'y': y, 'width': size, 'height': size},
+    }
+
+
+def test_moving_object_keeps_its_track_id():
+    tracker = ByteTracker(match_iou=0.3, high_confidence=0.7, max_misses=2)
+    frames = [
+        [detection(i, 20 + 15 * i), detection(i, 600 - 10 * i, confidence=0.8)]
+        for i in range(20)
+    ]
+    for frame in frames:
+        tracker.update(frame)
+
+    assert {frame[0]['track_id'] for frame in frames} == {1}
+    assert {frame[1]['track_id'] for frame in frames} == {2}
+
+
+def test_low_confidence_detections_continue_a_track():
+    tracker = ByteTracker(match_iou=0.3, high_confidence=0.7, max_misses=2)
+    frames = [[detection(i, 20 + 10 * i, confidence=0.9 if i % 2 == 0 else 0.4)] for i in range(10)]
+    for frame in frames:
+        tracker.update(frame)
+
+    assert {frame[0]['track_id'] for frame in frames} == {1}
+
+
+def test_tracks_only_match_their_own_class():
+    tracker = ByteTracker(match_iou=0.3, high_confidence=0.7, max_misses=2)
+    tracker.update([detection(0, 100)])
+    knife = tracker.update([detection(1, 100, type_='knife')])[0]
+
+    assert knife['track_id'] == 2
+
+
+def test_track_ends_after_max_misses():
+    tracker = ByteTracker(match_iou=0.3, high_confidence=0.7, max_misses=2)
+    tracker.update([detection(0, 100)])
+    for _ in range(2):
+        tracker.update([])
+    assert tracker.update([detection(3, 100)])[0]['track_id'] == 1
+
+    for _ in range(3):
+        tracker.update([])
+    assert tracker.tracks == []
+    assert tracker.update([detection(7, 100)])[0]['track_id'] == 2
+
+
+def test_collapse_tracks_keeps_one_peak_detection_per_track():
+    detections = [
+        {**detection(0, 10, confidence=0.7), 'track_id': 1},
+        {**detection(1, 20, confidence=0.95), 'track_id': 1},
+        {**detection(1, 300, confidence=0.8, type_='knife'), 'track_id': 2},
+        {**detection(2, 30, confidence=0.75), 'track_id': 1},
+        detection(2, 500),
+    ]
+
+    person, knife, untracked = collapse_tracks(detections)
+
+    assert person['track_id'] == 1
+    assert person['confidence'] == 0.95
+    assert person['frame_number'] == 1
+    assert person['bbox']['x'] == 20
+    assert (person['first_frame'], person['last_frame'], person['detection_count']) == (0, 2, 3)
+    assert knife['track_id'] == 2
+    assert (knife['first_frame'], knife['last_frame'], knife['detection_count']) == (1, 1, 1)
+    assert 'track_id' not in untracked
+
+
+def test_track_summaries_are_emitted_once_the_track_ends():
+    tracker = ByteTracker(match_iou=0.3, high_confidence=0.7, max_misses=2)
+    # A person for frames 0-4, then a knife elsewhere for frames 10-19
+    frames = [
+        [detection(i, 20 + 5 * i, confidence=0.7 + i / 100)] if i < 5 else
+        [detection(i, 400, type_='knife')] if i >= 10 else []
+        for i in range(20)
+    ]
+    summaries = TrackSummaries(horizon=3)
+    emitted = []
+    for i, frame in enumerate(frames):
+        for summary in summaries.add(tracker.update(frame)):
+            emitted.append((i, summary))
+
+    assert [(i, summary['track_id']) for i, summary in emitted] == [(7, 1)]
+    assert len(summaries) == 1
+    streamed = [summary for _, summary in emitted] + summaries.flush()
+    assert streamed == collapse_tracks([d for frame in frames for d in frame])
+
+
+def test_track_summaries_resume_from_their_state():
+    # A person in view throughout, a knife that appears after the restart
+    frames = [
+        [detection(i, 20 + 5 * i)] + ([detection(i, 400, type_='knife')] if i >= 12 else [])
+        for i in range(20)
+    ]
+    summaries = TrackSummaries(horizon=3)
+    tracker = ByteTracker(match_iou=0.3, high_confidence=0.7, max_misses=2)
+    for frame in frames[:10]:
+        assert summaries.add(tracker.update(frame)) == []
+    state = json.loads(json.dumps(summaries.state()))
+
+    # A new process: a fresh tracker numbers its tracks from 1 again
+    resumed = TrackSummaries.from_state(state, horizon=3)
+    tracker = ByteTracker(match_iou=0.3, high_confidence=0.7, max_misses=2)
+    for frame in frames[10:]:
+        assert resumed.add(tracker.update(frame)) == []
+    tracks = resumed.flush()
+
+    assert [(t['track_id'], t['type'], t['first_frame'], t['last_frame'], t['detection_count']) for t in tracks] == [
+        (1, 'person', 0, 19, 20),
+        (3, 'knife', 12, 19, 8),
+    ]
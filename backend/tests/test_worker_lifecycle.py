@@ -0,0 +1,39 @@
+import pytest
+
+import worker_lifecycle
+from config import settings
+
+
+def test_threads_split_the_cores_between_worker_processes(monkeypatch):
+    assert worker_lifecycle.threads_per_process(4, cores=16) == 4
+    assert worker_lifecycle.threads_per_process(3, cores=8) == 2
+    assert worker_lifecycle.threads_per_process(16, cores=8) == 1
+    monkeypatch.setattr(settings, 'WORKER_THREADS_PER_CHILD', 3)
+    assert worker_lifecycle.threads_per_process(4, cores=16) == 3
+
+
+def test_worker_process_warms_up_and_reports_its_first_task(monkeypatch):
+    inferred = []
+
+    class Processor:
+        def process_frames(self, frames, frame_numbers):
+            inferred.append(frames[0].shape)
+            return [[]]
+
+    threads = []
+    monkeypatch.setattr(worker_lifecycle, 'get_ml_processor', lambda: Processor())
+    monkeypatch.setattr(worker_lifecycle, 'set_threads', threads.append)
+    monkeypatch.setattr(worker_lifecycle, 'worker_stats', {})
+    monkeypatch.setattr(settings, 'WORKER_THREADS_PER_CHILD', 2)
+
+    worker_lifecycle.init_process(concurrency=4)
+    assert threads == [2]
+    assert inferred == [(settings.INFERENCE_IMGSZ, settings.INFERENCE_IMGSZ, 3)]
+
+    for _ in range(2):
+        worker_lifecycle.task_started()
+        worker_lifecycle.task_finished('process_media')
+    stats = worker_lifecycle.worker_stats
+    assert stats['first_task_seconds'] == pytest.approx(0, abs=1)
+    assert '_task_started' not in stats
+    assert {'threads', 'warmup_seconds'} <= set(stats)
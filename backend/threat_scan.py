@@ -0,0 +1,203 @@
+"""
+Early-exit threat scan of a video file
+
+A scan only has to answer: is there a threat, how confident, how severe.
+Instead of running the whole file at FRAME_EXTRACTION_FPS, it works coarse
+to fine:
+
+1. A sparse pass seeks through the file, one frame every
+   SCAN_COARSE_INTERVAL seconds.
+2. Optionally, a threat seen on a sparse frame is confirmed on the next
+   SCAN_CONFIRM_FRAMES - 1 frames at SCAN_DENSE_FPS. Only a confirmed type
+   then counts, so a one-frame false positive doesn't raise a scan alert.
+   The default of 1 takes every hit, the same verdict as a full scan.
+3. The scan stops as soon as a critical type is confirmed, since nothing
+   later can raise the severity.
+
+A benign video is done after the sparse pass: any threat visible for at
+least SCAN_COARSE_INTERVAL seconds would have shown up on one of its frames.
+With SCAN_BENIGN_FRAMES set, it is done sooner: once that many sparse frames
+in a row had no threat detection of at least SCAN_BENIGN_MAX_CONFIDENCE, the
+scan ends as benign. A threat appearing only later in the file is then missed.
+"""
+from typing import Dict, Iterable, List, Optional
+import logging
+
+import cv2
+import numpy as np
+
+from config import settings
+from media_io import local_media_path
+from roi import RegionOfInterest
+
+logger = logging.getLogger(__name__)
+
+# Frames between the current position and the next wanted one that are cheaper to grab than to seek over
+_MAX_GRAB_GAP = 15
+
+
+class ThreatScan:
+    """One coarse-to-fine scan of an open capture"""
+
+    def __init__(
+        self,
+        processor,
+        cap: cv2.VideoCapture,
+        threat_types: Iterable[str],
+        critical_types: Iterable[str],
+        imgsz: Optional[int] = None,
+        roi: Optional[List] = None,
+        coarse_interval: Optional[float] = None,
+        confirm_frames: Optional[int] = None,
+        dense_fps: Optional[float] = None,
+        benign_frames: Optional[int] = None,
+        benign_confidence: Optional[float] = None
+    ):
+        self.processor = processor
+        self.cap = cap
+        self.threat_types = set(threat_types)
+        self.critical_types = set(critical_types) & self.threat_types
+        self.region = RegionOfInterest.from_polygons(roi)
+        self.imgsz = imgsz or settings.INFERENCE_IMGSZ
+
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        self.total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        interval = settings.SCAN_COARSE_INTERVAL if coarse_interval is None else coarse_interval
+        self.coarse_step = max(1, round(interval * self.fps))
+        self.dense_step = max(1, round(self.fps / (dense_fps or settings.SCAN_DENSE_FPS)))
+        self.confirm_frames = max(1, settings.SCAN_CONFIRM_FRAMES if confirm_frames is None else confirm_frames)
+        self.benign_frames = settings.SCAN_BENIGN_FRAMES if benign_frames is None else benign_frames
+        self.benign_confidence = (
+            settings.SCAN_BENIGN_MAX_CONFIDENCE if benign_confidence is None else benign_confidence
+        )
+
+        self.confirmed = set()
+        self.frames_inferred = 0
+        self.stopped_at: Optional[int] = None
+        self._position = 0
+
+    def run(self) -> List[Dict]:
+        """
+        Detections the verdict is based on: every detection of a non-threat type
+        or of a confirmed threat type, from the frames that were inferred
+        """
+        evidence = []
+        # Sparse frames in a row without a threat candidate
+        quiet = 0
+        batch = self.processor.batch_size * self.coarse_step
+        for start in range(0, self.total_frames, batch):
+            numbers = list(range(start, min(start + batch, self.total_frames), self.coarse_step))
+            for frame_number, detections in zip(numbers, self._infer(numbers)):
+                # Check critical types first, so a confirmed weapon ends the scan right away
+                hits = sorted(
+                    {d['type'] for d in detections if d['type'] in self.threat_types} - self.confirmed,
+                    key=lambda t: t not in self.critical_types
+                )
+                for threat_type in hits:
+                    confirmation = self._confirm(threat_type, frame_number)
+                    if confirmation is not None:
+                        self.confirmed.add(threat_type)
+                        evidence.extend(confirmation)
+
+                evidence.extend(
+                    d for d in detections if d['type'] not in self.threat_types or d['type'] in self.confirmed
+                )
+                if self.confirmed & self.critical_types:
+                    self.stopped_at = frame_number
+                    return evidence
+
+                candidate = any(
+                    d['type'] in self.threat_types and d['confidence'] >= self.benign_confidence for d in detections
+                )
+                quiet = 0 if candidate else quiet + 1
+                if self.benign_frames and not self.confirmed and quiet >= self.benign_frames:
+                    logger.info(f"No threat candidate on {quiet} sparse frames up to {frame_number}, ending as benign")
+                    self.stopped_at = frame_number
+                    return evidence
+        return evidence
+
+    def _confirm(self, threat_type: str, frame_number: int) -> Optional[List[Dict]]:
+        """Detections of threat_type on the dense frames after a hit, or None if it isn't on all of them"""
+        # Right at the end of the video only the frames that are left are checked
+        numbers = [
+            frame_number + self.dense_step * i for i in range(1, self.confirm_frames)
+            if frame_number + self.dense_step * i < self.total_frames
+        ]
+        confirmation = []
+        for detections in self._infer(numbers):
+            found = [d for d in detections if d['type'] == threat_type]
+            if not found:
+                logger.info(f"{threat_type} at frame {frame_number} not confirmed")
+                return None
+            confirmation.extend(found)
+        logger.info(f"{threat_type} at frame {frame_number} confirmed over {self.confirm_frames} frames")
+        return confirmation
+
+    def _infer(self, numbers: List[int]) -> List[List[Dict]]:
+        """Per-frame detections for the given frame numbers, in one batched model call"""
+        if not numbers:
+            return []
+        frames, read_numbers = [], []
+        for frame_number in numbers:
+            frame = self._read(frame_number)
+            if frame is None:
+                break
+            frames.append(self.region.crop(frame) if self.region else frame)
+            read_numbers.append(frame_number)
+        if not frames:
+            return []
+
+        imgsz = self.region.input_size(self.imgsz) if self.region else self.imgsz
+        per_frame = self.processor.infer_batch(frames, read_numbers, imgsz)
+        self.frames_inferred += len(frames)
+        if self.region:
+            per_frame = [self.region.to_frame(detections) for detections in per_frame]
+        return per_frame
+
+    def _read(self, frame_number: int) -> Optional[np.ndarray]:
+        gap = frame_number - self._position
+        if 0 <= gap <= _MAX_GRAB_GAP:
+            for _ in range(gap):
+                self.cap.grab()
+        else:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+        ret, frame = self.cap.read()
+        self._position = frame_number + 1
+        return frame if ret else None
+
+
+def scan_video(
+    processor,
+    video_path: str,
+    threat_types: Iterable[str],
+    critical_types: Iterable[str],
+    imgsz: Optional[int] = None,
+    roi: Optional[List] = None,
+    **options
+) -> List[Dict]:
+    """
+    Coarse-to-fine scan of a video file for threats, see ThreatScan
+
+    Falls back to process_video when the file's length is unknown (nothing
+    to seek against).
+
+    Returns:
+        The detections the verdict is based on
+    """
+    with local_media_path(video_path) as path:
+        cap = cv2.VideoCapture(path)
+        try:
+            scan = ThreatScan(processor, cap, threat_types, critical_types, imgsz, roi, **options)
+            if scan.total_frames <= 0:
+                logger.warning(f"Unknown length for {video_path}, scanning every sampled frame")
+                return processor.process_video(path, imgsz=imgsz, roi=roi)
+            evidence = scan.run()
+        finally:
+            cap.release()
+
+    stopped = f", stopped at frame {scan.stopped_at}" if scan.stopped_at is not None else ""
+    logger.info(
+        f"Threat scan of {video_path}: inferred {scan.frames_inferred} of {scan.total_frames} frames, "
+        f"confirmed {sorted(scan.confirmed) or 'nothing'}{stopped}"
+    )
+    return evidence
@@ -0,0 +1,324 @@
+"""
+Lightweight multi-object tracking over per-frame detections (ByteTrack-style)
+
+Boxes are followed with a constant-velocity Kalman filter and associated
+frame to frame by IoU. Confident detections are matched first, and the
+rest then get a second chance against the tracks still unmatched. A track
+survives a few missed frames before it ends. Every detection gets a
+'track_id', so one person standing in view for a minute is one track, not
+one detection per sampled frame.
+"""
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from config import settings
+
+# Kalman noise, relative to the box height (same weights as ByteTrack/DeepSORT)
+_STD_POSITION = 1.0 / 20
+_STD_VELOCITY = 1.0 / 160
+
+# Constant-velocity model over (cx, cy, w, h) and their velocities, one step per sampled frame
+_F = np.eye(8)
+_F[:4, 4:] = np.eye(4)
+_H = np.eye(4, 8)
+
+
+def _to_xyxy(bbox: Dict) -> np.ndarray:
+    return np.array([bbox['x'], bbox['y'], bbox['x'] + bbox['width'], bbox['y'] + bbox['height']], dtype=np.float64)
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of (N, 4) and (M, 4) xyxy boxes"""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)))
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+class Track:
+    """One tracked object with its Kalman state"""
+
+    def __init__(self, track_id: int, xyxy: np.ndarray, class_name: str):
+        self.track_id = track_id
+        self.class_name = class_name
+        self.misses = 0
+        measurement = self._measurement(xyxy)
+        self.mean = np.concatenate([measurement, np.zeros(4)])
+        height = max(measurement[3], 1.0)
+        std = np.array([_STD_POSITION] * 4 + [_STD_VELOCITY * 10] * 4) * 2 * height
+        self.covariance = np.diag(std ** 2)
+
+    @staticmethod
+    def _measurement(xyxy: np.ndarray) -> np.ndarray:
+        width, height = xyxy[2] - xyxy[0], xyxy[3] - xyxy[1]
+        return np.array([xyxy[0] + width / 2, xyxy[1] + height / 2, width, height])
+
+    def predict(self):
+        height = max(self.mean[3], 1.0)
+        std = np.array([_STD_POSITION] * 4 + [_STD_VELOCITY] * 4) * height
+        self.mean = _F @ self.mean
+        self.covariance = _F @ self.covariance @ _F.T + np.diag(std ** 2)
+
+    def update(self, xyxy: np.ndarray):
+        height = max(self.mean[3], 1.0)
+        noise = np.diag((np.full(4, _STD_POSITION) * height) ** 2)
+        innovation_cov = _H @ self.covariance @ _H.T + noise
+        gain = np.linalg.solve(innovation_cov, _H @ self.covariance).T
+        self.mean = self.mean + gain @ (self._measurement(xyxy) - _H @ self.mean)
+        self.covariance = (np.eye(8) - gain @ _H) @ self.covariance
+        self.misses = 0
+
+    @property
+    def xyxy(self) -> np.ndarray:
+        cx, cy, width, height = self.mean[:4]
+        return np.array([cx - width / 2, cy - height / 2, cx + width / 2, cy + height / 2])
+
+
+class ByteTracker:
+    """
+    Assigns track ids to the detections of consecutive (sampled) frames
+
+    Tracks only ever match detections of their own class. Use one tracker
+    per video or stream.
+    """
+
+    def __init__(
+        self,
+        match_iou: Optional[float] = None,
+        high_confidence: Optional[float] = None,
+        max_misses: Optional[int] = None
+    ):
+        """
+        Args:
+            match_iou: Lowest IoU between a track's predicted box and a detection to match them
+            high_confidence: Detections at or above this are matched first
+            max_misses: Frames a track may go undetected before it ends
+        """
+        self.match_iou = settings.TRACK_MATCH_IOU if match_iou is None else match_iou
+        self.high_confidence = settings.TRACK_HIGH_CONFIDENCE if high_confidence is None else high_confidence
+        self.max_misses = settings.TRACK_MAX_MISSES if max_misses is None else max_misses
+        self.tracks: List[Track] = []
+        self._next_id = 1
+
+    def update(self, detections: List[Dict]) -> List[Dict]:
+        """Set 'track_id' on one frame's detections (in place) and return them"""
+        for track in self.tracks:
+            track.predict()
+
+        boxes = np.array([_to_xyxy(d['bbox']) for d in detections]).reshape(-1, 4)
+        confident = [i for i, d in enumerate(detections) if d['confidence'] >= self.high_confidence]
+        remaining = [i for i, d in enumerate(detections) if d['confidence'] < self.high_confidence]
+
+        unmatched_tracks = list(range(len(self.tracks)))
+        unmatched = []
+        for candidates in (confident, remaining):
+            matches, unmatched_tracks, leftover = self._match(detections, boxes, candidates, unmatched_tracks)
+            for track_index, detection_index in matches:
+                track = self.tracks[track_index]
+                track.update(boxes[detection_index])
+                detections[detection_index]['track_id'] = track.track_id
+            unmatched.extend(leftover)
+
+        for track_index in unmatched_tracks:
+            self.tracks[track_index].misses += 1
+
+        for detection_index in sorted(unmatched):
+            detection = detections[detection_index]
+            track = Track(self._next_id, boxes[detection_index], detection['original_class'])
+            self._next_id += 1
+            self.tracks.append(track)
+            detection['track_id'] = track.track_id
+
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+        return detections
+
+    def _match(self, detections: List[Dict], boxes: np.ndarray, candidates: List[int], track_indices: List[int]):
+        """Greedy highest-IoU-first matching of candidate detections to tracks of the same class"""
+        if not candidates or not track_indices:
+            return [], track_indices, candidates
+
+        track_boxes = np.array([self.tracks[t].xyxy for t in track_indices])
+        ious = iou_matrix(track_boxes, boxes[candidates])
+        same_class = np.array([
+            [self.tracks[t].class_name == detections[d]['original_class'] for d in candidates]
+            for t in track_indices
+        ])
+        ious[~same_class] = 0.0
+
+        matches = []
+        while ious.size and ious.max() >= self.match_iou:
+            row, col = np.unravel_index(np.argmax(ious), ious.shape)
+            matches.append((track_indices[row], candidates[col]))
+            ious[row, :] = 0.0
+            ious[:, col] = 0.0
+
+        matched_tracks = {t for t, _ in matches}
+        matched_detections = {d for _, d in matches}
+        return (
+            matches,
+            [t for t in track_indices if t not in matched_tracks],
+            [d for d in candidates if d not in matched_detections]
+        )
+
+
+def _merge(summary: Optional[Dict], detection: Dict) -> Dict:
+    """Fold one detection into its track's summary (a new summary for the first one)"""
+    frame_number = detection.get('frame_number')
+    if summary is None:
+        return {
+            **detection,
+            'first_frame': frame_number,
+            'last_frame': frame_number,
+            'first_bbox': detection.get('bbox'),
+            'last_bbox': detection.get('bbox'),
+            'detection_count': 1,
+        }
+
+    summary['detection_count'] += 1
+    if frame_number < summary['first_frame']:
+        summary['first_frame'], summary['first_bbox'] = frame_number, detection.get('bbox')
+    if frame_number > summary['last_frame']:
+        summary['last_frame'], summary['last_bbox'] = frame_number, detection.get('bbox')
+    if detection['confidence'] > summary['confidence']:
+        summary.update({k: v for k, v in detection.items() if k != 'track_id'})
+    return summary
+
+
+def collapse_tracks(detections: List[Dict]) -> List[Dict]:
+    """
+    One summary per track: the peak-confidence detection, plus first/last frame
+
+    The summary's frame_number and bbox are those of the peak detection,
+    first_bbox and last_bbox where the track started and ended.
+    Detections without a track_id are kept as they are.
+    """
+    tracks: Dict[int, Dict] = {}
+    untracked = []
+    for detection in detections:
+        track_id = detection.get('track_id')
+        if track_id is None:
+            untracked.append(detection)
+        else:
+            tracks[track_id] = _merge(tracks.get(track_id), detection)
+
+    return sorted(tracks.values(), key=lambda t: (t['first_frame'], t['track_id'])) + untracked
+
+
+class TrackSummaries:
+    """
+    collapse_tracks over a stream of frames, emitting each summary once its track has ended
+
+    Only the tracks still in view are held, so a long video's summaries can be
+    persisted as it plays. A track counts as ended once it has been missing
+    for horizon sampled frames. The default horizon is the longest a
+    ByteTracker keeps a lost track (TRACK_MAX_MISSES inferred frames), with
+    room for the motion-gated frames in between that are never inferred.
+    """
+
+    def __init__(self, horizon: Optional[int] = None):
+        if horizon is None:
+            horizon = (settings.TRACK_MAX_MISSES + 1) * (settings.MOTION_MAX_SKIPPED_FRAMES + 1)
+        self.horizon = horizon
+        self._open: Dict[int, Dict] = {}
+        self._last_seen: Dict[int, int] = {}
+        self._frames = 0
+        self._max_track_id = 0
+        # Set when continuing from a state(), see from_state
+        self._resumed_at: Optional[int] = None
+        self._id_offset = 0
+        self._id_map: Dict[int, int] = {}
+
+    def state(self) -> Dict:
+        """JSON-serializable state of the open tracks, to continue from with from_state"""
+        return {
+            'frames': self._frames,
+            'max_track_id': self._max_track_id,
+            'open': [{**summary, 'last_seen': self._last_seen[track_id]} for track_id, summary in self._open.items()],
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict, horizon: Optional[int] = None) -> "TrackSummaries":
+        """
+        Continue from a state() after a restart, with a fresh ByteTracker
+
+        The new tracker numbers its tracks from 1 again, so its ids are moved
+        past the ones already handed out. A new track that shows up right
+        after the restart where a restored one was last seen (same type,
+        overlapping box) continues that track instead.
+        """
+        summaries = cls(horizon)
+        summaries._frames = state['frames']
+        summaries._max_track_id = state['max_track_id']
+        for summary in state['open']:
+            summary = dict(summary)
+            summaries._last_seen[summary['track_id']] = summary.pop('last_seen')
+            summaries._open[summary['track_id']] = summary
+        summaries._resumed_at = summaries._frames
+        summaries._id_offset = summaries._max_track_id
+        return summaries
+
+    def add(self, frame_detections: Iterable[Dict]) -> List[Dict]:
+        """Take one sampled frame's detections, returning the summaries that are now final"""
+        self._frames += 1
+        finished = []
+        for detection in frame_detections:
+            track_id = detection.get('track_id')
+            if track_id is None:
+                finished.append(detection)
+                continue
+            if self._resumed_at is not None:
+                track_id = self._resume_id(track_id, detection)
+                detection = {**detection, 'track_id': track_id}
+            self._open[track_id] = _merge(self._open.get(track_id), detection)
+            self._last_seen[track_id] = self._frames
+            self._max_track_id = max(self._max_track_id, track_id)
+
+        ended = [
+            track_id for track_id, seen in self._last_seen.items() if self._frames - seen >= self.horizon
+        ]
+        for track_id in ended:
+            del self._last_seen[track_id]
+            finished.append(self._open.pop(track_id))
+        return finished
+
+    def _resume_id(self, track_id: int, detection: Dict) -> int:
+        """Id of a track from the tracker started after the restart"""
+        if track_id not in self._id_map:
+            continued = None
+            if self._frames - self._resumed_at <= settings.TRACK_MAX_MISSES + 1:
+                claimed = set(self._id_map.values())
+                candidates = [
+                    summary for summary in self._open.values()
+                    if summary['track_id'] <= self._id_offset and summary['track_id'] not in claimed
+                    and summary['type'] == detection['type']
+                ]
+                if candidates:
+                    ious = iou_matrix(
+                        _to_xyxy(detection['bbox'])[None],
+                        np.array([_to_xyxy(summary['last_bbox']) for summary in candidates])
+                    )[0]
+                    best = int(np.argmax(ious))
+                    if ious[best] >= settings.TRACK_MATCH_IOU:
+                        continued = candidates[best]['track_id']
+            self._id_map[track_id] = continued or track_id + self._id_offset
+        return self._id_map[track_id]
+
+    def open_tracks(self) -> List[Dict]:
+        """Summaries so far of the tracks still in view"""
+        return list(self._open.values())
+
+    def flush(self) -> List[Dict]:
+        """Summaries of the tracks still open, at the end of the video"""
+        finished = sorted(self._open.values(), key=lambda t: (t['first_frame'], t['track_id']))
+        self._open.clear()
+        self._last_seen.clear()
+        return finished
+
+    def __len__(self) -> int:
+        return len(self._open)
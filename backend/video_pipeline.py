@@ -0,0 +1,181 @@
+"""
+Staged video processing pipeline
+
+decode -> preprocess -> inference -> postprocess, each stage on its own thread
+(postprocess runs on the caller's thread) with bounded queues in between, so
+decoding the next batch overlaps with inference on the current one.
+"""
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import logging
+import queue
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of the stream on a queue
+_DONE = object()
+
+# How often blocked stages wake up to check for shutdown
+_POLL_INTERVAL = 0.1
+
+STAGES = ('decode', 'preprocess', 'inference', 'postprocess')
+
+
+class PipelineStopped(Exception):
+    """Raised inside a stage when the pipeline is shutting down"""
+
+
+class VideoPipeline:
+    """
+    Runs batches of frames through preprocess, inference and postprocess concurrently
+
+    Queues are bounded, so a fast decoder blocks instead of buffering the
+    whole video ahead of inference. The first error in any stage stops every
+    stage and is re-raised to the caller. Closing the result iterator early
+    shuts the threads down too.
+    """
+
+    def __init__(
+        self,
+        preprocess: Callable[[List[Optional[np.ndarray]]], Any],
+        infer: Callable[[Any], Any],
+        postprocess: Callable[[Any, Any, List[int]], List[Optional[List[Dict]]]],
+        queue_size: int = 2
+    ):
+        """
+        Args:
+            preprocess: frames -> prepared batch
+            infer: prepared batch -> model results
+            postprocess: (prepared batch, results, frame_numbers) -> detections per frame
+            queue_size: Batches buffered between stages
+        """
+        self.preprocess = preprocess
+        self.infer = infer
+        self.postprocess = postprocess
+        self.queue_size = max(1, queue_size)
+        self.stats: Dict[str, float] = {}
+
+    def run(
+        self,
+        batches: Iterable[Tuple[List[Optional[np.ndarray]], List[int]]]
+    ) -> Iterator[Tuple[List[int], List[Optional[List[Dict]]]]]:
+        """
+        Process (frames, frame_numbers) batches in order
+
+        Yields (frame_numbers, per_frame_detections) for each batch, as returned
+        by postprocess.
+
+        Per-stage busy time is recorded in self.stats once the iterator finishes.
+        """
+        stop = threading.Event()
+        errors: List[BaseException] = []
+        busy = {stage: 0.0 for stage in STAGES}
+        decoded = queue.Queue(maxsize=self.queue_size)
+        preprocessed = queue.Queue(maxsize=self.queue_size)
+        inferred = queue.Queue(maxsize=self.queue_size)
+
+        def put(q: queue.Queue, item):
+            while True:
+                if stop.is_set():
+                    raise PipelineStopped()
+                try:
+                    q.put(item, timeout=_POLL_INTERVAL)
+                    return
+                except queue.Full:
+                    continue
+
+        def get(q: queue.Queue):
+            while True:
+                if stop.is_set():
+                    raise PipelineStopped()
+                try:
+                    return q.get(timeout=_POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+
+        def run_stage(name: str, body):
+            try:
+                body()
+            except PipelineStopped:
+                pass
+            except BaseException as e:
+                logger.error(f"Pipeline {name} stage failed: {e}")
+                errors.append(e)
+                stop.set()
+
+        def decode():
+            iterator = iter(batches)
+            while True:
+                started = time.perf_counter()
+                batch = next(iterator, _DONE)
+                busy['decode'] += time.perf_counter() - started
+                put(decoded, batch)
+                if batch is _DONE:
+                    return
+
+        def preprocess():
+            while True:
+                batch = get(decoded)
+                if batch is not _DONE:
+                    started = time.perf_counter()
+                    frames, frame_numbers = batch
+                    batch = (self.preprocess(frames), frame_numbers)
+                    busy['preprocess'] += time.perf_counter() - started
+                put(preprocessed, batch)
+                if batch is _DONE:
+                    return
+
+        def infer():
+            while True:
+                batch = get(preprocessed)
+                if batch is not _DONE:
+                    started = time.perf_counter()
+                    prepared, frame_numbers = batch
+                    batch = (prepared, self.infer(prepared), frame_numbers)
+                    busy['inference'] += time.perf_counter() - started
+                put(inferred, batch)
+                if batch is _DONE:
+                    return
+
+        threads = [
+            threading.Thread(target=run_stage, args=(name, body), name=f"pipeline-{name}", daemon=True)
+            for name, body in (('decode', decode), ('preprocess', preprocess), ('inference', infer))
+        ]
+        wall_started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        batch_count = 0
+        frame_count = 0
+        try:
+            while True:
+                try:
+                    batch = get(inferred)
+                except PipelineStopped:
+                    break
+                if batch is _DONE:
+                    break
+
+                started = time.perf_counter()
+                prepared, results, frame_numbers = batch
+                detections = self.postprocess(prepared, results, frame_numbers)
+                busy['postprocess'] += time.perf_counter() - started
+                batch_count += 1
+                frame_count += len(frame_numbers)
+
+                yield frame_numbers, detections
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+            wall = time.perf_counter() - wall_started
+            self.stats = {**busy, 'wall': wall, 'batches': batch_count, 'frames': frame_count}
+            breakdown = ", ".join(f"{stage} {busy[stage]:.2f}s" for stage in STAGES)
+            logger.info(f"Pipeline processed {frame_count} frames in {wall:.2f}s ({breakdown})")
+
+        if errors:
+            raise errors[0]
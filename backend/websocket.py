@@ -3,9 +3,12 @@ WebSocket endpoint for real-time alert notifications
 """
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from typing import List
+import asyncio
 import json
 import logging
 
+import alert_events
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
@@ -30,13 +33,15 @@ class ConnectionManager:
         await websocket.send_text(message)
     
     async def broadcast(self, message: dict):
-        """Broadcast message to all connected clients"""
+        """Broadcast message to all connected clients, concurrently so a slow one doesn't hold up the rest"""
         message_str = json.dumps(message)
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message_str)
-            except Exception as e:
-                logger.error(f"Error broadcasting to client: {e}")
+        await asyncio.gather(*(self._send(connection, message_str) for connection in list(self.active_connections)))
+    
+    async def _send(self, connection: WebSocket, message_str: str):
+        try:
+            await connection.send_text(message_str)
+        except Exception as e:
+            logger.error(f"Error broadcasting to client: {e}")
 
 
 # Global connection manager instance
@@ -52,6 +57,9 @@ async def websocket_alerts(websocket: WebSocket):
     - New alert notifications
     - Alert status updates
     - System notifications
+    
+    Clients should acknowledge each new alert with
+    {"type": "alert_ack", "alert_id": ...} for the latency measurement (see alert_events.py)
     """
     await manager.connect(websocket)
     
@@ -71,6 +79,8 @@ async def websocket_alerts(websocket: WebSocket):
                 message = json.loads(data)
                 if message.get("type") == "ping":
                     await websocket.send_json({"type": "pong"})
+                elif message.get("type") == "alert_ack":
+                    alert_events.latency.record_ack(str(message.get("alert_id")))
             except json.JSONDecodeError:
                 pass
                 
@@ -85,7 +95,7 @@ async def websocket_alerts(websocket: WebSocket):
 async def broadcast_new_alert(alert_data: dict):
     """
     Helper function to broadcast new alerts to all connected clients
-    Call this from your alert creation logic
+    Called by the API's alert_events.AlertSubscriber for the alerts the workers create
     """
     await manager.broadcast({
         "type": "new_alert",
@@ -0,0 +1,123 @@
+"""
+Celery worker lifecycle: model preloading, per-process threads and warm-up
+
+With the prefork pool the model is loaded once in the parent, before the
+children are forked, so they share its pages copy-on-write instead of each
+holding a copy. gc.freeze() moves everything loaded so far out of the
+collector's reach, so collections in the children don't touch (and copy)
+those pages.
+
+Nothing is inferred in the parent: torch's intra-op thread pool doesn't
+survive a fork. Each child sets its own thread count, so the children
+together use the machine's cores without oversubscribing them, and runs a
+dummy inference so the first real task doesn't pay for lazy initialisation.
+
+Memory and first-task latency are logged per process. PSS splits the shared
+pages between the processes that map them, so summing it over the children
+gives the real footprint, unlike RSS.
+"""
+from typing import Dict, Optional
+import gc
+import logging
+import os
+import resource
+import time
+
+from config import settings
+from ml_service import get_ml_processor
+
+logger = logging.getLogger(__name__)
+
+# Filled in by the process the stats describe (parent or one child)
+worker_stats: Dict = {}
+
+
+def process_memory() -> Dict[str, float]:
+    """This process's RSS, PSS and private memory in MB (Linux), or only its peak RSS elsewhere"""
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line and not line[0].isdigit())
+    except OSError:
+        return {"peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+    def mb(*names):
+        return sum(int(fields[name].split()[0]) for name in names if name in fields) / 1024
+
+    return {
+        "rss_mb": mb('Rss'),
+        "pss_mb": mb('Pss'),
+        "private_mb": mb('Private_Clean', 'Private_Dirty'),
+    }
+
+
+def threads_per_process(concurrency: int, cores: Optional[int] = None) -> int:
+    """Intra-op threads for each of concurrency worker processes, WORKER_THREADS_PER_CHILD if set"""
+    if settings.WORKER_THREADS_PER_CHILD:
+        return settings.WORKER_THREADS_PER_CHILD
+    if cores is None:
+        cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+    return max(1, cores // max(1, concurrency))
+
+
+def preload_model():
+    """Load the model in the prefork parent, to be shared with the children it forks"""
+    started = time.perf_counter()
+    get_ml_processor()
+    gc.collect()
+    gc.freeze()
+    worker_stats.update({"preload_seconds": time.perf_counter() - started, **process_memory()})
+    logger.info(f"Model preloaded for the worker children: {_format(worker_stats)}")
+
+
+def init_process(concurrency: int):
+    """Set up one process that runs tasks: thread counts, then a warm-up inference"""
+    threads = threads_per_process(concurrency)
+    set_threads(threads)
+    worker_stats.clear()
+    worker_stats["threads"] = threads
+
+    if settings.WORKER_WARMUP:
+        worker_stats["warmup_seconds"] = warm_up()
+    worker_stats.update(process_memory())
+    logger.info(f"Worker process {os.getpid()} ready: {_format(worker_stats)}")
+
+
+def set_threads(threads: int):
+    """Intra-op threads for torch and OpenCV in this process"""
+    # Imported here so producers importing celery_app don't load them
+    import cv2
+    import torch
+
+    torch.set_num_threads(threads)
+    cv2.setNumThreads(threads)
+
+
+def warm_up() -> float:
+    """Run one dummy inference, returning how long it took (seconds)"""
+    import numpy as np
+
+    processor = get_ml_processor()
+    frame = np.zeros((settings.INFERENCE_IMGSZ, settings.INFERENCE_IMGSZ, 3), dtype=np.uint8)
+    started = time.perf_counter()
+    processor.process_frames([frame], [0])
+    return time.perf_counter() - started
+
+
+def task_started():
+    if "first_task_seconds" not in worker_stats:
+        worker_stats.setdefault("_task_started", time.perf_counter())
+
+
+def task_finished(task_name: str):
+    """Report the first task of this process (latency and memory), later ones are ignored"""
+    if "first_task_seconds" in worker_stats or "_task_started" not in worker_stats:
+        return
+    worker_stats["first_task_seconds"] = time.perf_counter() - worker_stats.pop("_task_started")
+    worker_stats.update(process_memory())
+    logger.info(f"First task ({task_name}) of worker process {os.getpid()}: {_format(worker_stats)}")
+
+
+def _format(stats: Dict) -> str:
+    return ", ".join(
+        f"{name} {value:.2f}" if isinstance(value, float) else f"{name} {value}" for name, value in stats.items()
+    )